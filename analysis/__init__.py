@@ -7,6 +7,8 @@ import pickle
 import random
 import random_control
 
+import numpy as np
+
 class ProbabilityMap(object):
     """
     This Class can be configured to produce random numbers controlling the
@@ -67,6 +69,23 @@ class ProbabilityMap(object):
                                round_up=round_up)
         
         self.random_gen = random_control.get_random_gen()
+        self._random_streams = None
+        self._cdf_arrays = None
+    
+    def set_random_stream(self, name):
+        """Configures the object to draw its random values from the
+        random_control streams associated to name. It has no effect if
+        random_control streams are disabled. In streams mode produce_number
+        and produce_numbers return the same sequence of values.
+        Args:
+        - name: string identifying the random variable modeled by this object.
+        """
+        selection_stream = random_control.get_random_stream(name)
+        if selection_stream is None:
+            self._random_streams = None
+        else:
+            self._random_streams = (selection_stream,
+                                random_control.get_random_stream(name+"-value"))
     
     def get_probabilities(self):
         return self._container["probabilities"]
@@ -97,16 +116,62 @@ class ProbabilityMap(object):
         except:
             self._container = pickle.load(pkl_file, encoding='latin1')
         pkl_file.close()
+        self._cdf_arrays = None
         
     def produce_number(self):
         """Produce a random number according to the configuration."""
         if not self.get_probabilities() or not self.get_value_ranges():
             raise ValueError("Probability not configured correctly")
+        if self._random_streams is not None:
+            return self.produce_numbers(1)[0]
         r=self.random_gen.uniform(0.0, 1.0)
         value_interval = self._get_range_for_number(r)
         n = self._get_value_in_range(value_interval, self.get_interval_policy())
         n = _round_number(n,self.get_round_up())
         return n
+    
+    def produce_numbers(self, n):
+        """Produces n random numbers according to the configuration. Same
+        semantics as produce_number, but all values are calculated at once
+        over numpy arrays.
+        Args:
+        - n: number of values to produce.
+        Returns: numpy array of n floats.
+        """
+        if not self.get_probabilities() or not self.get_value_ranges():
+            raise ValueError("Probability not configured correctly")
+        selection_random_gen, value_random_gen = self._get_np_random_gens()
+        probabilities, lows, highs = self._get_cdf_arrays()
+        r = selection_random_gen.uniform(0.0, 1.0, n)
+        positions = np.searchsorted(probabilities, r, side="left")
+        values = self._get_values_in_ranges(lows[positions], highs[positions],
+                                            self.get_interval_policy(),
+                                            value_random_gen)
+        values = _round_numbers(values, self.get_round_up())
+        return values
+    
+    def _get_np_random_gens(self):
+        """Returns the numpy random Generators to select the value ranges and
+        to produce values within them. If streams are not configured, both are
+        the same Generator seeded from random_gen, so batches are still
+        controlled by the global seed set in random_control."""
+        if self._random_streams is not None:
+            return self._random_streams
+        np_random_gen = np.random.default_rng(self.random_gen.getrandbits(64))
+        return np_random_gen, np_random_gen
+    
+    def _get_cdf_arrays(self):
+        """Returns the probabilities, range low values, and range high values
+        as numpy arrays. Range values keep their original type, e.g., integer
+        ranges produce integer values with the "low" policy. They are
+        calculated once and kept until the object is re-loaded."""
+        if self._cdf_arrays is None:
+            value_ranges = self.get_value_ranges()
+            self._cdf_arrays = (
+                        np.array(self.get_probabilities(), dtype=float),
+                        np.array([x[0] for x in value_ranges]),
+                        np.array([x[1] for x in value_ranges]))
+        return self._cdf_arrays
         
     def _get_range_for_number(self, number):
         """Returns the value range corresponding to the probability number"""
@@ -151,6 +216,33 @@ class ProbabilityMap(object):
                          float(value_range[0]))
         
         raise ValueError("Undefined interval policy: "+str(policy))
+    
+    def _get_values_in_ranges(self, lows, highs, policy, np_random_gen):
+        """Vectorized version of _get_value_in_range.
+            Args:
+                - lows: numpy array of the lower values of each interval.
+                - highs: numpy array of the higher values of each interval.
+                - policy: string configuring how the output values are chosen.
+                    Same values as in _get_value_in_range.
+                - np_random_gen: numpy Generator used to produce the random
+                    components of the values.
+            Returns: numpy array with a value within each interval according to
+                policy.
+        """
+        if policy == "random":
+            return np_random_gen.uniform(lows, highs)
+        if policy == "midpoint":
+            return lows+((highs-lows)/2)
+        if policy == "low":
+            return lows
+        if policy == "high":
+            return highs
+        if policy == "absnormal":
+            r = np.minimum(1.0, np.abs(np_random_gen.normal(0.0, 0.1, 
+                                                            len(lows))))
+            return (highs-lows)*r + lows
+        
+        raise ValueError("Undefined interval policy: "+str(policy))
         
 def _round_number(n, value_granularity=None, up=False):
     if not value_granularity:
@@ -160,6 +252,17 @@ def _round_number(n, value_granularity=None, up=False):
             return n-(n % value_granularity)
         else:
             return n-(n % value_granularity) + value_granularity
+
+def _round_numbers(values, value_granularity=None, up=False):
+    """Vectorized version of _round_number over a numpy array."""
+    if not value_granularity:
+        return values
+    else:
+        if not up:
+            return values-np.mod(values, value_granularity)
+        else:
+            return (values-np.mod(values, value_granularity)
+                    + value_granularity)
         
         
 
@@ -6,22 +6,31 @@ from analysis import ProbabilityMap
 from commonLib.nerscLib import (getDBInfo, parseFromSQL_LowMem, 
                                 getSelectedDataFromRows)
 
-from slurm.trace_gen import extract_records 
+from slurm.trace_gen import extract_records, read_trace
 
  
 import numpy as np
 
-def get_jobs_data_trace(file_name, list_trace_location="./list_trace"):
+def get_jobs_data_trace(file_name, list_trace_location=None):
     """
     Parses a trace file and returns a dictionary with lists of the jobs'
     duration, allocated cores, wallclock requested and created epoch timestamp.
     Args:
         file_name: trace file to load.
         list_trace_location: location of slurm simulator list_trace
-        command.
+        command. If None, the file is read directly with read_trace.
     Returns: a dictionary with the keys "duration","totalcores",
         "wallclock_requested", "created".
     """
+    if list_trace_location is None:
+        columns = read_trace(file_name, fields=["duration", "tasks",
+                                                "cpus_per_task", "wclimit",
+                                                "submit"])
+        return dict(duration=columns["duration"].tolist(),
+                    totalcores=(columns["tasks"].astype(int) *
+                                columns["cpus_per_task"]).tolist(),
+                    wallclock_requested=columns["wclimit"].tolist(),
+                    created=columns["submit"].tolist())
     jobs = extract_records(file_name, list_trace_location)  
     data_dic = dict(duration=[], totalcores=[], wallclock_requested=[],
                     created=[])
@@ -7,8 +7,13 @@ usage:
 python generate_trace.pt trace_id
 
 trace_id: numeric id of the experiment.
+
+Env vars:
+- RANDOM_STREAMS: if set to 1, the workload is generated with per random
+    variable streams (check ExperimentRunner.configure).
 """
 
+import os
 import sys
 
 from orchestration import ExperimentDefinition
@@ -31,7 +36,8 @@ ExperimentRunner.configure(
            scheduler_conf_dir="/home/gonzalo/cscs14038bscVIII/slurm_conf",
            local_conf_dir="configs/",
            scheduler_folder="/home/gonzalo/cscs14038bscVIII",
-           manifest_folder="manifests")
+           manifest_folder="manifests",
+           random_streams=(os.getenv("RANDOM_STREAMS", "0")=="1"))
 
 
 central_db_obj = get_central_db()
@@ -172,8 +172,8 @@ for edge in edges:
 
 (all_stamps, all_values, all_stamps_formal, all_values_formal)=(
                     get_waittimes_median_per_period_corrected(
-                                    rt._lists_submit["time_submit"],
-                                    rt._lists_submit["time_start"]))
+                                    rt._lists_submit["time_submit"].tolist(),
+                                    rt._lists_submit["time_start"].tolist()))
 stamps_dic_corrected["all"]=all_stamps
 stamps_dic_corrected["all"]=[float(x-first_stamp)/3600 
                                 for x in stamps_dic_corrected["all"]]
@@ -17,7 +17,7 @@ if len(sys.argv)<2:
 
 
 print("LOADING DATA")
-data_dic=jobAnalysis.get_jobs_data_trace("./data/edison-1000jobs.trace")
+data_dic=jobAnalysis.get_jobs_data_trace(sys.argv[1])
 
 profile(data_dic["duration"], "Trace\nJobs' wall clock (s)",
         "./graphs/trace-duration", "Wall clock (s)",
@@ -3,6 +3,10 @@ Runs analysis on single experiments that have been simulated but not
 analyzed. Data is read and written to a database configured through
 environment vars.
 
+Usage: python run_analysis_exp_delta.py [trace_id] [--jobs N]
+- trace_id: if set, only this experiment is analyzed.
+- --jobs N: analyzes N experiments in parallel, each in its own process.
+
 Env vars:
 - ANALYSIS_DB_HOST: hostname of the system hosting the database.
 - ANALYSIS_DB_NAME: database name to read from.
@@ -13,7 +17,7 @@ Env vars:
 from orchestration import AnalysisWorker
 from orchestration import get_central_db
 from orchestration.running import ExperimentRunner
-import sys
+import argparse
 ExperimentRunner.configure(
            trace_folder="/home/gonzalo/cscs14038bscVIII",
            trace_generation_folder="tmp", 
@@ -24,12 +28,16 @@ ExperimentRunner.configure(
            scheduler_folder="/home/gonzalo/cscs14038bscVIII",
            manifest_folder="manifests")
 
-trace_id=None
-if len(sys.argv)>=2:
-    trace_id=sys.argv[1]
+parser = argparse.ArgumentParser()
+parser.add_argument("trace_id", nargs="?", default=None,
+                    help="analyze only the experiment with this trace_id.")
+parser.add_argument("--jobs", type=int, default=1,
+                    help="number of experiments analyzed in parallel.")
+args = parser.parse_args()
+trace_id=args.trace_id
 
 central_db_obj = get_central_db()
 
 ew = AnalysisWorker()
 
-ew.do_work_delta(central_db_obj, trace_id=trace_id)
+ew.do_work_delta(central_db_obj, trace_id=trace_id, jobs=args.jobs)
@@ -26,6 +26,8 @@ Env vars:
 - SLURMDB_USER: user to be used to access the slurm database.
 - SLURMDB_PASS: password to be used torace used to access the slurm database.
 - SLURMDB_PORT: port on which the slurm database runs.
+- RANDOM_STREAMS: if set to 1, workloads are generated with per random
+    variable streams (check ExperimentRunner.configure).
 
  
 """
@@ -65,7 +67,8 @@ ExperimentRunner.configure(
            scheduler_conf_dir="/scsf/slurm_conf",
            local_conf_dir="configs/",
            scheduler_folder="/scsf/",
-           manifest_folder="manifests")
+           manifest_folder="manifests",
+           random_streams=(os.getenv("RANDOM_STREAMS", "0")=="1"))
 central_db_obj = get_central_db()
 sched_db_obj = get_sim_db(simulator_ip)
 
@@ -0,0 +1,67 @@
+"""
+Runs simulation on single experiments on all the worker vms listed in a hosts
+file, from a single process. Each worker runs one experiment at a time, and
+experiments are claimed by workers as they become free. It requires a database
+to store the simulation results and to have access to the slurm database in
+the workers. Database access data is configured through environment variables.
+
+Experiment info is pulled from the central database.
+
+Usage:
+
+python run_sim_exp_hosts.py [hosts_file]
+
+- hosts_file: file with the ip addresses of the workers, one per line. Lines
+    containing "!" are ignored. If not set, ./hosts.list is used.
+
+Env vars:
+- ANALYSIS_DB_HOST: hostname of the system hosting the central database.
+- ANALYSIS_DB_NAME: database name to write central to and read experiment info
+    from.
+- ANALYSIS_DB_USER: user to be used to access the central database.
+- ANALYSIS_DB_PASS: password to be used to used to access the central database.
+- ANALYSIS_DB_PORT: port on which the central database runs.
+- SLURM_DB_NAME: slurm database name of the slurm worker. If not set takes
+    slurm_acct_db.
+- SLURMDB_USER: user to be used to access the slurm database.
+- SLURMDB_PASS: password to be used torace used to access the slurm database.
+- SLURMDB_PORT: port on which the slurm database runs.
+- RANDOM_STREAMS: if set to 1, workloads are generated with per random
+    variable streams (check ExperimentRunner.configure).
+- SIM_MAX_POLL_TIME: maximum time in seconds between two checks of a running
+    simulation. 300 if not set.
+
+"""
+import os
+import sys
+
+from orchestration import ExperimentWorker
+from orchestration import get_central_db, get_sim_db, get_worker_hosts
+from orchestration.running import ExperimentRunner
+
+
+hosts_file = "./hosts.list"
+
+if len(sys.argv)>=2:
+    hosts_file = sys.argv[1]
+
+hostnames = get_worker_hosts(hosts_file)
+print ("Running experiments on: {0}".format(", ".join(hostnames)))
+
+ExperimentRunner.configure(
+           trace_folder="/tmp/",
+           trace_generation_folder=os.getenv("TRACES_TMP_DIR", "tmp"),
+           local=False,
+           run_hostname=None,
+           run_user=None,
+           scheduler_conf_dir="/scsf/slurm_conf",
+           local_conf_dir="configs/",
+           scheduler_folder="/scsf/",
+           manifest_folder="manifests",
+           random_streams=(os.getenv("RANDOM_STREAMS", "0")=="1"),
+           max_poll_time=int(os.getenv("SIM_MAX_POLL_TIME", "300")))
+central_db_obj = get_central_db()
+
+ew = ExperimentWorker()
+
+ew.do_work_hosts(central_db_obj, hostnames, get_sched_db=get_sim_db)
@@ -1,23 +1,59 @@
 from commonLib import tunnelLib
 from commonLib.Logging import *
+from contextlib import contextmanager
 import datetime
 import gc
+import os
+import tempfile
+import threading
 
 import MySQLdb as mdb
 
 
+def _thread_local_attribute(name, default):
+    """Returns a property which value is kept per thread, so a DB object
+    can be used concurrently by several threads, each with its own
+    connection."""
+    def getter(self):
+        return getattr(self._local, name, default)
+    def setter(self, value):
+        setattr(self._local, name, value)
+    return property(getter, setter)
+
+
 class DB:
     hostName="localhost"
     dbName="nersc"
     userName="nersc"
     password="nersc"
     port="3306"
-#    con=False    
+    con=_thread_local_attribute("con", False)
+    _in_transaction=_thread_local_attribute("in_transaction", False)
+    _cursor=_thread_local_attribute("cursor", None)
+    _session_depth=_thread_local_attribute("session_depth", 0)
+    _con_depth=_thread_local_attribute("con_depth", 0)
     
     
     def __init__(self, hostName, dbName, userName, password, port="3306",
-                 useTunnel=False, test_db_mysqld=None):
-        self.con=False
+                 useTunnel=False, test_db_mysqld=None, local_infile=False,
+                 pool_size=None, pool_timeout=60):
+        """Constructor
+        Args:
+        - hostName, dbName, userName, password, port: connection parameters
+            of the MySQL database.
+        - useTunnel: if True, connections are established through a
+            tunnelLib.Tunnel.
+        - test_db_mysqld: if set, testing.mysqld object to connect to.
+        - local_infile: if True, connections allow LOAD DATA LOCAL INFILE.
+        - pool_size: if set, connections are not closed after each
+            statement but returned to a pool shared by all the DB objects with
+            the same connection parameters. At most pool_size connections are
+            open at the same time. Not compatible with useTunnel.
+        - pool_timeout: maximum time in seconds to wait for a connection of
+            the pool to be free. If it expires, ConnectionPoolTimeout is
+            raised.
+        """
+        self._local=threading.local()
         self.hostName=hostName
         self.dbName=dbName
         self.userName=userName
@@ -25,10 +61,22 @@ class DB:
         self.port=port
         self.useTunnel=useTunnel
         if (useTunnel):
+            if pool_size:
+                raise ValueError("Connection pools cannot use a tunnel")
             self.tunnel=tunnelLib.Tunnel()
-        self._in_transaction=False
-        self._cursor=None
         self._test_db_mysqld=test_db_mysqld
+        self.local_infile=local_infile
+        self.pool_size=pool_size
+        self.pool_timeout=pool_timeout
+    
+    def __getstate__(self):
+        state=dict(self.__dict__)
+        del state["_local"]
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local=threading.local()
         
     def start_transaction(self):
         if not self.connect():
@@ -48,6 +96,26 @@ class DB:
         self.disconnect()
         self._cursor.close()
         self._cursor=None
+    
+    @contextmanager
+    def session(self):
+        """Context manager that keeps a connection open while active: all the
+        statements issued by this thread inside the with block run on the same
+        connection, instead of connecting and disconnecting for each one.
+        Sessions can be nested.
+        Usage:
+            with db_obj.session():
+                db_obj.doQuery(...)
+                db_obj.doUpdate(...)
+        """
+        if not self.connect():
+            raise Exception("Cannot connect at session start")
+        self._session_depth+=1
+        try:
+            yield self
+        finally:
+            self._session_depth-=1
+            self.disconnect()
         
     def get_cursor(self):
         if not self._in_transaction or self._cursor==None:
@@ -55,31 +123,71 @@ class DB:
         return self._cursor    
     
     def connect(self):
-        if self._in_transaction:
+        if self._in_transaction or self._session_depth:
+            return True
+        if self.con is not False:
+            # Nested use of the connection held by this thread, it is
+            # released by the outermost disconnect.
+            self._con_depth+=1
             return True
-                #print "DB", self.port
-        if (self.useTunnel):
-            self.tunnel.connect()
         try:
-            if self._test_db_mysqld:
-                self.con = mdb.connect(**self._test_db_mysqld.dsn()) 
-            else:
-                self.con = mdb.connect(self.hostName, self.userName, self.password, self.dbName, port=int(self.port))
-    
+            self.con = self._get_connection()
             return True
         except mdb.Error as e:
             Log.log("Error %d: %s" % (e.args[0],e.args[1]))
+            return False
+    
+    def _get_connection(self):
+        """Returns a new connection, or one from the pool if pool_size is
+        set. It has to be returned with _release_connection."""
+        if self.pool_size:
+            return self._get_pool().checkout()
+        if (self.useTunnel):
+            self.tunnel.connect()
+        try:
+            return self._open_connection()
+        except mdb.Error:
             if (self.useTunnel):
               self.tunnel.disconnect()
-            return False
+            raise
+    
+    def _release_connection(self, con):
+        if self.pool_size:
+            self._get_pool().checkin(con)
+            return
+        con.close()
+        if (self.useTunnel):
+            self.tunnel.disconnect()
+    
+    def _open_connection(self):
+        extra_args={}
+        if self.local_infile:
+            extra_args["local_infile"]=1
+        if self._test_db_mysqld:
+            return mdb.connect(**dict(self._test_db_mysqld.dsn(),
+                                      **extra_args))
+        return mdb.connect(self.hostName, self.userName, self.password,
+                           self.dbName, port=int(self.port), **extra_args)
+    
+    def _get_pool(self):
+        key=(self.hostName, self.dbName, self.userName, str(self.port),
+             self.local_infile, id(self._test_db_mysqld))
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key]=ConnectionPool(self._open_connection,
+                                           self.pool_size,
+                                           timeout=self.pool_timeout)
+            return _pools[key]
         
     def disconnect(self):
-        if (self.con==False or self._in_transaction):
+        if (self.con==False or self._in_transaction or self._session_depth):
+            return
+        if self._con_depth:
+            self._con_depth-=1
             return
-        self.con.close()
+        con=self.con
         self.con=False
-        if (self.useTunnel):
-            self.tunnel.disconnect()
+        self._release_connection(con)
 
     
     
@@ -98,7 +206,8 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))    
                 rows=False
-            self.disconnect()
+            finally:
+                self.disconnect()
         return rows
     
     # THe same but the result is a dictorionary list
@@ -115,7 +224,8 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))
                 rows=False    
-            self.disconnect()
+            finally:
+                self.disconnect()
         return rows
     
     def delete_rows(self, table, id_field, id_value, like_field=None,
@@ -143,7 +253,8 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))    
                 ok=False
-            self.disconnect()
+            finally:
+                self.disconnect()
         return ok, insert_id
         
     def doUpdateMany(self, query, values):
@@ -152,7 +263,6 @@ class DB:
             try:
                 cur=self.get_cursor()
             
-                print("Q;v", query, values)
                 res=cur.executemany(query, values)
                 if not self._in_transaction:
                     self.con.commit()
@@ -160,7 +270,8 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))    
                 ok=False
-            self.disconnect()
+            finally:
+                self.disconnect()
         return ok
     
     
@@ -180,7 +291,8 @@ class DB:
                 print("EEEEERRRRRROOOOOOORRRR", e)
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))    
                 ok=False
-            self.disconnect()
+            finally:
+                self.disconnect()
         return ok
     
     def q(self, cad):
@@ -204,7 +316,9 @@ class DB:
 #            else:
             if (commas):
                 field="`"+str(field)+"`"
-            if (isText):
+            if (isText and isinstance(field, bytes)):
+                query+="X'"+field.hex()+"'"
+            elif (isText):
                 query+=self.q(str(field))
             else:
                 query+=str(field)
@@ -257,8 +371,83 @@ class DB:
             if (query==""):
                 query=self.doInsertQueryMany(table, keys,values)
             queryList.append(tuple(self.cleanFields(values, False)))
-        print ("QueryList", queryList)
         self.doUpdateMany(query, queryList)
+    
+    def insertValuesColumnsBulk(self, table, columns_dic, fixedFields={},
+                                chunk_size=5000, use_load_data=False):
+        """Inserts the rows contained in a dictionary of columns. Rows are
+        sent in chunks of bounded size (so max_allowed_packet does not limit
+        the number of rows) and all chunks are inserted in a single
+        transaction: either all rows are inserted or none.
+        Args:
+        - table: name of the table to insert into.
+        - columns_dic: dictionary of lists or numpy arrays, indexed by field
+            name. All of the same length.
+        - fixedFields: dictionary of field names and values that are common
+            to all the rows.
+        - chunk_size: maximum number of rows sent per statement.
+        - use_load_data: if True, each chunk is written to a temporary tab
+            separated file and loaded with LOAD DATA LOCAL INFILE. Requires
+            the object to be created with local_infile=True and the server
+            to accept local_infile. Otherwise, multi-row INSERTs are used.
+        Returns: True if all the rows were inserted.
+        """
+        column_keys = list(columns_dic.keys())
+        keys = list(fixedFields.keys()) + column_keys
+        fixed_values = tuple(fixedFields.values())
+        count = 0
+        if column_keys:
+            count = len(columns_dic[column_keys[0]])
+        if count == 0:
+            return True
+        if use_load_data and not self.local_infile:
+            raise ValueError("use_load_data requires local_infile=True")
+        if not self.connect():
+            return False
+        fields_text=self.concatFields(keys, commas=True)
+        ok=True
+        cur=None
+        try:
+            cur=self.get_cursor()
+            for start in range(0, count, chunk_size):
+                chunk_columns = [_get_column_chunk(columns_dic[x], start,
+                                                   start+chunk_size)
+                                 for x in column_keys]
+                rows = [fixed_values+row for row in zip(*chunk_columns)]
+                if use_load_data:
+                    self._load_data_rows(cur, table, fields_text, rows)
+                else:
+                    row_text = "("+", ".join(["%s"]*len(keys))+")"
+                    query=("INSERT INTO `"+table+"` ("+fields_text+
+                           ") VALUES "+", ".join([row_text]*len(rows)))
+                    cur.execute(query, [x for row in rows for x in row])
+            if not self._in_transaction:
+                self.con.commit()
+        except mdb.Error as e:
+            Log.log("Error %d: %s" % (e.args[0],e.args[1]))
+            ok=False
+            if not self._in_transaction:
+                self.con.rollback()
+        finally:
+            if not self._in_transaction and cur is not None:
+                cur.close()
+            self.disconnect()
+        return ok
+    
+    def _load_data_rows(self, cur, table, fields_text, rows):
+        tsv_file = tempfile.NamedTemporaryFile(mode="w", suffix=".tsv",
+                                               delete=False)
+        try:
+            for row in rows:
+                tsv_file.write("\t".join([_to_load_data_field(x)
+                                          for x in row])+"\n")
+            tsv_file.close()
+            cur.execute("LOAD DATA LOCAL INFILE %s INTO TABLE `"+table+"`"
+                        " CHARACTER SET utf8 ("+fields_text+")",
+                        [tsv_file.name])
+        finally:
+            tsv_file.close()
+            os.remove(tsv_file.name)
 
         
                 
@@ -321,7 +510,8 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))
                 rows=False    
-            self.disconnect()
+            finally:
+                self.disconnect()
         return rows
     
     def getValuesAsColumns(self, table, fields, condition="TRUE", orderBy=None,
@@ -361,9 +551,61 @@ class DB:
             except mdb.Error as e:
                 Log.log("Error %d: %s" % (e.args[0],e.args[1]))
                 rows=False    
-            self.disconnect()
+            finally:
+                self.disconnect()
         return columns
     
+    
+    def getValuesChunks(self, table, fields, condition="TRUE", orderBy=None,
+                        chunk_size=10000):
+        """Generator that reads rows of a table through a server side
+        (unbuffered) cursor, so the result set is never held in memory at
+        once.
+        Args:
+        - table: name of the table to read from.
+        - fields: list of names of the fields to read.
+        - condition: SQL condition of the rows to read.
+        - orderBy: if set, SQL expression to order the rows by.
+        - chunk_size: maximum number of rows per produced chunk.
+        Yields: lists of up to chunk_size tuples. Each tuple contains the
+            values of fields in a row.
+        
+        Outside of transactions and sessions, the rows are read through a
+        connection of the generator, so other statements can be issued
+        while it is open.
+        """
+        query="SELECT "
+        query+=self.concatFields(fields, commas=True)
+        query+=" FROM "+table
+        if condition!=None:
+            query+=" WHERE "+condition
+        if orderBy!=None:
+            query+=" ORDER BY "+orderBy
+        own_con=not (self._in_transaction or self._session_depth)
+        if own_con:
+            try:
+                con=self._get_connection()
+            except mdb.Error as e:
+                Log.log("Error %d: %s" % (e.args[0],e.args[1]))
+                return
+        else:
+            con=self.con
+        cur=None
+        try:
+            cur=con.cursor(mdb.cursors.SSCursor)
+            cur.execute(query)
+            while True:
+                rows=cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        except mdb.Error as e:
+            Log.log("Error %d: %s" % (e.args[0],e.args[1]))
+        finally:
+            if cur is not None:
+                cur.close()
+            if own_con:
+                self._release_connection(con)
                 
     def getValuesDicList_LowMem(self, table, fields, condition="TRUE", orderBy="None"):
         rows = []
@@ -451,8 +693,117 @@ class DB:
         for row in rows:
             return row[field]
         return ""
-            
-        
-        
-        
-        
\ No newline at end of file
+
+
+class ConnectionPoolTimeout(Exception):
+    """Raised when no connection of a ConnectionPool is returned in time."""
+    pass
+
+
+class ConnectionPool(object):
+    """Bounded pool of reusable database connections. Connections are checked
+    with a ping when taken from the pool and re-opened if dead. If all the
+    connections are in use, checkout waits until one is returned. A pool
+    inherited by a forked process discards the parent's connections."""
+    def __init__(self, connect_function, max_size=4, timeout=60):
+        """Constructor
+        Args:
+        - connect_function: function that opens and returns a new connection.
+        - max_size: maximum number of connections open at the same time.
+        - timeout: maximum time in seconds that checkout waits for a
+            connection to be returned. If None, it waits forever.
+        """
+        self._connect_function=connect_function
+        self._max_size=max_size
+        self._timeout=timeout
+        self._idle=[]
+        self._lock=threading.Lock()
+        self._slots=threading.BoundedSemaphore(max_size)
+        self._pid=os.getpid()
+    
+    def checkout(self):
+        """Returns an open connection for exclusive use of the caller until
+        it is returned with checkin. Raises ConnectionPoolTimeout if all the
+        connections are still in use after the pool's timeout."""
+        self._check_fork()
+        if not self._slots.acquire(timeout=self._timeout):
+            raise ConnectionPoolTimeout(
+                    "No free connection in the pool after {0}s".format(
+                                                            self._timeout))
+        try:
+            while True:
+                con=self._pop_idle()
+                if con is None:
+                    return self._connect_function()
+                if self._is_alive(con):
+                    return con
+                self._close(con)
+        except:
+            self._slots.release()
+            raise
+    
+    def checkin(self, con):
+        """Returns a connection to the pool. Any open transaction (and the
+        read snapshot of previous statements) is rolled back."""
+        try:
+            con.rollback()
+            with self._lock:
+                self._idle.append(con)
+        except mdb.Error:
+            self._close(con)
+        finally:
+            self._slots.release()
+    
+    def close_all(self):
+        """Closes all the idle connections of the pool."""
+        with self._lock:
+            idle=self._idle
+            self._idle=[]
+        for con in idle:
+            self._close(con)
+    
+    def _check_fork(self):
+        if self._pid!=os.getpid():
+            self._lock=threading.Lock()
+            self._slots=threading.BoundedSemaphore(self._max_size)
+            self._idle=[]
+            self._pid=os.getpid()
+    
+    def _pop_idle(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return None
+    
+    def _is_alive(self, con):
+        try:
+            con.ping()
+            return True
+        except mdb.Error:
+            return False
+    
+    def _close(self, con):
+        try:
+            con.close()
+        except mdb.Error:
+            pass
+
+_pools={}
+_pools_lock=threading.Lock()
+
+def _get_column_chunk(values, start, stop):
+    """Returns the values of a list or numpy array between start and stop as
+    a list of python values."""
+    chunk = values[start:stop]
+    if hasattr(chunk, "tolist"):
+        return chunk.tolist()
+    return list(chunk)
+
+def _to_load_data_field(value):
+    """Returns the text representation of a value in a LOAD DATA file with
+    the default field and line terminators."""
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n"))
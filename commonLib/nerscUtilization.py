@@ -1,5 +1,4 @@
 import bisect
-import time
 
 import numpy as np
 
@@ -44,12 +43,17 @@ def cutSamples(inTimeStamps, sampleUse, shiftValue):
 
 
 class UtilizationEngine:
-
-    
+    """Calculates the utilization curve of a system from the start times,
+    durations and allocated resources of its jobs. Job start and end events
+    are sorted and accumulated on numpy arrays. Jobs still running at the end
+    of a processUtilization call are kept as pending endings, so a preload
+    call can be followed by the actual analysis call."""
     
     def __init__(self):
-        self.endingJobsTime=[]
-        self.endingJobsUse=[]
+        self.endingJobsTime=np.zeros(0, dtype=np.int64)
+        self.endingJobsUse=np.zeros(0, dtype=np.int64)
+        self._endingJobsSeq=np.zeros(0, dtype=np.int64)
+        self._jobSeq=0
     
         self.sampleTimeStamp=[]
         self.sampleUse=[]
@@ -85,61 +89,31 @@ class UtilizationEngine:
         print("Target surface", targetSurface)
        
         return float(accummSurface)/float((targetSurface))
-        
-        
-        
-    
-    def changeUse(self, timeStamp, useDelta, doRegister=True):
-        #print "Change USe", timeStamp, useDelta, self.currentUse
-        self.currentUse+=useDelta
-#        if self.currentUse > 153216:
-#            print "over User:", self.currentUse, useDelta
-        if doRegister:
-            self.sampleTimeStamp.append(timeStamp)
-            self.sampleUse.append(self.currentUse)
-        
-        if (self.currentUse<0):
-            print("JODER")
-        
-    
-    def procesEndingJobs(self, timeStamp, doRegister=True):
-        i=0
-        for time, use in zip(self.endingJobsTime, self.endingJobsUse):
-            if  timeStamp is None or time<=timeStamp:
-                #print "job dying", timeStamp
-                self.changeUse(time, -use, doRegister=doRegister)
-                i+=1
-            else:
-                break
-        
-        #print "removing", i
-        self.endingJobsTime=self.endingJobsTime[i:]
-        self.endingJobsUse=self.endingJobsUse[i:]
-        return i
-    
-    def processStartingJob(self, timeStamp, duration, use, doRegister=True):
-        #print "Job Starts", timeStamp, timeStamp+duration
-        index=bisect.bisect_left(self.endingJobsTime, timeStamp+duration)
-        self.endingJobsTime.insert(index, timeStamp+duration)
-        self.endingJobsUse.insert(index, use)
-        
-        self.changeUse(timeStamp, use, doRegister=doRegister)
-        
+
     def apply_waste_deltas(self, waste_stamps, waste_deltas, start_cut=None,
                          end_cut=None):
-        #print ("apply_waste_deltas",  waste_stamps, waste_deltas, start_cut, 
-        #       end_cut)
-        if start_cut and waste_stamps:
+        """Subtracts the resources wasted by single job workflows from the
+        utilization curve. All waste changes are merged with the utilization
+        curve in one pass.
+        Args:
+        - waste_stamps: sorted list of epoch time stamps of the waste
+            changes.
+        - waste_deltas: list of waste changes.
+        - start_cut: if set, waste changes before this time stamp are
+            ignored.
+        - end_cut: if set, waste changes after this time stamp are ignored.
+        Returns: the list of epoch timestamps where utilization changes
+            happen, and the list of utilization values after each change.
+        """
+        if start_cut and len(waste_stamps):
             pos = bisect.bisect_left(waste_stamps, start_cut)
             waste_stamps=waste_stamps[pos:]
             waste_deltas=waste_deltas[pos:]
-        if end_cut and waste_stamps:
+        if end_cut and len(waste_stamps):
             pos = bisect.bisect_right(waste_stamps, end_cut)
             waste_stamps=waste_stamps[:pos]
             waste_deltas=waste_deltas[:pos]
-        #print ("apply_waste_deltas after",  waste_stamps, waste_deltas, start_cut, 
-        #       end_cut)
-        if waste_stamps:
+        if len(waste_stamps):
             self.sampleTimeStamp, self.sampleUse = _apply_deltas_usage(
                      self.sampleTimeStamp, self.sampleUse,
                      waste_stamps, waste_deltas, neg=True)
@@ -149,76 +123,145 @@ class UtilizationEngine:
     def processUtilization(self, timeStamps, durations, resourceUse, 
                            startCut=None, endCut=None, 
                            preloadDone=False, doingPreload=False):
+        """Produces the utilization curve of a list of jobs. Each job start
+        or end is a utilization change. Job ends happening at the same time
+        as a job start are processed before it.
+        Args:
+        - timeStamps: list of epoch start times of the jobs. Jobs starting
+            before 1 are ignored.
+        - durations: list of runtimes in seconds of the jobs.
+        - resourceUse: list of resources (e.g. cores) allocated to the jobs.
+        - startCut: if set, jobs starting before this epoch timestamp are
+            ignored.
+        - endCut: if set, jobs starting at or after this epoch timestamp are
+            ignored, and the curve ends at endCut.
+        - preloadDone: if True, the running jobs and use from the previous
+            call are kept, and the curve starts at startCut.
+        - doingPreload: if True, no utilization change is recorded, the
+            call only loads the jobs running at endCut.
+        Returns: the list of epoch timestamps where utilization changes
+            happen, and the list of utilization values after each change.
+        """
         self.sampleTimeStamp=[]
         self.sampleUse=[]
             
         if (not preloadDone):
-            self.endingJobsTime=[]
-            self.endingJobsUse=[]
+            self.endingJobsTime=np.zeros(0, dtype=np.int64)
+            self.endingJobsUse=np.zeros(0, dtype=np.int64)
+            self._endingJobsSeq=np.zeros(0, dtype=np.int64)
 
             self.currentUse=0
-
-        first_stamp_registered=False
-        steps=float(len(timeStamps))
-        step=0.0
-        for time, jobDuration, jobUse in zip(timeStamps, durations, 
-                                             resourceUse):
-            if (startCut!=None and time<startCut):
-                continue
-            if preloadDone and not first_stamp_registered:
-                if startCut!=time:
-                    self.changeUse(startCut, 0, True)
-                first_stamp_registered=True
-            if (endCut!=None and time>=endCut):
-                break
-            if (time<1):
-                continue
-            percent=(step/steps*100)
-            if (percent%5.0==0.0):
-                print("Progress: "+str( percent)+"%")
-                
-            
-            time=int(time)
-            jobDuration=int(jobDuration)
-            jobUse=int(jobUse)
-            
-            
-            
-            self.procesEndingJobs(time, doRegister=not doingPreload)
-            self.processStartingJob(time, jobDuration, jobUse, 
-                                    doRegister=not doingPreload)
-            step+=1.0
+        
+        starts = np.asarray(timeStamps, dtype=np.float64)
+        selected = np.ones(len(starts), dtype=bool)
+        if startCut!=None:
+            selected &= starts>=startCut
+        first_pos = np.flatnonzero(selected)
+        if endCut!=None:
+            over_pos = np.flatnonzero(selected & (starts>=endCut))
+            if len(over_pos):
+                selected[over_pos[0]:] = False
+        if preloadDone and len(first_pos):
+            if startCut!=starts[first_pos[0]]:
+                self.sampleTimeStamp.append(startCut)
+                self.sampleUse.append(self.currentUse)
+        selected &= starts>=1
+        
+        starts = starts[selected].astype(np.int64)
+        ends = starts+np.asarray(durations, 
+                                 dtype=np.float64)[selected].astype(np.int64)
+        uses = np.asarray(resourceUse, 
+                          dtype=np.float64)[selected].astype(np.int64)
+        order = np.argsort(starts, kind="stable")
+        starts, ends, uses = starts[order], ends[order], uses[order]
+        job_count = len(starts)
+        seqs = np.arange(self._jobSeq, self._jobSeq+job_count, dtype=np.int64)
+        self._jobSeq+=job_count
+        
+        # A job end is processed right before the first start later than its
+        # own start that happens at or after the end time.
+        end_pos = np.maximum(np.searchsorted(starts, ends, side="left"),
+                             np.arange(1, job_count+1))
+        pending_pos = np.searchsorted(starts, self.endingJobsTime, 
+                                      side="left")
+        all_end_pos = np.concatenate([pending_pos, end_pos])
+        all_ends = np.concatenate([self.endingJobsTime, ends])
+        all_end_uses = np.concatenate([self.endingJobsUse, uses])
+        all_end_seqs = np.concatenate([self._endingJobsSeq, seqs])
+        
+        processed = all_end_pos<job_count
+        if not doingPreload:
+            if endCut is None:
+                processed[:] = True
+            else:
+                processed |= all_ends<=endCut
+        
+        # Events are sorted by position in the start list, ends before the
+        # start at the same position, ends by time, and same time ends in
+        # reverse start order.
+        event_pos = np.concatenate([all_end_pos[processed],
+                                    np.arange(job_count)])
+        event_kind = np.concatenate([np.zeros(np.count_nonzero(processed),
+                                              dtype=np.int64),
+                                     np.ones(job_count, dtype=np.int64)])
+        event_stamps = np.concatenate([all_ends[processed], starts])
+        event_seqs = np.concatenate([-all_end_seqs[processed],
+                                     np.zeros(job_count, dtype=np.int64)])
+        event_deltas = np.concatenate([-all_end_uses[processed], uses])
+        event_order = np.lexsort((event_seqs, event_stamps, event_kind,
+                                  event_pos))
+        event_use = self.currentUse+np.cumsum(event_deltas[event_order])
+        
+        if not doingPreload:
+            self.sampleTimeStamp+=event_stamps[event_order].tolist()
+            self.sampleUse+=event_use.tolist()
+        if len(event_use):
+            self.currentUse=int(event_use[-1])
+        
+        pending = ~processed
+        pending_order = np.lexsort((-all_end_seqs[pending], all_ends[pending]))
+        self.endingJobsTime = all_ends[pending][pending_order]
+        self.endingJobsUse = all_end_uses[pending][pending_order]
+        self._endingJobsSeq = all_end_seqs[pending][pending_order]
+        
         if not doingPreload:
-            self.procesEndingJobs(endCut)
             if endCut is not None and self.sampleTimeStamp[-1]!=endCut:
-                self.changeUse(endCut, 0, True)
+                self.sampleTimeStamp.append(endCut)
+                self.sampleUse.append(self.currentUse)
         return self.sampleTimeStamp, self.sampleUse
 
 def _apply_deltas_usage(stamps_list, usage_list, stamps, usage, neg=False):
-    """Applies a list of usage deltas over a list of absolute usage values."""
+    """Applies a list of usage deltas over a list of absolute usage values.
+    Both lists are step functions: the usage at any time is the absolute
+    value of the last previous stamp plus the sum of all previous deltas.
+    Args:
+    - stamps_list: list of epoch time stamps of the absolute usage values.
+    - usage_list: list of absolute usage values.
+    - stamps: list of epoch time stamps of the usage deltas.
+    - usage: list of usage deltas.
+    - neg: if True, the deltas are subtracted instead of added.
+    Returns: the list of time stamps, including those of the deltas not
+        present in stamps_list, and the list of the resulting usage values.
+    """
+    base_stamps = np.asarray(stamps_list)
+    base_usage = np.asarray(usage_list)
+    delta_stamps = np.asarray(stamps)
+    deltas = np.asarray(usage)
     if neg: 
-        usage = [-x for x in usage]
-    for (st_1, st_2, us) in zip(stamps[:-1], stamps[1:], usage):
-        pos_init = bisect.bisect_left(stamps_list, st_1)
-        pos_end = bisect.bisect_left(stamps_list, st_2)
-        if _create_point_between(pos_init, st_1, stamps_list, usage_list):
-            pos_end+=1
-        if _create_point_between(pos_end, st_2, stamps_list, usage_list):
-            pos_end+=1
-        for pos in range(pos_init, pos_end):
-            usage_list[pos]+=us       
-    usage_list[pos_end-1]+=usage[-1]            
-    return stamps_list, usage_list 
-
-def _create_point_between(pos, key, key_list, value_list):
-    if (pos==(len(key_list)) or key!=key_list[pos]):
-        prev=0
-        if pos>0:
-            prev=value_list[pos-1]
-        key_list.insert(pos, key)
-        value_list.insert(pos, prev)
-        return True
-    return False
-
-
-
+        deltas = -deltas
+    
+    new_stamps = np.unique(delta_stamps[~np.isin(delta_stamps, base_stamps)])
+    insert_pos = np.searchsorted(base_stamps, new_stamps, side="left")
+    new_usage = np.zeros(len(new_stamps),
+                         dtype=np.result_type(base_usage, deltas))
+    has_prev = insert_pos>0
+    new_usage[has_prev] = base_usage[insert_pos[has_prev]-1]
+    all_stamps = np.insert(base_stamps, insert_pos, new_stamps)
+    all_usage = np.insert(base_usage, insert_pos, new_usage)
+    
+    delta_order = np.argsort(delta_stamps, kind="stable")
+    acc_deltas = np.concatenate([[0], np.cumsum(deltas[delta_order])])
+    delta_pos = np.searchsorted(delta_stamps[delta_order], all_stamps,
+                                side="right")
+    all_usage = all_usage+acc_deltas[delta_pos]
+    return all_stamps.tolist(), all_usage.tolist()
@@ -4,6 +4,7 @@ Functions and code generate workloads
 from analysis import ProbabilityMap
 import bisect
 import datetime
+import heapq
 import random
 import random_control
 
@@ -114,6 +115,7 @@ class WorkloadGenerator(object):
                 accounts to be repsent int he job trace 
         """
         self._machine = machine
+        self._machine.set_random_streams()
         self._trace_generator = trace_generator
         self._time_controller = TimeController(
                                         machine.get_inter_arrival_generator())
@@ -127,19 +129,24 @@ class WorkloadGenerator(object):
 
         from generate.special.workflow_percent import WorkflowPercent
 
-        self._workload_selector = WorkflowPercent(self._random_gen,
+        self._workload_selector = WorkflowPercent(
+                                            self.get_random_gen("workload"),
                                                   trace_generator,
                                                   self._time_controller,
                                                   machine.get_total_cores())
         self._workload_selector.set_remaining(self)
         
         self._pattern_timers = []
+        self._timers_queue = None
+        self._polled_timers = []
         
         self._filter_func = None
         self._filter_cores = None
         self._filter_runtime = None
         self._filter_core_hours = None
         self._disable_generate_workload_element=False
+        self._job_details_batch_size = None
+        self._job_details_buffer = []
     
     def generate_trace(self, start_date_time, run_time_limit, job_limit=None):
         """
@@ -191,6 +198,34 @@ class WorkloadGenerator(object):
     def set_max_interarrival(self, max_interarrival):
         self._time_controller.set_max_interarrival(max_interarrival)
     
+    def set_job_details_batch_size(self, batch_size):
+        """Configures the generator to produce the jobs' cores, wall clock
+        limit, and runtime in batches of batch_size jobs. Batches are faster
+        to produce, but the resulting trace differs from the one produced
+        without batches for the same seed, unless random_control streams are
+        enabled.
+        Args:
+            - batch_size: number of jobs to produce in each batch. If None
+                or <=1, job details are produced one job at a time.
+        """
+        if batch_size is not None and batch_size<=1:
+            batch_size = None
+        self._job_details_batch_size = batch_size
+        self._job_details_buffer = []
+    
+    def _get_new_job_details(self):
+        """Returns the number of cores, requested wall clock, and runtime for
+        a new job. If configured, they are taken from a pre-calculated batch.
+        """
+        if self._job_details_batch_size is None:
+            return self._machine.get_new_job_details()
+        if not self._job_details_buffer:
+            self._job_details_buffer = (
+                        self._machine.get_new_job_details_batch(
+                                            self._job_details_batch_size))
+            self._job_details_buffer.reverse()
+        return self._job_details_buffer.pop()
+    
     def config_filter_func(self, filter_func):
         self._filter_func=filter_func
         
@@ -211,7 +246,7 @@ class WorkloadGenerator(object):
         qos=self._get_qos()
         partition=self._get_partition()
         account=self._get_account()
-        cores_v, wc_limit_v, run_time_v = self._machine.get_new_job_details()
+        cores_v, wc_limit_v, run_time_v = self._get_new_job_details()
         if cores is None:
             cores=cores_v
         if wc_limit is None:
@@ -252,7 +287,7 @@ class WorkloadGenerator(object):
          
         if not cores or not wclimit or not duration:
             cores_pre, wc_limit_pre, run_time_pre = (       
-                                            self._machine.get_new_job_details())
+                                            self._get_new_job_details())
         if cores is None:
             cores = cores_pre
         if wclimit is None:
@@ -292,43 +327,86 @@ class WorkloadGenerator(object):
                                       real_core_s=cores_s_real)
         return job_id
         
+    def get_random_gen(self, stream_name):
+        """Returns the random generator to be used for the random variable
+        stream_name: its random_control stream if streams are enabled, the
+        global random generator otherwise."""
+        return random_control.get_random_stream(stream_name,
+                                                default=self._random_gen)
+        
     def _get_user(self, no_random=False):
         return self._get_random_in_list(self._user_list, 
-                                        no_random=no_random)
+                                        no_random=no_random,
+                                        stream_name="user")
     
     def _get_qos(self, no_random=False):
         return self._get_random_in_list(self._qos_list,
-                                        no_random=no_random)
+                                        no_random=no_random,
+                                        stream_name="qos")
     
     def _get_partition(self, no_random=False):
         return self._get_random_in_list(self._partition_list,
-                                        no_random=no_random)
+                                        no_random=no_random,
+                                        stream_name="partition")
     
     def _get_account(self, no_random=False):
         return self._get_random_in_list(self._account_list,
-                                        no_random=no_random)
+                                        no_random=no_random,
+                                        stream_name="account")
     
     def _get_random_in_list(self, value_list,
-                            no_random=False): 
+                            no_random=False, stream_name=None): 
         if len(value_list)==1 or no_random:
             return value_list[0]
-        pos=self._random_gen.randint(0, len(value_list)-1)
+        random_stream = None
+        if stream_name is not None:
+            random_stream = random_control.get_random_stream(stream_name)
+        if random_stream is not None:
+            pos=int(random_stream.integers(0, len(value_list)))
+        else:
+            pos=self._random_gen.randint(0, len(value_list)-1)
         return value_list[pos]
     
     def _pattern_generator_timers_trigger(self, timestamp):
-        """ Triggers registered pattern timers with timestamp. Purge those that
-        are done.
+        """ Triggers registered pattern timers that are due at timestamp, and
+        those that have to be called at every step. Timers are kept in a
+        priority queue by their next trigger time, so timers that are not due
+        are not called. Due timers are triggered in registration order. Purge
+        those that are done.
         """
+        if self._timers_queue is None:
+            self._schedule_pattern_timers()
+        due_timers = self._polled_timers
+        self._polled_timers = []
+        while self._timers_queue and self._timers_queue[0][0]<=timestamp:
+            next_time, pos, timer = heapq.heappop(self._timers_queue)
+            due_timers.append((pos, timer))
+        
         count = 0
-        new_pattern_timers = []
-        for timer in self._pattern_timers:
+        purged_timers = []
+        for (pos, timer) in sorted(due_timers, key=lambda x: x[0]):
             count += timer.do_trigger(timestamp)
-            if not timer.can_be_purged():
-                new_pattern_timers.append(timer)
-        
-        self._pattern_timers= new_pattern_timers
+            if timer.can_be_purged():
+                purged_timers.append(timer)
+            else:
+                self._schedule_pattern_timer(pos, timer)
+        if purged_timers:
+            self._pattern_timers = [x for x in self._pattern_timers
+                                    if not x in purged_timers]
         return count
-            
+    
+    def _schedule_pattern_timers(self):
+        self._timers_queue = []
+        self._polled_timers = []
+        for (pos, timer) in enumerate(self._pattern_timers):
+            self._schedule_pattern_timer(pos, timer)
+    
+    def _schedule_pattern_timer(self, pos, timer):
+        next_time = timer.get_next_trigger_time()
+        if next_time is None:
+            self._polled_timers.append((pos, timer))
+        else:
+            heapq.heappush(self._timers_queue, (next_time, pos, timer))
     
     def register_pattern_generator_timer(self,timer):
         """Registers an workload pattern generator that is driven
@@ -340,10 +418,12 @@ class WorkloadGenerator(object):
             - timer: PatternTimer object that will govern when the 
         """
         self._pattern_timers.append(timer)
+        self._timers_queue = None
     
     def set_all_time_controllers(self):
         for timer in self._pattern_timers:
             timer.register_time(self._time_controller.get_current_time())
+        self._timers_queue = None
                 
     
     def register_pattern_generator_share(self, pattern_generator,
@@ -0,0 +1,69 @@
+"""
+Process wide cache of workflow manifests. Each manifest file is read once
+per process (and again only if the file changes), and the values calculated
+from it (e.g. task graph, waste profile) are calculated once and reused.
+"""
+import json
+import os
+
+
+class ManifestCache(object):
+    """Cache of manifest files contents indexed by their route. Values
+    derived from a manifest are stored next to it and discarded when the
+    manifest file is modified.
+
+    Returned objects are shared by all the users of the cache and must not
+    be modified.
+    """
+    def __init__(self):
+        self._entries={}
+
+    def get_manifest(self, manifest_route):
+        """Returns the dictionary with the content of the json manifest file
+        in manifest_route.
+        Args:
+        - manifest_route: file route pointing to a json manifest file.
+        """
+        return self._get_entry(manifest_route)["manifest"]
+
+    def get_cores_runtime(self, manifest_route):
+        """Returns the maximum number of cores and total runtime of the
+        workflow described in manifest_route."""
+        manifest=self.get_manifest(manifest_route)
+        return manifest["max_cores"], manifest["total_runtime"]
+
+    def get_derived(self, manifest_route, key, calculate_function):
+        """Returns a value calculated from the manifest in manifest_route.
+        The value is calculated only the first time it is requested.
+        Args:
+        - manifest_route: file route pointing to a json manifest file.
+        - key: string identifying the derived value.
+        - calculate_function: function receiving manifest_route and
+            returning the value, called if the value is not cached.
+        """
+        derived=self._get_entry(manifest_route)["derived"]
+        if not key in derived:
+            derived[key]=calculate_function(manifest_route)
+        return derived[key]
+
+    def clear(self):
+        """Removes all the cached manifests."""
+        self._entries={}
+
+    def _get_entry(self, manifest_route):
+        key=os.path.abspath(manifest_route)
+        mtime=os.path.getmtime(key)
+        entry=self._entries.get(key)
+        if entry is None or entry["mtime"]!=mtime:
+            with open(key, "r") as f:
+                manifest=json.load(f)
+            entry=dict(mtime=mtime, manifest=manifest, derived={})
+            self._entries[key]=entry
+        return entry
+
+
+_manifest_cache=ManifestCache()
+
+def get_manifest_cache():
+    """Returns the ManifestCache object shared by the process."""
+    return _manifest_cache
@@ -51,5 +51,10 @@ class OverloadTimeController(PatternTimer):
     def do_reentry(self):
         return True
     
+    def get_next_trigger_time(self):
+        """Triggering depends on the submitted core seconds, the timer is
+        called at every step."""
+        return None
+    
     
     
\ No newline at end of file
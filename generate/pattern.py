@@ -1,9 +1,9 @@
 from generate import RandomSelector, TimeController
+from generate.manifest_cache import get_manifest_cache
 from os import path
+from workflows.dot_dag import get_manifest_edges
 
 import datetime
-import json
-import pygraphviz as pgv
 import os
 
 
@@ -104,6 +104,14 @@ class PatternTimer(object):
     def do_reentry(self):
         return False
     
+    def get_next_trigger_time(self):
+        """Returns the epoch timestamp from which do_trigger may produce
+        jobs, so the timer does not need to be called before it. Returns None
+        if the timer has to be called at every simulation step, e.g. if
+        triggering depends on state other than time.
+        """
+        return None
+    
     
 
 class WorkflowGenerator(PatternGenerator):
@@ -126,7 +134,8 @@ class WorkflowGenerator(PatternGenerator):
         if len(manifest_list)!=len(share_list):
             raise ValueError("manifest_list and share_list must have the same"
                              " length.")
-        self._manifest_selector = RandomSelector(workload_generator._random_gen)
+        self._manifest_selector = RandomSelector(
+                                workload_generator.get_random_gen("manifest"))
         self._manifest_selector.set(share_list, manifest_list)
         self._workflow_count = 0
     
@@ -156,12 +165,8 @@ class WorkflowGenerator(PatternGenerator):
             folder=ExperimentRunner.get_manifest_folder()
         except:
             pass
-        f = open(os.path.join(folder,manifest_route), "r")
-        manifest=json.load(f)
-        cores = manifest["max_cores"]
-        runtime  = manifest["total_runtime"]
-        f.close()
-        return cores, runtime
+        return get_manifest_cache().get_cores_runtime(
+                                        os.path.join(folder,manifest_route))
     
     
 class WorkflowGeneratorSingleJob(WorkflowGenerator):
@@ -274,21 +279,25 @@ class WorkflowGeneratorMultijobs(WorkflowGenerator):
     
     @classmethod    
     def parse_all_jobs(self, manifest_route):
-        f = open(manifest_route, "r")
-        manifest=json.load(f)
-        f.close()
-        
+        """Returns the maximum number of cores, total runtime, and a
+        dictionary of the tasks indexed by id of the manifest in
+        manifest_route. Each task is a new dictionary (it can be modified)
+        with the task fields plus "dependencyFrom" and "dependencyTo": lists
+        of the tasks it depends on and the tasks that depend on it.
+        The manifest and its dependency edges are read through the process'
+        ManifestCache.
+        """
+        manifest_cache = get_manifest_cache()
+        manifest = manifest_cache.get_manifest(manifest_route)
+        edges = manifest_cache.get_derived(manifest_route, "dag_edges",
+                                           _parse_dag_edges)
         cores = manifest["max_cores"]
         runtime  = manifest["total_runtime"]
-        tasks = manifest["tasks"]
-        tasks = {x["id"]: x for x in tasks}
+        tasks = {x["id"]: dict(x) for x in manifest["tasks"]}
         for task in list(tasks.values()):
             task["dependencyFrom"] = []
             task["dependencyTo"] = []
-        dot_graph = pgv.AGraph(string=manifest["dot_dag"])
-        for edge in dot_graph.edges():
-            orig = edge[0]
-            dest = edge[1]
+        for (orig, dest) in edges:
             tasks[orig]["dependencyTo"].append(tasks[dest])
             tasks[dest]["dependencyFrom"].append(tasks[orig])
             
@@ -298,6 +307,12 @@ class WorkflowGeneratorMultijobs(WorkflowGenerator):
         
             
 
+def _parse_dag_edges(manifest_route):
+    """Returns the list of (origin, destination) task id tuples of the
+    dependencies of the manifest in manifest_route."""
+    return get_manifest_edges(get_manifest_cache().get_manifest(
+                                                            manifest_route))
+
 class MultiAlarmTimer(PatternTimer):
     """ PatternTimer class that allows to program a list of future
     timestamps as alarms. It controls the current timestamp, which is
@@ -382,6 +397,12 @@ class MultiAlarmTimer(PatternTimer):
 
     def can_be_purged(self):
         return len(self._alarm_list)==0
+    
+    def get_next_trigger_time(self):
+        """Returns the next alarm."""
+        if self._alarm_list:
+            return self._alarm_list[0]
+        return None
             
 class RepeatingAlarmTimer(PatternTimer):  
     """Extension of MultiAlarmTimer which always triggers an alarm once every
@@ -415,3 +436,8 @@ class RepeatingAlarmTimer(PatternTimer):
         return trigger_count
     def can_be_purged(self):
         return False
+    
+    def get_next_trigger_time(self):
+        """Returns the first period boundary after the last alarm."""
+        return (int(self._last_timestamp/self._alarm_period+1) 
+                * self._alarm_period)
@@ -119,6 +119,10 @@ class SaturateGenerator(PatternTimer):
     def can_be_purged(self):
         return False
     
+    def get_next_trigger_time(self):
+        """Returns the submit time of the next job of the blast."""
+        return self._next_job_time
+    
 class BFSaturateGenerator(SaturateGenerator):
     """Pattern timer that produces a repeating job submissiong pattern to
     saturate a system by backfilling jobs: One Long job (j1), one wide job (j2)
@@ -203,4 +207,11 @@ class BFSaturateGenerator(SaturateGenerator):
               
         return this_call_jobs_sub
     
+    def get_next_trigger_time(self):
+        """Returns the earliest submit time of the next long, wide, or small
+        job."""
+        times = [self._long_job_submit_time, self._wide_job_submit_time,
+                 self._small_jobs_generator.get_next_trigger_time()]
+        return min([x for x in times if x is not None])
+    
    
\ No newline at end of file
@@ -81,6 +81,12 @@ class Machine(object):
         """
         return self._generators["inter"]
     
+    def set_random_streams(self):
+        """Configures each job random variable to use its own random_control
+        stream, named as the variable. No effect if streams are disabled."""
+        for (key, generator) in self._generators.items():
+            generator.set_random_stream(key)
+    
     def get_new_job_details(self):
         """
         Returns the number of cores, requrested wall clock, and runtime for
@@ -91,8 +97,22 @@ class Machine(object):
         acc =  self._generators["accuracy"].produce_number()
         run_time = int(float(wc_limit)*60*acc)
         return cores, wc_limit, run_time
-        
-    
+
+    def get_new_job_details_batch(self, n):
+        """
+        Returns a list of n tuples, each one containing the number of cores,
+        requested wall clock, and runtime for a simulated job. Values are
+        produced at once by the job random variables.
+        Args:
+        - n: number of jobs to produce.
+        """
+        cores =  self._generators["cores"].produce_numbers(n)
+        wc_limit =  self._generators["wc_limit"].produce_numbers(n)
+        acc =  self._generators["accuracy"].produce_numbers(n)
+        run_time = (wc_limit*60*acc).astype(int)
+        return list(zip(cores.tolist(), wc_limit.tolist(), run_time.tolist()))
+
+
     def save_to_file(self, file_dir, description):
         """
         Saves the CDFs for the random variables in 
@@ -1,4 +1,12 @@
+import functools
+import multiprocessing
+import multiprocessing.connection
 import os
+import resource
+import signal
+import sys
+import threading
+import traceback
 from time import sleep
 
 from commonLib.DBManager import DB
@@ -24,12 +32,18 @@ def get_central_db(dbName="workload"):
     - ANALYSIS_DB_USER: user to be used to access the database.
     - ANALYSIS_DB_PASS: password to be used to used to access the database.
     - ANALYSIS_DB_PORT: port on which the database runs. 
+    - ANALYSIS_DB_POOL_SIZE: if set, connections are reused from a pool of
+        this maximum size instead of opened and closed for each statement.
     """
+    pool_size = os.getenv("ANALYSIS_DB_POOL_SIZE", None)
+    if pool_size:
+        pool_size = int(pool_size)
     return DB(os.getenv("ANALYSIS_DB_HOST", "127.0.0.1"),
                os.getenv("ANALYSIS_DB_NAME", dbName),
                os.getenv("ANALYSIS_DB_USER", "root"),
                os.getenv("ANALYSIS_DB_PASS", ""),
-               os.getenv("ANALYSIS_DB_PORT","3306"))
+               os.getenv("ANALYSIS_DB_PORT","3306"),
+               pool_size=pool_size)
 
 def get_sim_db(hostname="127.0.0.1"):
     """Returns a DB object configured to access the internal database of 
@@ -50,6 +64,14 @@ def get_sim_db(hostname="127.0.0.1"):
                os.getenv("SLURMDB_USER", None),
                os.getenv("SLURMDB_PASS", None),
                os.getenv("SLURMDB_PORT","3306"))
+
+def get_worker_hosts(file_name="hosts.list"):
+    """Returns the list of experiment worker hosts in file_name, one per line.
+    Empty lines and lines containing "!" (disabled workers) are ignored, as
+    the workers_*.sh scripts do.
+    """
+    with open(file_name) as f:
+        return [x.strip() for x in f if x.strip() and not "!" in x]
     
 class ExperimentWorker(object):
     """This class retrieves experiment configurations, creates the corresponding
@@ -89,6 +111,81 @@ class ExperimentWorker(object):
             if trace_id:
                 break  
     
+    def do_work_hosts(self, central_db_obj, hostnames,
+                      get_sched_db=get_sim_db, runner_class=ExperimentRunner):
+        """Runs the fresh experiments on a set of worker hosts concurrently,
+        with one thread per host. Each thread claims an experiment (claims are
+        concurrency safe), runs it on its host, and claims the next one until
+        none are left. This way, while a worker reboots or receives its trace,
+        others keep simulating. SIGINT and SIGTERM stop the work gracefully:
+        running experiments are completed, but no new ones are claimed.
+        
+        Polling of the running simulations is spaced out up to max_poll_time
+        (see ExperimentRunner.configure).
+        Args:
+        - central_db_obj: DB object configured to access the analysis database.
+        - hostnames: list of the worker hosts to run the experiments on.
+        - get_sched_db: function(hostname) returning a DB object configured
+            to access the slurm database of a worker host.
+        - runner_class: ExperimentRunner class used to run the experiments.
+            LocalExperimentRunner runs them in local processes instead of
+            the hosts.
+        """
+        stop_event = threading.Event()
+        def stop_handler(signum, frame):
+            print("Stopping: waiting for running experiments to complete.")
+            stop_event.set()
+        old_handlers = [(x, signal.signal(x, stop_handler))
+                        for x in [signal.SIGINT, signal.SIGTERM]]
+        threads = [threading.Thread(target=self._work_host,
+                                    args=(central_db_obj, hostname,
+                                          get_sched_db(hostname),
+                                          runner_class, stop_event),
+                                    name="worker-{0}".format(hostname))
+                   for hostname in hostnames]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for (signum, handler) in old_handlers:
+                signal.signal(signum, handler)
+    
+    def _work_host(self, central_db_obj, hostname, sched_db_obj,
+                   runner_class, stop_event):
+        """Runs fresh experiments on hostname until none are left or
+        stop_event is set. If an experiment run raises an exception, the
+        experiment is marked as simulation_failed and the host is not used
+        anymore."""
+        while not stop_event.is_set():
+            ed = self._load_fresh(central_db_obj)
+            if ed is None:
+                break
+            print(("About to run exp({0}):{1} on {2}".format(
+                            ed._trace_id, ed._name, hostname)))
+            er = runner_class(ed, run_hostname=hostname)
+            try:
+                done = er.do_full_run(sched_db_obj, central_db_obj)
+            except Exception:
+                traceback.print_exc()
+                print(("Exp({0}) Error! Stopping work on {1}".format(
+                                        ed._trace_id, hostname)))
+                ed.mark_simulation_failed(central_db_obj)
+                break
+            if done:
+                print(("Exp({0}) Done".format(ed._trace_id)))
+            else:
+                print(("Exp({0}) Error!".format(ed._trace_id)))
+    
+    def _load_fresh(self, central_db_obj):
+        """Claims the next fresh experiment. Returns its ExperimentDefinition,
+        or None if there are no fresh experiments."""
+        ed = ExperimentDefinition()
+        if ed.load_fresh(central_db_obj):
+            return ed
+        return None
+    
     def rescue_exp(self, central_db_obj, sched_db_obj, trace_id=None):
         """Retrieves the job trace from the database of an experiment worker and
         stores it in the central db.
@@ -125,17 +222,33 @@ class ExperimentWorker(object):
 class AnalysisWorker(object):
     """This class processes the results of different experiment types and store
     the final results in the analysis database.
+    
+    Pending experiments can be processed by multiple processes in parallel
+    (jobs parameter), as experiments are claimed with
+    ExperimentDefinition.load_next_state, which is concurrency safe.
     """
-    def do_work_single(self, db_obj, trace_id=None):
+    def do_work_single(self, db_obj, trace_id=None, jobs=1):
         """Processes single type experiment results.
         Args:
         - db_obj: DB object configured to access the analysis database.
         - trace_id: If set to "None", it processes all experiments in 
             "simulation_state". If set to an integer, it will analyze the
             experiment identified by trace_id.
+        - jobs: number of processes analyzing experiments in parallel. Only
+            used if trace_id is None.
         """
+        if jobs>1 and not trace_id:
+            self.do_work_parallel(self._work_single, db_obj, jobs)
+        else:
+            self._work_single(db_obj, trace_id=trace_id)
+    
+    def _work_single(self, db_obj, trace_id=None, max_experiments=None,
+                     stop_event=None):
         there_are_more=True
+        count=0
         while there_are_more:
+            if _must_stop(count, max_experiments, stop_event):
+                return True
             ed = ExperimentDefinition()
             if trace_id:
                 ed.load(db_obj, trace_id)
@@ -145,9 +258,98 @@ class AnalysisWorker(object):
             if there_are_more:
                 print(("Analyzing experiment {0}".format(ed._trace_id)))
                 er = AnalysisRunnerSingle(ed)
-                er.do_full_analysis(db_obj)
+                self._run_isolated(db_obj, ed, er.do_full_analysis)
+                count+=1
             if trace_id:
                 break
+        return False
+    
+    def _run_isolated(self, db_obj, ed, analysis_function):
+        """Runs analysis_function(db_obj) for experiment ed. If it raises
+        an exception, the experiment is marked as analysis_error, so other
+        experiments can still be processed.
+        Returns: True if analysis_function ended without exceptions.
+        """
+        try:
+            analysis_function(db_obj)
+            return True
+        except Exception:
+            traceback.print_exc()
+            print(("Analysis of experiment {0} failed".format(ed._trace_id)))
+            ed.mark_analysis_error(db_obj)
+            return False
+    
+    def do_work_parallel(self, work_function, db_obj, jobs,
+                         max_experiments_per_process=10,
+                         max_memory_mb=None, max_failed_exits=3):
+        """Runs work_function in jobs parallel processes until no more
+        experiments are pending. Each process analyzes up to
+        max_experiments_per_process experiments and is then replaced by a new
+        one, so memory is returned to the system. SIGINT and SIGTERM stop the
+        work gracefully: running analyses are completed, but no new
+        experiments are claimed.
+        Args:
+        - work_function: function(db_obj, max_experiments, stop_event) that
+            processes experiments and returns True if it stopped before
+            running out of pending experiments.
+        - db_obj: DB object configured to access the analysis database. Each
+            process uses its own connections.
+        - jobs: number of processes to run in parallel.
+        - max_experiments_per_process: number of experiments analyzed by a
+            process before it is replaced.
+        - max_memory_mb: if set, maximum address space of each process in MB.
+            Experiments exceeding it are marked as analysis_error.
+        - max_failed_exits: number of consecutive processes ending with an
+            unexpected exit code (e.g. they crashed or could not access the
+            database) after which no new processes are started.
+        Returns False if it stopped because of failed processes, True
+        otherwise.
+        """
+        stop_event = multiprocessing.Event()
+        def stop_handler(signum, frame):
+            print("Stopping: waiting for running analyses to complete.")
+            stop_event.set()
+        old_handlers = [(x, signal.signal(x, stop_handler))
+                        for x in [signal.SIGINT, signal.SIGTERM]]
+        processes = []
+        more_work = True
+        failed_exits = 0
+        try:
+            while True:
+                while (more_work and not stop_event.is_set() and
+                       len(processes)<jobs):
+                    process = multiprocessing.Process(
+                                target=_run_analysis_process,
+                                args=(work_function, db_obj,
+                                      max_experiments_per_process,
+                                      max_memory_mb, stop_event))
+                    process.start()
+                    processes.append(process)
+                if not processes:
+                    break
+                multiprocessing.connection.wait([x.sentinel
+                                                 for x in processes])
+                for process in [x for x in processes if not x.is_alive()]:
+                    process.join()
+                    processes.remove(process)
+                    if process.exitcode==0:
+                        more_work = False
+                        failed_exits = 0
+                    elif process.exitcode==_MORE_WORK_EXIT_CODE:
+                        failed_exits = 0
+                    else:
+                        failed_exits += 1
+                        print(("Analysis process ended with code {0}".format(
+                                                        process.exitcode)))
+                        if more_work and failed_exits>=max_failed_exits:
+                            print(("{0} analysis processes failed in a row,"
+                                   " stopping.".format(failed_exits)))
+                            more_work = False
+            return failed_exits<max_failed_exits
+        finally:
+            for (signum, handler) in old_handlers:
+                signal.signal(signum, handler)
+    
     def do_work_second_pass(self, db_obj, pre_trace_id):
         """Takes three experiments, and repeast the workflow analysis for
         each experiment but only taking into account the first n workflows
@@ -220,15 +422,29 @@ class AnalysisWorker(object):
         
         
       
-    def do_work_delta(self, db_obj, trace_id=None, sleep_time=60):
+    def do_work_delta(self, db_obj, trace_id=None, sleep_time=60, jobs=1):
         """Processes delta type experiment results.
         Args:
         - db_obj: DB object configured to access the analysis database.
         - sleep_time: wait time in seconds to wait between processing two delta
             experiments.
+        - jobs: number of processes analyzing experiments in parallel. Only
+            used if trace_id is None.
         """
+        if jobs>1 and not trace_id:
+            self.do_work_parallel(functools.partial(self._work_delta,
+                                                    sleep_time=sleep_time),
+                                  db_obj, jobs)
+        else:
+            self._work_delta(db_obj, trace_id=trace_id, sleep_time=sleep_time)
+    
+    def _work_delta(self, db_obj, trace_id=None, sleep_time=60,
+                    max_experiments=None, stop_event=None):
         there_are_more=True
+        count=0
         while there_are_more:
+            if _must_stop(count, max_experiments, stop_event):
+                return True
             ed = DeltaExperimentDefinition()
             if trace_id:
                 ed.load(db_obj, trace_id)
@@ -238,20 +454,41 @@ class AnalysisWorker(object):
             if there_are_more:
                 if ed.is_it_ready_to_process(db_obj):
                     er = AnalysisRunnerDelta(ed)
-                    er.do_full_analysis(db_obj)
+                    self._run_isolated(db_obj, ed, er.do_full_analysis)
+                count+=1
                 sleep(sleep_time)
             if trace_id:
                 break
+        return False
             
-    def do_work_grouped(self, db_obj,  trace_id=None, sleep_time=60):
+    def do_work_grouped(self, db_obj,  trace_id=None, sleep_time=60, jobs=1,
+                        subtrace_jobs=1):
         """Processes grouped type experiment results.
         Args:
         - db_obj: DB object configured to access the analysis database.
         - sleep_time: wait time in seconds to wait between processing two
             grouped experiments.
+        - jobs: number of processes analyzing experiments in parallel. Only
+            used if trace_id is None.
+        - subtrace_jobs: number of processes analyzing the subtraces of each
+            experiment in parallel.
         """
+        if jobs>1 and not trace_id:
+            self.do_work_parallel(functools.partial(
+                                        self._work_grouped,
+                                        subtrace_jobs=subtrace_jobs),
+                                  db_obj, jobs)
+        else:
+            self._work_grouped(db_obj, trace_id=trace_id,
+                               subtrace_jobs=subtrace_jobs)
+    
+    def _work_grouped(self, db_obj, trace_id=None, max_experiments=None,
+                      stop_event=None, subtrace_jobs=1):
         there_are_more=True
+        count=0
         while there_are_more:
+            if _must_stop(count, max_experiments, stop_event):
+                return True
             ed = GroupExperimentDefinition()
             if trace_id:
                 ed.load(db_obj, trace_id)
@@ -263,7 +500,10 @@ class AnalysisWorker(object):
                     print(("Analyzing grouped experiment {0}".format(
                                                                 ed._trace_id)))
                     er = AnalysisGroupRunner(ed)
-                    er.do_full_analysis(db_obj)
+                    self._run_isolated(db_obj, ed,
+                                       functools.partial(er.do_full_analysis,
+                                                         jobs=subtrace_jobs))
+                count+=1
             if trace_id:
                 break
             elif there_are_more:
@@ -273,6 +513,7 @@ class AnalysisWorker(object):
             #    sleep(sleep_time)
             else:
                 print("No more experiments to process, exiting.")
+        return False
     def do_mean_utilizatin(self, db_obj, trace_id=None):
         ed = GroupExperimentDefinition()
         if trace_id:
@@ -359,6 +600,28 @@ class AnalysisWorker(object):
                     [ed._trace_id for ed in ed_list])))
             if pre_trace_id:
                 break
-        
-        
-    
\ No newline at end of file
+
+
+_MORE_WORK_EXIT_CODE = 3
+
+def _must_stop(count, max_experiments, stop_event):
+    """Returns True if a work loop that has processed count experiments has
+    to stop."""
+    if stop_event is not None and stop_event.is_set():
+        return True
+    return max_experiments is not None and count>=max_experiments
+
+def _run_analysis_process(work_function, db_obj, max_experiments,
+                          max_memory_mb, stop_event):
+    """Entry point of the processes started by AnalysisWorker.do_work_parallel.
+    Exits with _MORE_WORK_EXIT_CODE if it stopped before running out of
+    pending experiments, 0 otherwise."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    if max_memory_mb:
+        max_bytes = int(max_memory_mb)*1024*1024
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    if work_function(db_obj, max_experiments=max_experiments,
+                     stop_event=stop_event):
+        sys.exit(_MORE_WORK_EXIT_CODE)
+    sys.exit(0)
@@ -1,5 +1,7 @@
+from multiprocessing import Pool
 import numpy as np
 from orchestration.definition import ExperimentDefinition
+from stats import PartialResults
 from stats.compare import WorkflowDeltas
 from stats.trace import ResultTrace
 
@@ -81,43 +83,22 @@ class AnalysisGroupRunner(AnalysisRunnerSingle):
         return result_trace
         
     
-    def do_full_analysis(self, db_obj):
+    def do_full_analysis(self, db_obj, jobs=1):
+        """Do job and workflow variables analysis over all the subtraces
+        together, and utilization median and mean analysis. Each subtrace is
+        reduced to a PartialResults object, and results are calculated over
+        the merge of all of them. Stores results in the database.
+         Args:
+        - db_obj: DB object configured to access the analysis database.
+        - jobs: number of processes analyzing subtraces in parallel.
+        """
         result_trace = self.load_trace(db_obj)
-        first=True
-        last=False
-        for trace_id in self._definition._subtraces:
-            last=trace_id==self._definition._subtraces[-1]
-            result_trace.load_trace(db_obj, trace_id)
-            result_trace.do_workflow_pre_processing(append=not first)
-            one_definition  = ExperimentDefinition()
-            one_definition.load(db_obj, trace_id)
-            result_trace.fill_job_values(
-                                    start=one_definition.get_start_epoch(),
-                                    stop=one_definition.get_end_epoch(),
-                                    append=not first)
-            result_trace.fill_workflow_values(
-                                    start=one_definition.get_start_epoch(),
-                                    stop=one_definition.get_end_epoch(),
-                                    append=not first)
-            result_trace.calculate_job_results_grouped_core_seconds(
-                       one_definition.get_machine().get_core_seconds_edges(),
-                       last, db_obj, 
-                       self._definition._trace_id,
-                       start=one_definition.get_start_epoch(),
-                       stop=one_definition.get_end_epoch(),
-                       append=not first)
-            first=False
-            
-        result_trace.calculate_and_store_job_results(store=True,
-                                        db_obj=db_obj,
-                                        trace_id=self._definition._trace_id)
-        result_trace._wf_extractor.calculate_and_store_overall_results(store=True, 
-                                        db_obj=db_obj,
-                                        trace_id=self._definition._trace_id)
-        result_trace._wf_extractor.calculate_and_store_per_manifest_results(
-                     store=True,
-                     db_obj=db_obj,
-                     trace_id=self._definition._trace_id)
+        partial = self._get_partial_results(
+                                [(db_obj, trace_id)
+                                 for trace_id in self._definition._subtraces],
+                                jobs)
+        partial.calculate_results(store=True, db_obj=db_obj,
+                                  trace_id=self._definition._trace_id)
         
         result_trace.calculate_utilization_median_result(
                                 self._definition._subtraces,
@@ -131,6 +112,34 @@ class AnalysisGroupRunner(AnalysisRunnerSingle):
                                 trace_id=self._definition._trace_id)
         self._definition.mark_analysis_done(db_obj)     
     
+    def _get_partial_results(self, work_args, jobs, partial_function=None):
+        """Returns the merge of the PartialResults objects produced by
+        partial_function for each element of work_args.
+        Args:
+        - work_args: list of arguments of partial_function, one per subtrace.
+        - jobs: if >1, partial_function runs in a pool of up to jobs
+            processes. work_args and results must be picklable.
+        - partial_function: module level function(args) returning a
+            PartialResults object. If None, _get_subtrace_partial_results.
+        """
+        if partial_function is None:
+            partial_function = _get_subtrace_partial_results
+        if jobs>1 and len(work_args)>1:
+            pool = Pool(min(jobs, len(work_args)))
+            try:
+                return self._merge_partial_results(
+                            pool.imap_unordered(partial_function, work_args))
+            finally:
+                pool.terminate()
+        return self._merge_partial_results([partial_function(x)
+                                            for x in work_args])
+    
+    def _merge_partial_results(self, partial_list):
+        partial = PartialResults()
+        for subtrace_partial in partial_list:
+            partial.merge(subtrace_partial)
+        return partial
+    
     def do_only_mean(self, db_obj):
         result_trace = self.load_trace(db_obj)  
         result_trace.calculate_utilization_mean_result(
@@ -210,3 +219,23 @@ class AnalysisRunnerDelta(AnalysisRunnerSingle):
         
         
 
+
+def _get_subtrace_partial_results(args):
+    """Returns a PartialResults object with the job and workflow values of
+    a subtrace of a group experiment. Module level so it can run in a
+    multiprocessing pool.
+    Args:
+    - args: tuple (db_obj, trace_id) with the DB object to read the
+        subtrace from and the trace_id of the subtrace.
+    """
+    db_obj, trace_id = args
+    one_definition = ExperimentDefinition()
+    one_definition.load(db_obj, trace_id)
+    result_trace = ResultTrace()
+    result_trace.load_trace(db_obj, trace_id)
+    result_trace.do_workflow_pre_processing()
+    return result_trace.fill_partial_results(
+                    PartialResults(),
+                    one_definition.get_machine().get_core_seconds_edges(),
+                    start=one_definition.get_start_epoch(),
+                    stop=one_definition.get_end_epoch())
@@ -376,6 +376,9 @@ class ExperimentDefinition(object):
     def mark_analysis_done(self, db_obj):
         return self.upate_state(db_obj, "analysis_done")
 
+    def mark_analysis_error(self, db_obj):
+        return self.upate_state(db_obj, "analysis_error")
+
     def mark_second_pass(self, db_obj):
         return self.upate_state(db_obj, "second_pass_done")
 
@@ -428,7 +431,47 @@ class ExperimentDefinition(object):
         """
         
         self._trace_id = trace_id
-        keys= ["name",
+        keys = self._get_load_keys()
+        data_dic=db_obj.getValuesDicList(self._table_name, keys, condition=
+                                        "trace_id={0}".format(
+                                        self._trace_id))
+        if data_dic == False:
+            raise ValueError("Experiment not found!")
+        self._load_row(data_dic[0])
+    
+    @classmethod
+    def load_many(cls, db_obj, trace_ids):
+        """Loads the experiments identified by trace_ids with a single query.
+        Args:
+        - db_obj: configured DBManager object that will load the data from
+        - trace_ids: list of integers identifying the experiments to load.
+        Returns: a dictionary of objects of this class indexed by trace_id.
+        Raises ValueError if any of the experiments is not found.
+        """
+        trace_ids = list(set([int(x) for x in trace_ids]))
+        if not trace_ids:
+            return {}
+        template = cls()
+        keys = template._get_load_keys()
+        data_dic=db_obj.getValuesDicList(template._table_name,
+                                         ["trace_id"]+keys,
+                                         condition="trace_id IN ({0})".format(
+                                        ",".join([str(x) for x in trace_ids])))
+        if data_dic == False:
+            raise ValueError("Experiments not found!")
+        exps = {}
+        for row in data_dic:
+            exp = cls()
+            exp._trace_id = int(row["trace_id"])
+            exp._load_row(row)
+            exps[exp._trace_id] = exp
+        missing = [x for x in trace_ids if x not in exps]
+        if missing:
+            raise ValueError("Experiments not found: {0}".format(missing))
+        return exps
+    
+    def _get_load_keys(self):
+        return ["name",
                 "experiment_set",
                 "seed",
                 "machine",
@@ -449,13 +492,10 @@ class ExperimentDefinition(object):
                 "simulating_start",
                 "simulating_end",
                 "worker"]
-        data_dic=db_obj.getValuesDicList(self._table_name, keys, condition=
-                                        "trace_id={0}".format(
-                                        self._trace_id))
-        if data_dic == False:
-            raise ValueError("Experiment not found!")
-        for key in keys:
-            setattr(self, "_"+key, data_dic[0][key])
+    
+    def _load_row(self, row):
+        for key in self._get_load_keys():
+            setattr(self, "_"+key, row[key])
         
         self._manifest_list=self._text_to_manifest_list(self._manifest_list)
         self._subtraces = [int(x) for x in self._subtraces.split(",") if x!=""] 
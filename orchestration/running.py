@@ -3,7 +3,9 @@ from os import path
 import os
 import shutil
 import subprocess
-from time import sleep
+import sys
+import threading
+from time import sleep, time
 
 from generate import WorkloadGenerator, TimeController
 from generate.overload import OverloadTimeController
@@ -12,8 +14,10 @@ from generate.pattern import (WorkflowGeneratorSingleJob, RepeatingAlarmTimer,
 from generate.special import SpecialGenerators
 from generate.special.machine_filler import filler
 import random_control
+from slurm.emulator import SchedulerEmulator
 from slurm.trace_gen import TraceGenerator
 from stats.trace import ResultTrace
+from stats.trace_cache import TraceCache
 from tools.ssh import SSH
 
 
@@ -21,6 +25,9 @@ class ExperimentRunner(object):
     """Class capable of taking an experiment definition, generate its workload,
     run the experiment, and import to store the results. 
     """
+    # Workload generation uses the process wide random generators of
+    # random_control: runners in different threads generate one at a time.
+    _generation_lock = threading.Lock()
         
     @classmethod   
     def configure(cld,
@@ -36,7 +43,9 @@ class ExperimentRunner(object):
                   stop_sim_script = "stop_sim.sh",
                   manifest_folder="manifests",
                   scheduler_acc_table="perfdevel_job_table",
-                  drain_time=6*3600):
+                  drain_time=6*3600,
+                  random_streams=False,
+                  max_poll_time=10):
         """ This class method configures runtime parameters needed by
         all ExperimentRunner instances.
         Args:
@@ -65,6 +74,14 @@ class ExperimentRunner(object):
             manifests to be used in the simulation.
         - scheduler_acc_table: name of the table used in the scheduler's
             dabatase to store job accounting information.
+        - random_streams: if True, workloads are generated with independent
+            random streams per random variable derived from the experiment
+            seed (see random_control.set_global_random_streams), and job
+            characteristics are produced in batches. Traces are different
+            from the ones generated with random_streams=False.
+        - max_poll_time: maximum time in seconds between two checks of the
+            state of a running simulation. Checks start every 10s, and the
+            time between them doubles up to max_poll_time.
         """
         cld._trace_folder= trace_folder
         cld._trace_generation_folder = trace_generation_folder
@@ -80,20 +97,39 @@ class ExperimentRunner(object):
         cld._manifest_folder=manifest_folder
         cld._scheduler_acc_table = scheduler_acc_table
         cld._drain_time = drain_time
+        cld._random_streams = random_streams
+        cld._max_poll_time = max_poll_time
+    
+    @classmethod
+    def uses_random_streams(cld):
+        if hasattr(cld, "_random_streams"):
+            return cld._random_streams
+        return False
     
     @classmethod
     def get_manifest_folder(cld):
         if hasattr(cld, "_manifest_folder"):
             return cld._manifest_folder
         return "./"
+    
+    @classmethod
+    def get_max_poll_time(cld):
+        if hasattr(cld, "_max_poll_time"):
+            return cld._max_poll_time
+        return 10
         
-    def __init__(self, definition):
+    def __init__(self, definition, run_hostname=None):
         """Constructor.
         Args:
         - definition: Definition object containing the configuration of the
             experiment to be run by this object.
+        - run_hostname: if set, host where the experiment is run instead of
+            the one set in configure. It allows to drive several workers
+            from the same process.
         """
         self._definition=definition
+        if run_hostname is not None:
+            self._run_hostname = run_hostname
     
     
     def do_full_run(self, scheduler_db_obj, store_db_obj):
@@ -112,7 +148,7 @@ class ExperimentRunner(object):
         self.create_trace_file()
         self.do_simulation()
         self._definition.mark_simulating(store_db_obj,
-                                     worker_host=ExperimentRunner._run_hostname)
+                                     worker_host=self._run_hostname)
         self.wait_for_sim_to_end()
         if self.check_trace_and_store(scheduler_db_obj, store_db_obj):
             self._definition.mark_simulation_done(store_db_obj)
@@ -123,6 +159,45 @@ class ExperimentRunner(object):
             return False
 
     
+    def do_emulated_run(self, backfill_depth=50):
+        """ Creates a workload trace according to self._definition and runs
+        it in the in-process SchedulerEmulator instead of the scheduler. It
+        does not use the worker nor change the state of the experiment. Trace
+        files are created in the trace generation folder and removed after
+        the emulation, also if it fails.
+        Args:
+        - backfill_depth: maximum number of jobs considered for backfilling
+            in each scheduling pass (see SchedulerEmulator).
+        Returns a ResultTrace with the emulated jobs.
+        """
+        file_names = [self._definition.get_trace_file_name(),
+                      self._definition.get_qos_file_name(),
+                      self._definition.get_users_file_name()]
+        try:
+            with ExperimentRunner._generation_lock:
+                file_names = self._generate_trace_files(self._definition)
+            machine = self._definition.get_machine()
+            emulator = SchedulerEmulator(
+                    machine._num_nodes, machine._cores_per_node,
+                    workflow_handling=self._definition._workflow_handling,
+                    manifest_folder=ExperimentRunner.get_manifest_folder(),
+                    backfill_depth=backfill_depth)
+            trace_file_route = path.join(
+                                ExperimentRunner._trace_generation_folder,
+                                file_names[0])
+            result_trace = emulator.run_trace_file(
+                                trace_file_route,
+                                end_time=(self._definition.get_end_epoch()+
+                                          ExperimentRunner._drain_time))
+        finally:
+            for file_name in file_names:
+                file_route = path.join(
+                                ExperimentRunner._trace_generation_folder,
+                                file_name)
+                if path.exists(file_route):
+                    os.remove(file_route)
+        return result_trace
+
     def check_trace_and_store(self, scheduler_db_obj, store_db_obj):
         """ Imports the result trace from an experiment and stores it in a 
         central database.
@@ -136,7 +211,12 @@ class ExperimentRunner(object):
         result_trace = ResultTrace()
         result_trace.import_from_db(scheduler_db_obj, 
                                     ExperimentRunner._scheduler_acc_table)
-        
+        return self._check_and_store_trace(result_trace, store_db_obj)
+    
+    def _check_and_store_trace(self, result_trace, store_db_obj):
+        """Stores result_trace in the central database if it has jobs.
+        Returns True if the trace covers the experiment's time span and was
+        stored.""" 
         status=True
         end_time = self._definition.get_end_epoch()
         if len(result_trace._lists_start["time_end"])==0:
@@ -148,7 +228,10 @@ class ExperimentRunner(object):
                                                     last_job_end_time,
                                                     end_time)))
             status= False
-        result_trace.store_trace(store_db_obj, self._definition._trace_id)    
+        if not result_trace.store_trace(store_db_obj,
+                                        self._definition._trace_id):
+            print("Error: Trace could not be stored")
+            status=False
         return status
         
     def create_trace_file(self):
@@ -156,7 +239,8 @@ class ExperimentRunner(object):
         and stores them in the the scheduler. These files are composed by a job
         submission list and a list of valid users.
         """
-        file_names = self._generate_trace_files(self._definition)
+        with ExperimentRunner._generation_lock:
+            file_names = self._generate_trace_files(self._definition)
         self._place_trace_file(file_names[0])
         self._place_users_file(file_names[2])
 
@@ -168,8 +252,27 @@ class ExperimentRunner(object):
         """
         if trace_generator is None:
             trace_generator = TraceGenerator()
+        trace_file_route = path.join(ExperimentRunner._trace_generation_folder,
+                                     definition.get_trace_file_name())
+        trace_generator.set_stream_file(trace_file_route)
+        try:
+            return self._generate_workload(definition, trace_generator,
+                                           trace_file_route)
+        finally:
+            # No-op if the trace was dumped, closes and removes the partial
+            # trace file if generation failed.
+            trace_generator.close_stream_file()
+    
+    def _generate_workload(self, definition, trace_generator,
+                           trace_file_route):
+        """Generates the workload of definition in trace_generator, and dumps
+        the trace, qos, and users files. Returns their names."""
         print(("This is the seed to be used:", definition._seed))
         random_control.set_global_random_gen(seed=definition._seed)
+        if ExperimentRunner.uses_random_streams():
+            random_control.set_global_random_streams(seed=definition._seed)
+        else:
+            random_control.set_global_random_streams(seed=None)
         machine=definition.get_machine()
         (filter_cores, filter_runtime, 
             filter_core_hours) = machine.get_filter_values()
@@ -180,6 +283,8 @@ class ExperimentRunner(object):
                           qos_list=definition.get_qos_list(),
                           partition_list=definition.get_partition_list(),
                           account_list = definition.get_account_list())       
+        if ExperimentRunner.uses_random_streams():
+            wg.set_job_details_batch_size(1000)
         if definition._workflow_policy.split("-")[0] == "sp":
             special_gen = SpecialGenerators.get_generator(
                                 definition._workflow_policy,
@@ -252,9 +357,7 @@ class ExperimentRunner(object):
         print(("Observed job pressure (bound): {0}".format(
                     job_pressure)))
                            
-        trace_generator.dump_trace(path.join(
-                                      ExperimentRunner._trace_generation_folder,
-                                      definition.get_trace_file_name()))
+        trace_generator.dump_trace(trace_file_route)
         trace_generator.dump_qos(path.join(
                                       ExperimentRunner._trace_generation_folder,
                                       definition.get_qos_file_name()))
@@ -387,8 +490,7 @@ class ExperimentRunner(object):
         if ExperimentRunner._local:
             shutil.copy(orig, dest)
         else:
-            ssh = SSH(ExperimentRunner._run_hostname,
-                          ExperimentRunner._run_user)
+            ssh = SSH(self._run_hostname, ExperimentRunner._run_user)
             ssh.push_file(orig, dest)
         if move:
             os.remove(orig)
@@ -396,8 +498,7 @@ class ExperimentRunner(object):
         if ExperimentRunner._local:
                 os.remove(dest)
         else:
-            ssh = SSH(ExperimentRunner._run_hostname,
-                      ExperimentRunner._run_user)
+            ssh = SSH(self._run_hostname, ExperimentRunner._run_user)
             ssh.delete_file(dest)
     def _exec_dest(self, command, background=False):
         if ExperimentRunner._local:
@@ -411,10 +512,11 @@ class ExperimentRunner(object):
                 p = subprocess.Popen(command)
             
         else:
-            ssh = SSH(ExperimentRunner._run_hostname,
-                      ExperimentRunner._run_user)
+            ssh = SSH(self._run_hostname, ExperimentRunner._run_user)
             output, err, rc= ssh.execute_command(command[0], command[1:],
                                                  background=background)
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
         return output
     def is_simulation_done(self):
         """Returns True if the simulation engine is not running anymore"""
@@ -423,9 +525,12 @@ class ExperimentRunner(object):
         return not self.is_sim_running()
     
     def wait_for_sim_to_end(self):
-        """Blocks until the sim_mgr process stops running."""
-        count = 0
+        """Blocks until the sim_mgr process stops running. The time between
+        checks doubles after each one, up to max_poll_time (see configure).
+        """
+        start_time = time()
         wait_time = 10
+        max_wait_time = max(ExperimentRunner.get_max_poll_time(), wait_time)
         failed_comms_count=0
         while True:
             try:
@@ -436,24 +541,23 @@ class ExperimentRunner(object):
                 failed_comms_count+=1
                 print(("Failed commons while checking is sim was done, failed"
                       " count: {0}".format(failed_comms_count)))
-            total_time=count*wait_time
+            total_time=int(time()-start_time)
             print(("Simulation has not ended. Wait time: {0}:{1}:{2}".format(
-                                      total_time/3600, (total_time/60)%60,
+                                      total_time//3600, (total_time//60)%60,
                                       total_time%60  )))
-            count+=1
             sleep(wait_time)
+            wait_time = min(wait_time*2, max_wait_time)
         
         
     
     def is_sim_running(self):
-        """Returns True if all the process of the simulation are running."""
+        """Returns True if all the process of the simulation are running. The
+        process list is retrieved once for all of them."""
         try:
-            if not self.is_it_running("sim_mgr"):
-                return False
-            if not self.is_it_running("slurmctld"):
-                return False
-            if not self.is_it_running("slurmd"):
-                return False
+            output = self._get_process_list()
+            for proc in ["sim_mgr", "slurmctld", "slurmd"]:
+                if not self._is_in_process_list(proc, output):
+                    return False
             return True
         except SystemError:
             print("Error communicating to check remote processes")
@@ -465,7 +569,15 @@ class ExperimentRunner(object):
         Args:
         - proc: string with the name of the process to be checked.
         """
-        output=self._exec_dest(["/bin/ps", "-eo comm,state"])
+        return self._is_in_process_list(proc, self._get_process_list())
+    
+    def _get_process_list(self):
+        return self._exec_dest(["/bin/ps", "-eo", "comm,state"])
+    
+    def _is_in_process_list(self, proc, output):
+        """Returns True if a process named proc is in output (of
+        _get_process_list). Raises SystemError if output is too short to be
+        a valid process list."""
         count = 0
         total_count=0
         for line in output.split("\n"):
@@ -476,4 +588,130 @@ class ExperimentRunner(object):
             return True
         if total_count<5:
             raise SystemError()
-        return False
\ No newline at end of file
+        return False
+
+class LocalExperimentRunner(ExperimentRunner):
+    """ExperimentRunner that stands in for a worker host with a local
+    subprocess, so experiments can be dispatched and run without workers.
+    The "host" is a folder named as run_hostname inside the trace folder (see
+    ExperimentRunner.configure). The simulation is a process that runs the
+    workload in SchedulerEmulator and stores the resulting trace in that
+    folder. The scheduler database is not used.
+    """
+    def __init__(self, definition, run_hostname=None):
+        """Constructor.
+        Args:
+        - definition: Definition object containing the configuration of the
+            experiment to be run by this object.
+        - run_hostname: name of the emulated host. If not set, the one set in
+            configure is used.
+        """
+        super(LocalExperimentRunner, self).__init__(definition,
+                                                    run_hostname=run_hostname)
+        self._host_folder = path.join(ExperimentRunner._trace_folder,
+                                      str(self._run_hostname))
+        self._sim_process = None
+    
+    def _refresh_machine(self):
+        """Stops any simulation running in the host and creates its
+        folder."""
+        self.stop_simulation()
+        if not path.exists(self._host_folder):
+            os.makedirs(self._host_folder)
+    
+    def create_trace_file(self):
+        """Creates the workload files according the Experiment definition.
+        The job submission list is moved to the host folder."""
+        with ExperimentRunner._generation_lock:
+            file_names = self._generate_trace_files(self._definition)
+        shutil.move(path.join(ExperimentRunner._trace_generation_folder,
+                              file_names[0]),
+                    self._get_trace_route())
+        for file_name in file_names[1:]:
+            os.remove(path.join(ExperimentRunner._trace_generation_folder,
+                                file_name))
+    
+    def do_simulation(self):
+        """Starts the emulation of the placed trace in a new python
+        process."""
+        machine = self._definition.get_machine()
+        command = [sys.executable, "-c", _LOCAL_SIMULATION_CODE,
+                   self._get_trace_route(), self._host_folder,
+                   str(machine._num_nodes), str(machine._cores_per_node),
+                   self._definition._workflow_handling,
+                   ExperimentRunner.get_manifest_folder(),
+                   str(self._definition.get_end_epoch()+
+                       ExperimentRunner._drain_time)]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self._sim_process = subprocess.Popen(command, env=env)
+    
+    def stop_simulation(self):
+        """Stops the emulation process if it is running."""
+        if self.is_sim_running():
+            self._sim_process.terminate()
+        if self._sim_process is not None:
+            self._sim_process.wait()
+    
+    def is_sim_running(self):
+        """Returns True if the emulation process is running."""
+        return (self._sim_process is not None and
+                self._sim_process.poll() is None)
+    
+    def check_trace_and_store(self, scheduler_db_obj, store_db_obj):
+        """ Loads the result trace left by the emulation and stores it in a 
+        central database.
+        Args:
+        - scheduler_db_obj: not used.
+        - store_db_obj: DBManager object configured to connect to the database
+            where results traces should be stored.
+        Returns True if the simulation produced a valid trace. False otherwise.
+        """
+        result_trace = self.get_result_trace()
+        if result_trace is None:
+            print("Error: No simulated jobs")
+            return False
+        return self._check_and_store_trace(result_trace, store_db_obj)
+    
+    def get_result_trace(self):
+        """Returns a ResultTrace with the jobs produced by the emulation, None
+        if the emulation did not complete."""
+        columns = TraceCache(self._host_folder, sys.maxsize).get(
+                                    "result",
+                                    self._definition.get_trace_file_name())
+        if columns is None:
+            return None
+        result_trace = ResultTrace()
+        result_trace._lists_submit = columns
+        return result_trace
+    
+    def clean_trace_file(self):
+        """Removes the trace file and the result trace from the host
+        folder."""
+        os.remove(self._get_trace_route())
+        TraceCache(self._host_folder, sys.maxsize).invalidate("result")
+    
+    def _get_trace_route(self):
+        return path.join(self._host_folder,
+                         self._definition.get_trace_file_name())
+
+
+_LOCAL_SIMULATION_CODE = ("import sys; "
+                          "from orchestration.running import "
+                          "_run_local_simulation; "
+                          "_run_local_simulation(*sys.argv[1:])")
+
+def _run_local_simulation(trace_file, result_folder, num_nodes,
+                          cores_per_node, workflow_handling, manifest_folder,
+                          end_time):
+    """Entry point of the simulation processes of LocalExperimentRunner.
+    Emulates the jobs in trace_file and stores the result columns in a
+    TraceCache in result_folder, under the key "result". Arguments are
+    strings, as received from the command line."""
+    emulator = SchedulerEmulator(int(num_nodes), int(cores_per_node),
+                                 workflow_handling=workflow_handling,
+                                 manifest_folder=manifest_folder)
+    result_trace = emulator.run_trace_file(trace_file,
+                                           end_time=int(end_time))
+    TraceCache(result_folder, sys.maxsize).put("result",
+                                               path.basename(trace_file),
+                                               result_trace._lists_submit)
@@ -3,6 +3,7 @@ Library to produce specific plots using the nerscsplot library.
 """
 from commonLib.nerscPlot import (paintHistogramMulti, paintBoxPlotGeneral,
                                  paintBarsHistogram)
+import copy
 import getopt
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
@@ -11,7 +12,7 @@ from array import array
 from numpy import ndarray, arange, asarray
 from stats.trace import ResultTrace
 from orchestration.definition import ExperimentDefinition
-from stats import  NumericStats
+from stats import  NumericStats, load_results_many
 from matplotlib.cbook import unique
 
 
@@ -1083,15 +1084,21 @@ def extract_usage(db_obj, trace_id_rows, fill_none=True, factor=1.0,
     res_type="usage"
     if mean:
         res_type="usage_mean"
+    trace_ids = [trace_id for row in trace_id_rows for trace_id in row]
+    exps = ExperimentDefinition.load_many(db_obj, trace_ids)
+    results = load_results_many(my._get_utilization_result, db_obj,
+                                [x for x in trace_ids
+                                 if exps[x].is_analysis_done()],
+                                [res_type])
     for row in trace_id_rows:
         new_row=[]
         exp_rows.append(new_row)
         for trace_id in row:
-            exp=ExperimentDefinition()
-            exp.load(db_obj, trace_id)
+            exp=exps[trace_id]
             result = my._get_utilization_result()           
             if exp.is_analysis_done():
-                result.load(db_obj, trace_id,res_type)
+                result = copy.deepcopy(results.get((trace_id, res_type),
+                                                   result))
             else:
                 result._set("utilization", 0)
                 result._set("waste", 0)
@@ -1116,17 +1123,23 @@ def extract_results(db_obj, trace_id_rows_colors, result_type, factor=None,
         corresponding to the result of that component.
     """
     exp_rows=[]  
+    key=result_type+"_stats"
+    trace_ids = [trace_id for row in trace_id_rows_colors for trace_id in row]
+    exps = ExperimentDefinition.load_many(db_obj, trace_ids)
+    results = load_results_many(NumericStats, db_obj,
+                                [x for x in trace_ids
+                                 if exps[x].is_analysis_done(
+                                                    second_pass=second_pass)],
+                                [key])
     for row in trace_id_rows_colors:
         new_row=[]
         exp_rows.append(new_row)
         for trace_id in row:
-            exp=ExperimentDefinition()
-            exp.load(db_obj, trace_id)
+            exp=exps[trace_id]
             
             if exp.is_analysis_done(second_pass=second_pass):
-                key=result_type+"_stats"
-                result = NumericStats()
-                result.load(db_obj, trace_id, key)
+                result = copy.deepcopy(results.get((trace_id, key),
+                                                   NumericStats()))
                 if factor:
                     result.apply_factor(factor)
             else:
@@ -7,11 +7,23 @@ not None.
 
 To repeat experiments, use set_global_random_gen before the experiment
 with the same "seed" value.
+
+Alternatively, set_global_random_streams enables a mode in which each random
+variable (inter-arrival time, cores, user, ...) draws its values from its own
+counter-based numpy Generator stream, derived from the seed and the name of
+the variable. In this mode the values of one random variable do not depend on
+how many values other variables have produced, so the generation can be
+batched and still produce the same trace.
 """
 
+import hashlib
 import random
 
+import numpy as np
+
 global_random_gen = None
+global_random_streams_seed = None
+global_random_streams = {}
 
 def set_global_random_gen(seed=None,random_gen=None):
     """Used by the whole package to get the random generator by all the
@@ -37,4 +49,41 @@ def get_random_gen(seed=None):
         return  global_random_gen
     r = random.Random()
     r.seed(a=seed)
-    return r
\ No newline at end of file
+    return r
+
+def set_global_random_streams(seed=None):
+    """Enables or disables the random streams mode. Streams are created
+    on demand by get_random_stream.
+    Args:
+        - seed: if set to an object with a stable string representation,
+            random streams are enabled and derived from it. If None, random
+            streams are disabled.
+    """
+    global global_random_streams_seed
+    global global_random_streams
+    global_random_streams_seed = seed
+    global_random_streams = {}
+
+def get_random_stream(name, default=None):
+    """Returns the numpy Generator associated to the random variable name if
+    the random streams mode is enabled, default otherwise. Calls with the
+    same name return the same Generator object until the mode is re-set.
+    Args:
+        - name: string identifying the random variable.
+        - default: value to return if the random streams are disabled.
+    """
+    if global_random_streams_seed is None:
+        return default
+    if name not in global_random_streams:
+        global_random_streams[name] = _create_random_stream(
+                                        global_random_streams_seed, name)
+    return global_random_streams[name]
+
+def _create_random_stream(seed, name):
+    """Returns a Philox (counter-based) numpy Generator whose state depends
+    only on seed and name."""
+    entropy = int(hashlib.sha256(str(seed).encode("utf-8")).hexdigest(), 16)
+    stream_key = int(hashlib.sha256(name.encode("utf-8")).hexdigest()[:16],
+                     16)
+    seed_seq = np.random.SeedSequence(entropy, spawn_key=(stream_key,))
+    return np.random.Generator(np.random.Philox(seed_seq))
@@ -0,0 +1,452 @@
+""" In-process emulator of the slurm simulator. It runs the jobs of a trace
+produced by TraceGenerator with a FCFS scheduler plus EASY backfilling, and
+returns the result in the same format as a trace imported from the slurm
+accounting database (ResultTrace), so it can be analyzed with stats.
+
+The emulation is an approximation of the slurm simulator, meant to explore
+experiment configurations quickly before running them in a worker:
+- Resources are allocated in whole nodes (select/linear).
+- Jobs are prioritized by submit time (FCFS) and started at every job
+submission or end. When the first job in the queue cannot start, a
+reservation is made for it, and jobs behind it can start if they do not
+delay that reservation (EASY backfilling). Backfilling passes happen at most
+once every backfill_interval seconds (bf_interval).
+- Jobs are killed when they reach their wall clock limit plus
+over_time_limit.
+- "afterok" dependencies between jobs are respected.
+- If workflow_handling is "manifest", workflows run as a single job
+allocating the maximum number of cores of the workflow. Inside it, each
+task starts as soon as the tasks it depends on end, and produces its own
+job record, as the workflow aware scheduler does.
+"""
+
+import bisect
+import heapq
+import os
+
+import numpy as np
+
+from generate.manifest_cache import get_manifest_cache
+from generate.pattern import WorkflowGeneratorMultijobs
+from slurm.trace_gen import read_trace
+from stats.trace import ResultTrace, TraceColumns
+
+# slurm job states.
+JOB_PENDING = 0
+JOB_RUNNING = 1
+JOB_COMPLETE = 3
+JOB_TIMEOUT = 6
+
+
+class SchedulerEmulator(object):
+    """Discrete event emulator of a slurm scheduler with FCFS and EASY
+    backfilling over a homogeneous machine."""
+
+    def __init__(self, num_nodes, cores_per_node, workflow_handling="single",
+                 manifest_folder="./", backfill_depth=50,
+                 backfill_interval=30, over_time_limit=60):
+        """Constructor.
+        Args:
+        - num_nodes: number of nodes of the emulated machine.
+        - cores_per_node: number of cores in each node.
+        - workflow_handling: "single", "multi", or "manifest" (see
+            ExperimentDefinition). Only "manifest" changes the emulation:
+            the tasks of workflow jobs are run inside of them.
+        - manifest_folder: folder where the manifest files of the workflows
+            in the trace are.
+        - backfill_depth: maximum number of jobs behind the first one in the
+            queue that are considered in each backfilling pass (max_job_bf).
+            If None, all are considered.
+        - backfill_interval: minimum number of seconds between two
+            backfilling passes. If 0, backfilling happens at every job
+            submission or end.
+        - over_time_limit: seconds that a job can run over its wall clock
+            limit before being killed.
+        """
+        self._num_nodes = num_nodes
+        self._cores_per_node = cores_per_node
+        self._workflow_handling = workflow_handling
+        self._manifest_folder = manifest_folder
+        self._backfill_depth = backfill_depth
+        self._backfill_interval = backfill_interval
+        self._over_time_limit = over_time_limit
+
+    def run_trace_file(self, file_name, end_time=None):
+        """Emulates the jobs of a binary trace file produced by
+        TraceGenerator. Returns a ResultTrace with the emulated jobs.
+        Args:
+        - file_name: route of the trace file.
+        - end_time: epoch timestamp at which the emulation stops. Jobs
+            running at that time have time_end=0, and jobs that did not start
+            time_start=0. If None, all the jobs are run until completion.
+        """
+        return self.run(read_trace(file_name), end_time=end_time)
+
+    def run(self, job_columns, end_time=None):
+        """Emulates the jobs in job_columns. Returns a ResultTrace with the
+        emulated jobs.
+        Args:
+        - job_columns: dictionary of numpy arrays with the fields of the
+            jobs, as returned by slurm.trace_gen.read_trace.
+        - end_time: epoch timestamp at which the emulation stops. See
+            run_trace_file.
+        """
+        jobs = self._get_jobs(job_columns)
+        _EasyScheduler(jobs, self._num_nodes, self._backfill_depth,
+                       self._backfill_interval).run(end_time)
+        result_trace = ResultTrace()
+        result_trace._lists_submit = self._get_result_columns(jobs,
+                                                              end_time)
+        return result_trace
+
+    def _get_jobs(self, job_columns):
+        """Returns a dictionary of numpy arrays with the values of the jobs
+        needed for the emulation."""
+        cores = (job_columns["tasks"].astype(np.int64)
+                 *np.maximum(job_columns["cpus_per_task"], 1))
+        duration = job_columns["duration"].astype(np.int64)
+        timelimit = job_columns["wclimit"].astype(np.int64)
+        has_limit = timelimit>0
+        kill_time = np.where(has_limit, timelimit*60+self._over_time_limit,
+                             duration)
+        jobs = dict(job_id=job_columns["job_id"].astype(np.int64),
+                    submit=job_columns["submit"].astype(np.int64),
+                    cores=cores,
+                    nodes=self._get_nodes(cores),
+                    runtime=np.minimum(duration, kill_time),
+                    timeout=duration>kill_time,
+                    estimate=np.where(has_limit, timelimit*60, duration),
+                    timelimit=timelimit)
+        for field in ["username", "qosname", "partition", "account",
+                      "dependency", "manifest_filename"]:
+            jobs[field] = np.array([x.decode("utf-8")
+                                    for x in job_columns[field]],
+                                   dtype=object)
+        return jobs
+
+    def _get_nodes(self, cores):
+        """Returns the number of nodes allocated to jobs using cores (number
+        or numpy array)."""
+        return np.maximum(-(-cores//self._cores_per_node), 1)
+
+    def _get_result_columns(self, jobs, end_time):
+        """Returns a TraceColumns object with the emulated jobs, ordered by
+        submit time, in the format of ResultTrace. If workflow_handling is
+        "manifest", it includes the records of the workflow tasks."""
+        manifests = jobs["manifest_filename"]
+        is_workflow = np.array([self._workflow_handling=="manifest" and
+                                x!="" and x[0]!="|" for x in manifests],
+                               dtype=bool)
+        started_workflows = np.flatnonzero(is_workflow & (jobs["start"]>0))
+        time_end = jobs["end"].copy()
+        # The record of a workflow job ends when its tasks start.
+        time_end[started_workflows] = jobs["start"][started_workflows]
+        columns = dict(id_job=jobs["job_id"],
+                       job_name=[_get_job_name(x) for x in manifests],
+                       cpus_req=jobs["cores"],
+                       nodes_alloc=jobs["nodes"],
+                       timelimit=jobs["timelimit"],
+                       time_start=jobs["start"],
+                       time_end=time_end,
+                       state=jobs["state"])
+        tasks = self._get_task_columns(jobs, started_workflows, end_time)
+        parents = np.concatenate([np.arange(len(manifests)),
+                                  np.array(tasks.pop("parent"),
+                                           dtype=np.int64)])
+        for (field, values) in columns.items():
+            dtype = object if field=="job_name" else np.int64
+            columns[field] = np.concatenate([np.array(values, dtype=dtype),
+                                             np.array(tasks[field],
+                                                      dtype=dtype)])
+        user_ids = _get_ids(jobs["username"], 1024)
+        qos_ids = _get_ids(jobs["qosname"], 1)
+        columns["id_user"] = np.array([user_ids[x] for x in
+                                       jobs["username"]],
+                                      dtype=np.int64)[parents]
+        columns["id_qos"] = np.array([qos_ids[x] for x in jobs["qosname"]],
+                                     dtype=np.int64)[parents]
+        columns["account"] = jobs["account"][parents]
+        columns["partition"] = jobs["partition"][parents]
+        columns["time_submit"] = jobs["submit"][parents]
+        columns["cpus_alloc"] = columns["nodes_alloc"]*self._cores_per_node
+        columns["id_resv"] = np.zeros(len(parents), dtype=np.int64)
+        columns["priority"] = np.zeros(len(parents), dtype=np.int64)
+        columns["job_db_inx"] = np.arange(1, len(parents)+1)
+        return TraceColumns(columns).get_sorted("time_submit")
+
+    def _get_task_columns(self, jobs, workflow_jobs, end_time):
+        """Returns a dictionary of lists with the records of the tasks of the
+        workflow jobs in positions workflow_jobs. "parent" contains the
+        position of each task's workflow job."""
+        tasks = dict([(field, []) for field in
+                      ["parent", "id_job", "job_name", "cpus_req",
+                       "nodes_alloc", "timelimit", "time_start", "time_end",
+                       "state"]])
+        task_id = int(jobs["job_id"].max()) if len(jobs["job_id"]) else 0
+        for job in workflow_jobs:
+            manifest = jobs["manifest_filename"][job]
+            layout = get_manifest_cache().get_derived(
+                                os.path.join(self._manifest_folder,
+                                             manifest.split("-")[0]),
+                                "task_layout", _calculate_task_layout)
+            workflow_start = int(jobs["start"][job])
+            workflow_end = workflow_start+int(jobs["runtime"][job])
+            for (stage, deps, offset, runtime, cores, timelimit) in layout:
+                task_id+=1
+                name = "wf_{0}_{1}".format(manifest, stage)
+                if deps:
+                    name+="_{0}".format("-".join(["d"+x for x in deps]))
+                start, end, state = _get_task_times(workflow_start+offset,
+                                                    runtime, workflow_end,
+                                                    end_time)
+                for (field, value) in [("parent", job), ("id_job", task_id),
+                                       ("job_name", name),
+                                       ("cpus_req", cores),
+                                       ("nodes_alloc",
+                                        self._get_nodes(cores)),
+                                       ("timelimit", timelimit),
+                                       ("time_start", start),
+                                       ("time_end", end), ("state", state)]:
+                    tasks[field].append(value)
+        return tasks
+
+
+class _EasyScheduler(object):
+    """Event loop of the emulation. Jobs are identified by their position in
+    the jobs dictionary."""
+
+    def __init__(self, jobs, num_nodes, backfill_depth, backfill_interval):
+        """Constructor.
+        Args:
+        - jobs: dictionary of numpy arrays with the jobs to emulate. See
+            SchedulerEmulator._get_jobs.
+        - num_nodes: number of nodes of the emulated machine.
+        - backfill_depth, backfill_interval: see SchedulerEmulator.
+        """
+        self._jobs = jobs
+        self._num_nodes = num_nodes
+        self._backfill_depth = backfill_depth
+        self._backfill_interval = backfill_interval
+        count = len(jobs["job_id"])
+        self._submit = jobs["submit"].tolist()
+        self._nodes = jobs["nodes"].tolist()
+        self._runtime = jobs["runtime"].tolist()
+        self._estimate = jobs["estimate"].tolist()
+        self._timeout = jobs["timeout"].tolist()
+        self._start = [0]*count
+        self._end = [0]*count
+        self._state = [JOB_PENDING]*count
+        self._submitted = [False]*count
+        self._pending_deps, self._dependents = _get_dependencies(
+                                    jobs["job_id"].tolist(), jobs["dependency"])
+        self._free_nodes = num_nodes
+        # Sorted lists of (submit time, job) of the jobs that can start, and
+        # (estimated end time, job) of the running jobs.
+        self._queue = []
+        self._running = []
+        # Heap of (end time, job) of the running jobs.
+        self._end_events = []
+        self._next_backfill_time = None
+        # True if jobs were queued or ended after the last backfilling pass.
+        # Otherwise, a new pass cannot start any job.
+        self._backfill_pending = False
+
+    def run(self, end_time):
+        """Runs the emulation until all jobs end, or end_time is reached.
+        Sets "start", "end", and "state" arrays in jobs."""
+        count = len(self._submit)
+        submit_order = np.lexsort((np.arange(count),
+                                   self._jobs["submit"])).tolist()
+        next_submit = 0
+        while next_submit<count or self._end_events:
+            event_times = [self._end_events[0][0]] if self._end_events else []
+            if next_submit<count:
+                event_times.append(self._submit[submit_order[next_submit]])
+            if (self._queue and self._backfill_pending and
+                self._backfill_interval and
+                self._next_backfill_time is not None):
+                # Pending backfilling pass.
+                event_times.append(self._next_backfill_time)
+            now = min(event_times)
+            if end_time is not None and now>end_time:
+                break
+            while self._end_events and self._end_events[0][0]==now:
+                self._end_job(heapq.heappop(self._end_events)[1], now)
+            while (next_submit<count and
+                   self._submit[submit_order[next_submit]]<=now):
+                self._submit_job(submit_order[next_submit])
+                next_submit+=1
+            self._schedule(now)
+        self._jobs["start"] = np.array(self._start, dtype=np.int64)
+        self._jobs["end"] = np.array(self._end, dtype=np.int64)
+        self._jobs["state"] = np.array(self._state, dtype=np.int64)
+
+    def _submit_job(self, job):
+        self._submitted[job] = True
+        if (self._nodes[job]<=self._num_nodes and
+            self._pending_deps[job]==0):
+            bisect.insort(self._queue, (self._submit[job], job))
+            self._backfill_pending = True
+
+    def _start_job(self, job, now):
+        self._start[job] = now
+        self._state[job] = JOB_RUNNING
+        self._free_nodes -= self._nodes[job]
+        heapq.heappush(self._end_events, (now+self._runtime[job], job))
+        bisect.insort(self._running, (now+self._estimate[job], job))
+
+    def _end_job(self, job, now):
+        """Ends job and queues the jobs that were only waiting for it."""
+        self._end[job] = now
+        self._free_nodes += self._nodes[job]
+        self._backfill_pending = True
+        del self._running[bisect.bisect_left(
+                        self._running,
+                        (self._start[job]+self._estimate[job], job))]
+        if self._timeout[job]:
+            # afterok dependencies on the job are never satisfied.
+            self._state[job] = JOB_TIMEOUT
+            return
+        self._state[job] = JOB_COMPLETE
+        for dependent in self._dependents.get(job, []):
+            self._pending_deps[dependent]-=1
+            if (self._pending_deps[dependent]==0 and
+                self._submitted[dependent]):
+                bisect.insort(self._queue, (self._submit[dependent],
+                                            dependent))
+
+    def _schedule(self, now):
+        """Starts jobs in the queue in FCFS order until one cannot start.
+        Then, if backfill_interval seconds have passed since the last
+        backfilling pass, does one."""
+        queue = self._queue
+        while queue and self._nodes[queue[0][1]]<=self._free_nodes:
+            self._start_job(queue.pop(0)[1], now)
+        if not queue or not self._backfill_pending:
+            return
+        if (self._next_backfill_time is not None and
+            now<self._next_backfill_time):
+            return
+        self._next_backfill_time = now+self._backfill_interval
+        self._backfill_pending = False
+        if self._free_nodes>0:
+            self._backfill(now)
+
+    def _backfill(self, now):
+        """Starts the jobs behind the first one in the queue that do not delay
+        its reservation (EASY backfilling)."""
+        queue = self._queue
+        shadow_time, extra_nodes = self._get_reservation(
+                                            self._nodes[queue[0][1]], now)
+        pos = 1
+        last_pos = len(queue)
+        if self._backfill_depth is not None:
+            last_pos = min(last_pos, self._backfill_depth+1)
+        while pos<last_pos and self._free_nodes>0:
+            job = queue[pos][1]
+            ends_before_shadow = now+self._estimate[job]<=shadow_time
+            if (self._nodes[job]<=self._free_nodes and
+                (ends_before_shadow or self._nodes[job]<=extra_nodes)):
+                del queue[pos]
+                last_pos-=1
+                self._start_job(job, now)
+                if not ends_before_shadow:
+                    extra_nodes-=self._nodes[job]
+            else:
+                pos+=1
+
+    def _get_reservation(self, required_nodes, now):
+        """Returns the time at which required_nodes will be free according
+        to the estimated end time of the running jobs (shadow time), and the
+        number of nodes that will be free at that time and are not required.
+        """
+        free_nodes = self._free_nodes
+        for (estimated_end, job) in self._running:
+            free_nodes+=self._nodes[job]
+            if free_nodes>=required_nodes:
+                return max(estimated_end, now), free_nodes-required_nodes
+        return now, free_nodes-required_nodes
+
+
+def _get_dependencies(job_ids, dependency_list):
+    """Returns a list with the number of jobs each job depends on, and a
+    dictionary of lists of the jobs depending on each job. Jobs are
+    identified by position. Dependencies on jobs not in job_ids are ignored.
+    Args:
+    - job_ids: list of the job ids.
+    - dependency_list: list of slurm dependency strings of the jobs, e.g.
+        "afterok:12,afterok:13".
+    """
+    positions = dict([(job_id, pos) for (pos, job_id) in enumerate(job_ids)])
+    pending_deps = [0]*len(job_ids)
+    dependents = {}
+    for (pos, dependency) in enumerate(dependency_list):
+        if not dependency:
+            continue
+        for dep in dependency.split(","):
+            for dep_id in dep.split(":")[1:]:
+                dep_pos = positions.get(int(dep_id))
+                if dep_pos is not None:
+                    pending_deps[pos]+=1
+                    dependents.setdefault(dep_pos, []).append(pos)
+    return pending_deps, dependents
+
+def _get_ids(values, first_id):
+    """Returns a dictionary assigning consecutive ids, starting at first_id,
+    to the values in order of appearance."""
+    ids = {}
+    for value in values:
+        if not value in ids:
+            ids[value] = first_id+len(ids)
+    return ids
+
+def _get_job_name(manifest):
+    """Returns the job name that the slurm simulator gives to a job with
+    the workflow manifest field manifest."""
+    if manifest=="":
+        return "sim_job"
+    if manifest[0]=="|":
+        return manifest[1:]
+    return "wf_"+manifest
+
+def _get_task_times(start, runtime, workflow_end, end_time):
+    """Returns the start time, end time, and state of a workflow task that
+    would start at start and run for runtime seconds, inside of a workflow
+    job ending at workflow_end. end_time is the end of the emulation (can be
+    None)."""
+    if ((start>=workflow_end and runtime>0) or
+        (end_time is not None and start>end_time)):
+        return 0, 0, JOB_PENDING
+    end = min(start+runtime, workflow_end)
+    if end_time is not None and end>end_time:
+        return start, 0, JOB_RUNNING
+    if end<start+runtime:
+        return start, end, JOB_TIMEOUT
+    return start, end, JOB_COMPLETE
+
+def _calculate_task_layout(manifest_route):
+    """Returns a list of (task id, list of ids of tasks it depends on, start
+    time relative to the workflow start, runtime, cores, wall clock limit in
+    minutes) tuples for the tasks of the manifest in manifest_route, sorted
+    by start time. Tasks start as soon as the tasks they depend on end."""
+    cores, runtime, tasks = WorkflowGeneratorMultijobs.parse_all_jobs(
+                                                            manifest_route)
+    layout = []
+    remaining_tasks = list(tasks.values())
+    while remaining_tasks:
+        new_remaining_tasks = []
+        for task in remaining_tasks:
+            deps = task["dependencyFrom"]
+            if not all(["time_end" in x for x in deps]):
+                new_remaining_tasks.append(task)
+                continue
+            start = max([x["time_end"] for x in deps]+[0])
+            task["time_end"] = start+task["runtime_sim"]
+            layout.append((task["id"], [x["id"] for x in deps], start,
+                           task["runtime_sim"], int(task["number_of_cores"]),
+                           int(task["runtime_limit"]/60)))
+        if len(new_remaining_tasks)==len(remaining_tasks):
+            raise ValueError("Dependency cycle in manifest {0}".format(
+                                                            manifest_route))
+        remaining_tasks = new_remaining_tasks
+    return sorted(layout, key=lambda x: x[2])
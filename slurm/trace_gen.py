@@ -15,18 +15,256 @@ Copyright Lawrence Berkeley National Lab 2015.
  
 """
 
+from collections import deque
 import os
+import shutil
 import struct
 import subprocess
 
+import numpy as np
+
+
+def _get_struct_dtype(fields):
+    """Returns a numpy dtype with the same memory layout as the struct format
+    composed by the formats in fields (native alignment).
+    Args:
+    - fields: list of (name, struct_format) tuples.
+    """
+    names = []
+    formats = []
+    offsets = []
+    struct_format = ""
+    for (name, field_format) in fields:
+        struct_format += field_format
+        names.append(name)
+        if field_format.endswith("s"):
+            formats.append("S"+field_format[:-1])
+        else:
+            formats.append(field_format)
+        offsets.append(struct.calcsize(struct_format)
+                       - struct.calcsize(field_format))
+    return np.dtype(dict(names=names, formats=formats, offsets=offsets,
+                         itemsize=struct.calcsize(struct_format)))
+
+JOB_TRACE_FIELDS = [("job_id", "i"), ("username", "30s"), ("submit", "l"),
+                    ("duration", "i"), ("wclimit", "i"), ("tasks", "i"),
+                    ("qosname", "30s"), ("partition", "30s"),
+                    ("account", "30s"), ("cpus_per_task", "i"),
+                    ("tasks_per_node", "i"), ("reservation", "30s"),
+                    ("dependency", "1024s"), ("next", "P")]
+JOB_TRACE_WF_FIELDS = ([("wf_mark", "l")] + JOB_TRACE_FIELDS + 
+                       [("manifest_filename", "1024s"), ("manifest", "P")])
+WF_MARK = 0xFFFFFFFF
+
+# numpy equivalents of the job_trace_t records produced by get_job_trace.
+JOB_TRACE_DTYPE = _get_struct_dtype(JOB_TRACE_FIELDS)
+JOB_TRACE_WF_DTYPE = _get_struct_dtype(JOB_TRACE_WF_FIELDS)
+
+
+class JobTraceStore(object):
+    """Columnar in-memory storage of the jobs of a trace. Numeric fields are
+    stored in chunks of numpy arrays, username, qos, partition, and account
+    are stored as ids of a table of unique strings. Records are produced in
+    the job_trace_t binary format only when they are read.
+    """
+    
+    _string_fields = ["username", "qosname", "partition", "account"]
+    _columns_dtype = np.dtype([("job_id", "i"), ("submit", "l"),
+                               ("duration", "i"), ("wclimit", "i"),
+                               ("tasks", "i"), ("cpus_per_task", "i"),
+                               ("tasks_per_node", "i"), ("username", "i"),
+                               ("qosname", "i"), ("partition", "i"),
+                               ("account", "i"), ("is_workflow", "?")])
+    
+    def __init__(self, chunk_size=16384):
+        """Constructor.
+        Args:
+        - chunk_size: number of jobs stored in each chunk of columns.
+        """
+        self._chunk_size = chunk_size
+        self._string_tables = {x:[] for x in self._string_fields}
+        self._string_ids = {x:{} for x in self._string_fields}
+        self._chunks = []
+        self._job_count = 0
+    
+    def add_job(self, job_id, username, submit_time, duration, wclimit,
+                tasks, cpus_per_task, tasks_per_node, qosname, partition,
+                account, reservation="", dependency="",
+                workflow_manifest=None):
+        """Stores a job. Arguments have the same meaning as in get_job_trace.
+        """
+        if not self._chunks or self._chunks[-1]["count"]==self._chunk_size:
+            self._chunks.append(self._create_chunk())
+        chunk = self._chunks[-1]
+        chunk["columns"][chunk["count"]] = (
+                                    job_id, submit_time, duration, 
+                                    int(wclimit), tasks, cpus_per_task,
+                                    tasks_per_node,
+                                    self._get_string_id("username", username),
+                                    self._get_string_id("qosname", qosname),
+                                    self._get_string_id("partition",
+                                                        partition),
+                                    self._get_string_id("account", account),
+                                    workflow_manifest is not None)
+        chunk["reservation"].append(reservation)
+        chunk["dependency"].append(dependency)
+        chunk["workflow_manifest"].append(workflow_manifest)
+        chunk["count"]+=1
+        self._job_count+=1
+    
+    def get_job_count(self):
+        """Returns the number of jobs stored."""
+        return self._job_count
+    
+    def iter_records(self):
+        """Yields the stored jobs, in order, as numpy arrays of
+        JOB_TRACE_DTYPE (jobs without manifest) or JOB_TRACE_WF_DTYPE records.
+        Each array contains consecutive jobs of the same type. Its binary
+        content is the same as the concatenation of the get_job_trace output
+        of each job.
+        """
+        string_arrays = self._get_string_arrays()
+        for chunk in self._chunks:
+            for records in self._get_chunk_records(chunk, string_arrays):
+                yield records
+    
+    def write_records(self, f, full_chunks_only=False):
+        """Writes the stored jobs records in the binary file f, and removes
+        them from the store. Jobs written are still included in
+        get_job_count.
+        Args:
+        - f: file object opened in binary write mode.
+        - full_chunks_only: if True, only chunks that cannot receive more jobs
+            are written.
+        """
+        chunks = self._chunks
+        if full_chunks_only:
+            chunks = [x for x in chunks if x["count"]==self._chunk_size]
+        if not chunks:
+            return
+        string_arrays = self._get_string_arrays()
+        for chunk in chunks:
+            for records in self._get_chunk_records(chunk, string_arrays):
+                records.tofile(f)
+        self._chunks = self._chunks[len(chunks):]
+    
+    def _get_string_arrays(self):
+        return {x: _encode_strings(self._string_tables[x], "S30")
+                for x in self._string_fields}
+    
+    def _get_chunk_records(self, chunk, string_arrays):
+        columns = chunk["columns"][:chunk["count"]]
+        is_workflow = columns["is_workflow"]
+        change_points = list(np.flatnonzero(is_workflow[1:] != 
+                                            is_workflow[:-1])+1)
+        for (start, end) in zip([0]+change_points, 
+                                change_points+[len(columns)]):
+            run_columns = columns[start:end]
+            if is_workflow[start]:
+                records = np.zeros(end-start, dtype=JOB_TRACE_WF_DTYPE)
+                records["wf_mark"] = WF_MARK
+                records["manifest_filename"] = _encode_strings(
+                                    chunk["workflow_manifest"][start:end],
+                                    "S1024")
+            else:
+                records = np.zeros(end-start, dtype=JOB_TRACE_DTYPE)
+            for field in ["job_id", "submit", "duration", "wclimit", "tasks",
+                          "cpus_per_task", "tasks_per_node"]:
+                records[field] = run_columns[field]
+            for field in self._string_fields:
+                records[field] = string_arrays[field][run_columns[field]]
+            records["reservation"] = _encode_strings(
+                                    chunk["reservation"][start:end], "S30")
+            records["dependency"] = _encode_strings(
+                                    chunk["dependency"][start:end], "S1024")
+            yield records
+    
+    def _create_chunk(self):
+        return dict(columns=np.zeros(self._chunk_size,
+                                     dtype=self._columns_dtype),
+                    count=0, reservation=[], dependency=[],
+                    workflow_manifest=[])
+    
+    def _get_string_id(self, field, value):
+        string_ids = self._string_ids[field]
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._string_tables[field])
+            string_ids[value] = string_id
+            self._string_tables[field].append(value)
+        return string_id
+
+def _encode_strings(string_list, dtype):
+    return np.array([x.encode("utf-8") for x in string_list], dtype=dtype)
+
+
+class SlidingWindowAccumulator(object):
+    """Keeps the sum of the values added within a time window that ends at the
+    time stamp of the last added value. Adding a value and evicting the
+    values out of the window are amortized O(1) operations.
+    """
+    
+    def __init__(self, window_size):
+        """Constructor.
+        Args:
+        - window_size: number of seconds to look into the past from the last
+            added value.
+        """
+        self._window_size = window_size
+        self.reset()
+    
+    def reset(self):
+        """Removes all values from the window."""
+        self._stamps = deque()
+        self._values = deque()
+        self._sum = 0
+    
+    def add(self, stamp, value):
+        """Adds a value and evicts those older than stamp-window_size.
+        Args:
+        - stamp: epoch time stamp of the value. Must not be smaller than the
+            time stamps of previously added values.
+        - value: number to be added.
+        Returns: number of values evicted and their sum.
+        """
+        self._stamps.append(stamp)
+        self._values.append(value)
+        self._sum += value
+        evicted_count = 0
+        evicted_sum = 0
+        while self._stamps and self._stamps[0] < (stamp-self._window_size):
+            evicted_value = self._values.popleft()
+            self._stamps.popleft()
+            self._sum -= evicted_value
+            evicted_sum += evicted_value
+            evicted_count += 1
+        return evicted_count, evicted_sum
+    
+    def get_sum(self):
+        """Returns the sum of the values within the window."""
+        return self._sum
+    
+    def get_first_stamp(self):
+        """Returns the time stamp of the oldest value within the window, None
+        if the window is empty."""
+        if not self._stamps:
+            return None
+        return self._stamps[0]
+    
+    def __len__(self):
+        return len(self._stamps)
+
 
 class TraceGenerator(object):
     """Class to generate all the elements of a simulator trace. qos and user
     lists are generated from the detected users and qos in the submitted jobs.
+    Jobs are kept in a columnar JobTraceStore until the trace is dumped.
     """
     
     def __init__(self):
-        self._job_list = []
+        self._job_store = JobTraceStore()
+        self._stream_file = None
+        self._stream_file_name = None
         self._user_list = []
         self._account_list = []
         self._qos_list = []
@@ -34,8 +272,7 @@ class TraceGenerator(object):
         self._first_submit_time = -1
         self._last_submit_time = -1
         self._decay_window_size = -1
-        self._decay_window_stamps = None
-        self._decay_window_values = None
+        self._decay_window = None
         self._total_submitted_core_s = 0
         self._total_actual_core_s = 0
         self._total_actual_wf_core_s=0
@@ -46,17 +283,20 @@ class TraceGenerator(object):
                   reservation="", dependency="", workflow_manifest=None,
                   cores_s=None, ignore_work=False, real_core_s=None):
         """Ad a job with the observed characteristics. wclimit is in minutes"""
-        self._job_list.append(get_job_trace(job_id=job_id, username=username, 
-                                           submit_time=submit_time, 
-                                           duration=duration, wclimit=wclimit,
-                                           tasks=tasks,
-                                           cpus_per_task=cpus_per_task,
-                                           tasks_per_node=tasks_per_node, 
-                                           qosname=qosname, partition=partition,
-                                           account=account,
-                                           reservation=reservation,
-                                           dependency=dependency,
-                                           workflow_manifest=workflow_manifest))
+        self._job_store.add_job(job_id=job_id, username=username, 
+                                submit_time=submit_time, 
+                                duration=duration, wclimit=wclimit,
+                                tasks=tasks,
+                                cpus_per_task=cpus_per_task,
+                                tasks_per_node=tasks_per_node, 
+                                qosname=qosname, partition=partition,
+                                account=account,
+                                reservation=reservation,
+                                dependency=dependency,
+                                workflow_manifest=workflow_manifest)
+        if self._stream_file is not None:
+            self._job_store.write_records(self._stream_file,
+                                          full_chunks_only=True)
         
         if not username in self._user_list:
             self._user_list.append(username)
@@ -98,22 +338,18 @@ class TraceGenerator(object):
             self._first_submit_time = submit_time
         self._last_submit_time=submit_time
         if self._decay_window_size>0:
-            self._decay_window_stamps.append(submit_time)
-            self._decay_window_values.append(work)
-            while (self._decay_window_stamps and
-                   self._decay_window_stamps[0] < 
-                     (submit_time-self._decay_window_size)):
-                self._submitted_core_s -= self._decay_window_values[0]
-                self._decay_window_stamps = self._decay_window_stamps[1:]
-                self._decay_window_values = self._decay_window_values[1:]
-                self._first_submit_time = self._decay_window_stamps[0]
+            evicted_count, evicted_work = self._decay_window.add(submit_time,
+                                                                 work)
+            if evicted_count:
+                self._submitted_core_s -= evicted_work
+                self._first_submit_time = self._decay_window.get_first_stamp()
    
     def reset_work(self):
         self._first_submit_time=-1
         self._last_submit_time=-1
         self._submitted_core_s=0
-        self._decay_window_stamps=[]
-        self._decay_window_values=[]
+        if self._decay_window is not None:
+            self._decay_window.reset()
         self._total_submitted_core_s=0
         self._total_actual_core_s=0
         self._total_actual_wf_core_s=0
@@ -132,8 +368,7 @@ class TraceGenerator(object):
             window. if set to <=0 decay is deactivated.
         """
         self._decay_window_size=decay_window_size
-        self._decay_window_stamps = []
-        self._decay_window_values = []
+        self._decay_window = SlidingWindowAccumulator(decay_window_size)
         
     def get_submitted_core_s(self):
         """Returns core-seconds submitted so far and difference between the
@@ -153,13 +388,58 @@ class TraceGenerator(object):
     def get_total_actual_cores_s(self):
         return self._total_actual_core_s;
         
+    def set_stream_file(self, file_name):
+        """Configures the generator to write the job records in file_name as
+        jobs are added, one chunk of the job store at a time. Memory usage is
+        bounded regardless of the number of jobs. dump_trace writes the
+        remaining jobs and closes the file. User and qos lists are kept in
+        memory. Must be used before any job is added.
+        Args:
+        - file_name: route of the trace file to write. 
+        """
+        if self._job_store.get_job_count():
+            raise ValueError("Stream file has to be set before adding jobs.")
+        self._stream_file = open(file_name, 'bw')
+        self._stream_file_name = file_name
+        
+    def close_stream_file(self):
+        """Closes and removes the stream file, if one is configured and
+        dump_trace has not been called. Pending jobs are discarded. Used to
+        release the file when a trace generation fails."""
+        if self._stream_file is None:
+            return
+        self._stream_file.close()
+        self._stream_file = None
+        if os.path.exists(self._stream_file_name):
+            os.remove(self._stream_file_name)
+        
     def dump_trace(self, file_name):
-        """Dump job list."""
+        """Dump job list. If a stream file is configured, the pending jobs are
+        written to it, and it is moved to file_name if they are different."""
+        if self._stream_file is not None:
+            self._job_store.write_records(self._stream_file)
+            self._stream_file.close()
+            self._stream_file = None
+            if (os.path.abspath(file_name) != 
+                os.path.abspath(self._stream_file_name)):
+                shutil.move(self._stream_file_name, file_name)
+            return
         f = open(file_name, 'bw')
-        for job in self._job_list:
-            f.write(job)
+        for records in self._job_store.iter_records():
+            records.tofile(f)
         f.close()
     
+    def get_trace_bytes(self):
+        """Returns the binary content that dump_trace would write. It holds
+        the whole trace in memory, use only for small traces. If a stream
+        file is configured, only jobs not yet written are included."""
+        return b"".join([records.tobytes() 
+                         for records in self._job_store.iter_records()])
+    
+    def get_job_count(self):
+        """Returns the number of jobs added to the trace."""
+        return self._job_store.get_job_count()
+    
     def dump_users(self, file_name, extra_users=[]):
         """Dump user list with the format user:userid per line."""
         start_count = 1024
@@ -181,8 +461,8 @@ class TraceGenerator(object):
         f.close()
     
     def free_mem(self):
-        del self._job_list
-        self._job_list=[]
+        del self._job_store
+        self._job_store=JobTraceStore()
     
 
 def get_job_trace(job_id, username, submit_time, duration, wclimit,tasks,
@@ -253,11 +533,17 @@ def extract_records(file_name="test.trace",
                     list_trace_location="./list_trace"):
     """Reads a binary list job file and returns a list of dict (one per job)
     with the job characteristics.
+    Args:
+    - file_name: route of the trace file.
+    - list_trace_location: route of the list_trace command used to parse the
+        file. If None, the file is parsed with read_trace.
     
     Returns: A list of dict, each dict is a job. The dict keys are: JOBID,
         USERNAME, PARTITION, ACCOUNT, QOS, SUBMIT, DURATION, WCLIMIT, TASKS,
         RES, DEP, NUM_TASKS, TASKS_PER_NODE, CORES_PER_TASK
     """
+    if list_trace_location is None:
+        return _extract_records_native(file_name)
 
     print([list_trace_location, '-w', file_name])
     proc = subprocess.Popen([list_trace_location, '-w', file_name], 
@@ -294,3 +580,113 @@ def extract_records(file_name="test.trace",
         elif "====" in line:
             still_header=False
     return records_list  
+
+
+def iter_trace_records(file_name):
+    """Reads a binary job trace file without external tools. Yields numpy
+    arrays of JOB_TRACE_DTYPE or JOB_TRACE_WF_DTYPE records (depending if
+    the records include a workflow manifest or not). Each array contains
+    consecutive jobs with the same layout and is a read-only view over the
+    memory-mapped file.
+    """
+    if os.path.getsize(file_name)==0:
+        return
+    trace_map = np.memmap(file_name, dtype="u1", mode="r")
+    for (offset, dtype, count) in _get_trace_runs(trace_map):
+        yield np.ndarray(shape=(count,), dtype=dtype, buffer=trace_map,
+                         offset=offset)
+
+def read_trace(file_name, fields=None):
+    """Reads a binary job trace file without external tools and returns its
+    content as columns.
+    Args:
+    - file_name: route of the trace file.
+    - fields: list of field names to read from JOB_TRACE_WF_FIELDS. If None,
+        all fields except the pointers and wf_mark are read.
+    Returns: a dictionary indexed by field name containing a numpy array per
+        field. Text fields are bytes arrays. manifest_filename is empty for
+        jobs without manifest.
+    """
+    if fields is None:
+        fields = [x[0] for x in JOB_TRACE_WF_FIELDS 
+                  if x[0] not in ["wf_mark", "next", "manifest"]]
+    columns = {x:[] for x in fields}
+    for records in iter_trace_records(file_name):
+        for field in fields:
+            if field in records.dtype.names:
+                columns[field].append(records[field])
+            else:
+                columns[field].append(np.zeros(len(records),
+                                               JOB_TRACE_WF_DTYPE[field]))
+    return {x: (np.concatenate(y) if y 
+                else np.zeros(0, JOB_TRACE_WF_DTYPE[x]))
+            for (x, y) in columns.items()}
+
+def _get_trace_runs(trace_buffer):
+    """Returns a list of (offset, dtype, count) tuples, one per sequence of
+    records with the same layout in trace_buffer. A record uses the workflow
+    layout if its first long is WF_MARK.
+    """
+    size = len(trace_buffer)
+    # Fast path: all records of the trace have the same layout.
+    for dtype in [JOB_TRACE_WF_DTYPE, JOB_TRACE_DTYPE]:
+        if size % dtype.itemsize:
+            continue
+        count = size // dtype.itemsize
+        marks = np.ndarray(shape=(count,), dtype="l", buffer=trace_buffer,
+                           strides=(dtype.itemsize,))
+        is_workflow = (marks == WF_MARK)
+        if dtype is JOB_TRACE_WF_DTYPE and is_workflow.all():
+            return [(0, dtype, count)]
+        if dtype is JOB_TRACE_DTYPE and not is_workflow.any():
+            return [(0, dtype, count)]
+    runs = []
+    offset = 0
+    while offset < size:
+        if struct.unpack_from("l", trace_buffer, offset)[0] == WF_MARK:
+            dtype = JOB_TRACE_WF_DTYPE
+        else:
+            dtype = JOB_TRACE_DTYPE
+        if offset+dtype.itemsize > size:
+            raise ValueError("Truncated job record at position {0}".format(
+                                                                    offset))
+        if runs and runs[-1][1] is dtype:
+            runs[-1][2]+=1
+        else:
+            runs.append([offset, dtype, 1])
+        offset+=dtype.itemsize
+    return [tuple(x) for x in runs]
+
+def _extract_records_native(file_name):
+    """Same output as extract_records, but parsing the file with read_trace.
+    """
+    columns = read_trace(file_name)
+    text_fields = ["username", "partition", "account", "qosname",
+                   "reservation", "dependency", "manifest_filename"]
+    for field in text_fields:
+        columns[field] = [x.decode("utf-8") for x in columns[field]]
+    records_list = []
+    for i in range(len(columns["job_id"])):
+        record = dict(JOBID=str(columns["job_id"][i]),
+                      USERNAME=columns["username"][i],
+                      PARTITION=columns["partition"][i],
+                      ACCOUNT=columns["account"][i],
+                      QOS=columns["qosname"][i],
+                      SUBMIT=str(columns["submit"][i]),
+                      DURATION=str(columns["duration"][i]),
+                      WCLIMIT=str(columns["wclimit"][i]),
+                      TASKS="{0}({1},{2})".format(
+                                            columns["tasks"][i],
+                                            columns["tasks_per_node"][i],
+                                            columns["cpus_per_task"][i]),
+                      NUM_TASKS=int(columns["tasks"][i]),
+                      TASKS_PER_NODE=int(columns["tasks_per_node"][i]),
+                      CORES_PER_TASK=int(columns["cpus_per_task"][i]))
+        if columns["reservation"][i]:
+            record["RES"] = columns["reservation"][i]
+        if columns["dependency"][i]:
+            record["DEP"] = columns["dependency"][i]
+        if columns["manifest_filename"][i]:
+            record["WF"] = columns["manifest_filename"][i]
+        records_list.append(record)
+    return records_list
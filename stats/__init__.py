@@ -2,6 +2,7 @@ from analysis.jobAnalysis import calculate_histogram
 import pickle
 import MySQLdb
 import numpy as np
+import zlib
 
 
 class Result(object):
@@ -66,8 +67,13 @@ class Result(object):
                                         "trace_id={0} and type='{1}'".format(
                                         trace_id, measurement_type))
         if data_dic is not None and data_dic != ():
-            for key in keys:
-                self._set(key, self._decode(data_dic[0][key], key))
+            self._load_row(data_dic[0])
+    
+    def _load_row(self, row):
+        """Sets self._data from a dictionary returned by a query over
+        self._table_name."""
+        for key in self._keys:
+            self._set(key, self._decode(row[key], key))
     
     def get_data(self):
         return self._data
@@ -166,15 +172,51 @@ class Histogram(Result):
                 )""".format(self._table_name)
     
     def _encode(self, data_value, key):
-        import codecs
-        """Datbase uses blobls to store the edges and bins"""
-        pickle_data = pickle.dumps(data_value)
-        return codecs.encode(pickle_data, "base64").decode()
+        """Datbase uses blobls to store the edges and bins. They are stored
+        in the binary format of _encode_array."""
+        return _encode_array(data_value)
     def _decode(self, blob, key):
+        """Decodes blobs in the _encode_array format and also the pickle +
+        base64 format used by previous versions."""
+        if isinstance(blob, str):
+            blob = blob.encode()
+        if blob.startswith(_ARRAY_MAGIC):
+            return _decode_array(blob)
         import codecs
         pickle_data=codecs.decode(blob, "base64")
         return pickle.loads(pickle_data)
 
+_ARRAY_MAGIC = b"\x00SA"
+_ARRAY_VERSION = 1
+_ARRAY_ZLIB = 1
+
+def _encode_array(values):
+    """Encodes a list of numbers as a versioned binary blob: an 8 bytes
+    header (magic, version, flags, padding) followed by the values as little
+    endian float64. If it reduces the size, the values are compressed with
+    zlib (signaled in flags).
+    """
+    data = np.asarray(values, dtype="<f8").tobytes()
+    flags = 0
+    compressed = zlib.compress(data, 1)
+    if len(compressed) < len(data):
+        data = compressed
+        flags |= _ARRAY_ZLIB
+    return (_ARRAY_MAGIC + bytes([_ARRAY_VERSION, flags]) + b"\x00"*3 +
+            data)
+
+def _decode_array(blob):
+    """Decodes a blob produced by _encode_array. Returns a read-only
+    numpy array of float64 that shares memory with the uncompressed data.
+    Raises ValueError if the blob version is not supported."""
+    version, flags = blob[3], blob[4]
+    if version != _ARRAY_VERSION:
+        raise ValueError("Unsupported encoded array version: {0}".format(
+                                                                    version))
+    if flags & _ARRAY_ZLIB:
+        return np.frombuffer(zlib.decompress(blob[8:]), dtype="<f8")
+    return np.frombuffer(blob, dtype="<f8", offset=8)
+
 class NumericList(Result):
     
     def _create_query(self):
@@ -289,7 +331,7 @@ def calculate_results(data_list, field_list, bin_size_list,
     results_dic={}
     for (data, cdf_field, stats_field, bin_size, minmax) in zip(data_list,
             cdf_field_list, stats_field_list, bin_size_list, minmax_list):
-        if data:
+        if len(data)>0:
             cdf = Histogram()
             cdf.calculate(data, bin_size=bin_size, minmax=minmax)
             if store:
@@ -297,13 +339,111 @@ def calculate_results(data_list, field_list, bin_size_list,
             results_dic[cdf_field]=cdf
         
         stats = NumericStats()
-        if data:
+        if len(data)>0:
             stats.calculate(data)
             if store:
                 stats.store(db_obj, trace_id, stats_field)
             results_dic[stats_field]=stats
     return results_dic
 
+class PartialResults(object):
+    """
+    Mergeable data to calculate Histogram and NumericStats results over
+    several data sets (e.g. the subtraces of a group experiment), which can
+    be produced separately (even in different processes) and then combined.
+    The values of each field are kept as a sorted float64 array, and merging
+    two partials merges the sorted arrays. Results are exact: the same as
+    calling calculate_results over the concatenation of all the data sets.
+    """
+    def __init__(self):
+        self._values = {}
+        self._config = {}
+    
+    def add(self, field, values, bin_size, minmax):
+        """Adds values to a field.
+        Args:
+        - field: string with the name of the data set, results are produced
+            as field+"_cdf" and field+"_stats".
+        - values: list of numbers.
+        - bin_size: bin size of the field's histogram.
+        - minmax: tuple (min, max) of the field's histogram.
+        """
+        self._config[field] = (bin_size, minmax)
+        self._merge_values(field, np.sort(np.asarray(values,
+                                                     dtype=np.float64)))
+    
+    def merge(self, other):
+        """Adds the values of the fields in other PartialResults object.
+        Returns this object."""
+        for (field, values) in other._values.items():
+            self._config[field] = other._config[field]
+            self._merge_values(field, values)
+        return self
+    
+    def get_fields(self):
+        """Returns the sorted list of fields with values."""
+        return sorted(self._values.keys())
+    
+    def get_values(self, field):
+        """Returns the sorted array of values of a field."""
+        return self._values[field]
+    
+    def calculate_results(self, store=False, db_obj=None, trace_id=None):
+        """Calculates the results of all the fields, see calculate_results
+        for the arguments.
+        Returns: a dictionary of Result objects indexed by result type.
+        """
+        fields = self.get_fields()
+        return calculate_results([self._values[x] for x in fields], fields,
+                                 [self._config[x][0] for x in fields],
+                                 [self._config[x][1] for x in fields],
+                                 store=store, db_obj=db_obj, trace_id=trace_id)
+    
+    def _merge_values(self, field, sorted_values):
+        if field not in self._values:
+            self._values[field] = sorted_values
+            return
+        values = np.concatenate([self._values[field], sorted_values])
+        values.sort(kind="mergesort")
+        self._values[field] = values
+
+def load_results_many(result_factory, db_obj, trace_ids, measurement_types):
+    """Loads the results of multiple traces and measurement types with a
+    single query over the table of the Result class (instead of one per
+    trace and type).
+    Args:
+    - result_factory: function (or Result class) that returns an empty
+        Result object of the type to load, e.g. NumericStats.
+    - db_obj: DBManager object configured to access a database from which data
+        will be retrieved.
+    - trace_ids: list of numeric trace ids to load results for.
+    - measurement_types: list of strings with the result types to load.
+    Returns: dictionary of Result objects indexed by (trace_id,
+        measurement_type). Pairs without a result in the database are not
+        present. If a pair has several results, the first stored is returned.
+    """
+    trace_ids = sorted(set([int(x) for x in trace_ids]))
+    measurement_types = sorted(set(measurement_types))
+    if not trace_ids or not measurement_types:
+        return {}
+    template = result_factory()
+    condition = "trace_id IN ({0}) and type IN ({1})".format(
+                        ",".join([str(x) for x in trace_ids]),
+                        ",".join(["'{0}'".format(x)
+                                  for x in measurement_types]))
+    rows = db_obj.getValuesDicList(template._table_name,
+                                   ["trace_id", "type"] + template._keys,
+                                   condition=condition, orderBy="id")
+    results = {}
+    for row in rows or ():
+        key = (int(row["trace_id"]), row["type"])
+        if key in results:
+            continue
+        result = result_factory()
+        result._load_row(row)
+        results[key] = result
+    return results
+
 def load_results(field_list, db_obj, trace_id):
     """Creates a number of Histogram and NumericStats objects, populate from
     the database and set them as variables of caller_obj.
@@ -4,9 +4,13 @@ scheduling log traces.
 """
 from commonLib.nerscUtilization import UtilizationEngine
 from stats import (calculate_results, load_results, NumericList)
+from stats.trace_cache import TraceCache
 from stats.workflow import WorkflowsExtractor
 
+from collections.abc import Mapping
+
 import numpy as np
+import os
 
 
 class ResultTrace(object):
@@ -21,23 +25,103 @@ class ResultTrace(object):
     
     The required database table for the trace storage is described in
     create_trace_table. 
+    
+    Jobs are stored once, ordered by submit time, as a TraceColumns object
+    (self._lists_submit). self._lists_start is a view of the same jobs
+    ordered by start time.
+    
+    Traces loaded with load_trace can be cached on local disk, see
+    configure_trace_cache.
     """
+    _trace_cache = None
+    _trace_cache_configured = False
+    
+    @classmethod
+    def configure_trace_cache(cls, cache_dir=None, max_size_mb=1024):
+        """Configures the local cache of traces used by load_trace in all
+        ResultTrace objects. If not called, the cache is configured from the
+        env vars TRACE_CACHE_DIR and TRACE_CACHE_MAX_MB (if TRACE_CACHE_DIR is
+        not set, no cache is used).
+        Args:
+        - cache_dir: folder to store the cached traces in. If None, caching
+            is disabled.
+        - max_size_mb: maximum size of the cache in MB.
+        """
+        cls._trace_cache = None
+        if cache_dir:
+            cls._trace_cache = TraceCache(cache_dir,
+                                          int(max_size_mb)*1024*1024)
+        cls._trace_cache_configured = True
+    
+    @classmethod
+    def get_trace_cache(cls):
+        """Returns the TraceCache used by load_trace, None if disabled."""
+        if not cls._trace_cache_configured:
+            cls.configure_trace_cache(os.getenv("TRACE_CACHE_DIR", None),
+                                      os.getenv("TRACE_CACHE_MAX_MB", 1024))
+        return cls._trace_cache
+    
     def __init__(self, table_name="traces"):
         """Constructor
         Args:
         - table_name: table where traces should be stored.  
         """
         self._lists_submit = {}
-        self._lists_start = {}
         self._table_name=table_name
         self._fields= ["job_db_inx", "account", "cpus_req", "cpus_alloc",
           "job_name", "id_job", "id_qos", "id_resv", "id_user", 
           "nodes_alloc", "partition", "priority", "state", "timelimit",
           "time_submit", "time_start", "time_end"]
+        self._string_fields = ["account", "job_name", "partition"]
         self._wf_extractor = None
         self._integrated_ut = None
         self._acc_waste = None
         self._corrected_integrated_ut = None
+    
+    @property
+    def _lists_submit(self):
+        """TraceColumns with the jobs of the trace ordered by submit time."""
+        return self._columns
+    
+    @_lists_submit.setter
+    def _lists_submit(self, job_lists):
+        """Sets the jobs of the trace.
+        Args:
+        - job_lists: dictionary of lists, one per job field, ordered by
+            submit time.
+        """
+        self._columns = TraceColumns(job_lists,
+                                     on_change=self._reset_start_order)
+        self._start_order = None
+    
+    @property
+    def _lists_start(self):
+        """Read-only view of the jobs of the trace ordered by start time."""
+        return StartOrderColumns(self._columns, self._get_start_order())
+    
+    @_lists_start.setter
+    def _lists_start(self, job_lists):
+        """Sets the jobs of the trace.
+        Args:
+        - job_lists: dictionary of lists, one per job field, ordered by
+            start time. They are re-ordered by submit time for storage.
+        """
+        columns = TraceColumns(job_lists)
+        if "time_submit" in columns:
+            columns = columns.get_sorted("time_submit")
+        self._lists_submit = columns
+    
+    def _get_start_order(self):
+        """Returns a numpy array with the positions of the jobs of the trace
+        sorted by start time."""
+        if self._start_order is None:
+            self._start_order = np.argsort(self._columns["time_start"],
+                                           kind="stable")
+        return self._start_order
+    
+    def _reset_start_order(self):
+        self._start_order = None
+    
     def _clean_db_duplicates(self, db_obj, table_name):
         query="""SELECT id_job, dup, inx from 
               (SELECT `id_job`,count(*) dup, max(job_db_inx) inx 
@@ -71,15 +155,40 @@ class ResultTrace(object):
         - end: if set to an epoch time, it will retrieve jobs before start.
         """
         self._clean_db_duplicates(db_obj, table_name)
-        self._lists_submit = db_obj.getValuesAsColumns(
-                            table_name, self._fields, 
+        self._lists_submit = self._read_columns(
+                            db_obj, table_name,
                             condition = _get_limit("time_submit",start, end),
-                            orderBy="time_submit")
-        
-        self._lists_start = db_obj.getValuesAsColumns(
-                            table_name, self._fields, 
-                            condition = _get_limit("time_start",start, end),
-                            orderBy="time_start")
+                            order_by="time_submit")
+    
+    def _read_columns(self, db_obj, table_name, condition=None,
+                      order_by=None, chunk_size=10000):
+        """Reads the jobs of a table in a single pass, in chunks of rows that
+        are converted into typed numpy arrays.
+        Args:
+        - db_obj: DBManager object configured to connect to the database.
+        - table_name: name of the table to read the jobs from.
+        - condition: SQL condition of the jobs to read.
+        - order_by: if set, field to order the jobs by.
+        - chunk_size: number of rows read from the database at once.
+        Returns: a TraceColumns object with the jobs read.
+        """
+        dtypes = dict([(field, object if field in self._string_fields
+                                      else np.int64)
+                       for field in self._fields])
+        chunks = dict([(field, []) for field in self._fields])
+        for rows in db_obj.getValuesChunks(table_name, self._fields,
+                                           condition=condition,
+                                           orderBy=order_by,
+                                           chunk_size=chunk_size):
+            for (field, values) in zip(self._fields, zip(*rows)):
+                chunks[field].append(np.array(values, dtype=dtypes[field]))
+        columns = {}
+        for field in self._fields:
+            if chunks[field]:
+                columns[field] = np.concatenate(chunks[field])
+            else:
+                columns[field] = np.array([], dtype=dtypes[field])
+        return TraceColumns(columns)
     
     def import_from_pbs_db(self, db_obj, table_name, start=None, end=None,
                            machine=None):
@@ -104,14 +213,6 @@ class ResultTrace(object):
                                     condition = (_get_limit("created",start,end)
                                                  +machine_cond),
                                     orderBy="created"))
-                                                    
-        
-        self._lists_start = self._transform_pbs_to_slurm(
-                                db_obj.getValuesAsColumns(
-                                    table_name, pbs_fields, 
-                                    condition = (_get_limit("created",start,end)
-                                                 +machine_cond),
-                                    orderBy="start"))
     
     
     def _transform_pbs_to_slurm(self, pbs_list):
@@ -144,18 +245,44 @@ class ResultTrace(object):
         
         return slurm_list
                 
-    def store_trace(self, db_obj, trace_name):
-        """ Stores the trace in a database.
+    def store_trace(self, db_obj, trace_name, chunk_size=5000,
+                    use_load_data=False):
+        """ Stores the trace in a database. Jobs are inserted in chunks
+        within a single transaction. Jobs of the trace already present in the
+        table (e.g. from a previous interrupted store) are not inserted
+        again, so a failed store can be resumed by calling this method again.
         Args:
         - db_obj: DBManager object configured to connect to a database which
             hosts a table named self._table_name with the structure defined
             in create_trace_table
         - tarce_name: string containing the unique ID of the trace.
+        - chunk_size: maximum number of jobs inserted per statement.
+        - use_load_data: if True, jobs are inserted with LOAD DATA LOCAL
+            INFILE. See DB.insertValuesColumnsBulk.
+        Returns: True if all the jobs were stored.
         """
-        db_obj.insertValuesColumns(self._table_name,
-                                   self._lists_submit,
-                                   {"trace_id":trace_name})
+        columns = self._lists_submit
+        stored_ids = self._get_stored_job_ids(db_obj, trace_name)
+        if len(stored_ids):
+            not_stored = ~np.isin(columns["id_job"], stored_ids)
+            columns = dict([(key, values[not_stored])
+                            for (key, values) in columns.items()])
+        cache = ResultTrace.get_trace_cache()
+        if cache is not None:
+            cache.invalidate("{0}-{1}".format(self._table_name, trace_name))
+        return db_obj.insertValuesColumnsBulk(self._table_name, columns,
+                                              {"trace_id":trace_name},
+                                              chunk_size=chunk_size,
+                                              use_load_data=use_load_data)
     
+    def _get_stored_job_ids(self, db_obj, trace_id):
+        chunks = [np.array([row[0] for row in rows], dtype=np.int64)
+                  for rows in db_obj.getValuesChunks(
+                                self._table_name, ["id_job"],
+                                condition="trace_id={0}".format(trace_id))]
+        if not chunks:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(chunks)
     
     def load_trace(self, db_obj, trace_id, append=False):
         """ Retrieves a trace from a database
@@ -172,33 +299,51 @@ class ResultTrace(object):
         """
         if not append:
             self._lists_submit = {}
-            self._lists_start = {}
             self._load_trace_count = 0
             time_offset=0
         else:
             self._load_trace_count += 1
             time_offset = self._lists_submit["time_submit"][-1]
         
-        new_lists_submit= db_obj.getValuesAsColumns(
-                              self._table_name, self._fields, 
-                              condition = "trace_id={0}".format(trace_id),
-                              orderBy="time_submit")
+        new_lists_submit = self._load_trace_columns(db_obj, trace_id)
         first_time_value=new_lists_submit["time_submit"][0]
         ResultTrace.apply_offset_trace(new_lists_submit, time_offset,
                                        first_time_value)
-        self._lists_submit= ResultTrace.join_dics_of_lists(
-                            self._lists_submit,new_lists_submit)
-        
-        new_lists_start = db_obj.getValuesAsColumns(
-                              self._table_name, self._fields, 
-                              condition = "trace_id={0}".format(trace_id),
-                              orderBy="time_start")
-        
-        ResultTrace.apply_offset_trace(new_lists_start, time_offset,
-                                       first_time_value)
-        self._lists_start= ResultTrace.join_dics_of_lists(
-                            self._lists_start,
-                            new_lists_start)
+        self._lists_submit= self._lists_submit.join(new_lists_submit)
+    
+    def _load_trace_columns(self, db_obj, trace_id):
+        """Returns a TraceColumns object with the jobs of a trace stored in
+        self._table_name, ordered by submit time. If the trace cache is
+        enabled, jobs are read from it unless the trace in the database has
+        changed since it was cached."""
+        cache = ResultTrace.get_trace_cache()
+        fingerprint = None
+        if cache is not None:
+            key = "{0}-{1}".format(self._table_name, trace_id)
+            fingerprint = self._get_trace_fingerprint(db_obj, trace_id)
+        if fingerprint is not None:
+            columns = cache.get(key, fingerprint)
+            if columns is not None:
+                return TraceColumns(columns)
+        columns = self._read_columns(db_obj, self._table_name,
+                                     condition="trace_id={0}".format(trace_id),
+                                     order_by="time_submit")
+        if fingerprint is not None:
+            cache.put(key, fingerprint, columns)
+        return columns
+    
+    def _get_trace_fingerprint(self, db_obj, trace_id):
+        """Returns a string that changes if the jobs of a stored trace
+        change: number of jobs and sums of their ids and time stamps. None
+        if it cannot be retrieved."""
+        rows = db_obj.doQuery("SELECT COUNT(*), SUM(id_job), SUM(time_submit),"
+                              " SUM(time_start), SUM(time_end) FROM `{0}`"
+                              " WHERE trace_id={1}".format(self._table_name,
+                                                           trace_id))
+        if not rows:
+            return None
+        return "-".join([str(x) for x in rows[0]])
+    
     @classmethod
     def apply_offset_trace(cls, lists, offset=0, first_time_value=0,
                            time_fields=["time_start", "time_end","time_submit"]
@@ -213,7 +358,8 @@ class ResultTrace(object):
         if offset != 0:
             offset+=1
             for field in time_fields:
-                lists[field] =[x+offset-first_time_value for x in lists[field]] 
+                lists[field] = (np.asarray(lists[field])+offset
+                                -first_time_value)
     
     @classmethod   
     def join_dics_of_lists(self, dic1, dic2):
@@ -325,35 +471,48 @@ class ResultTrace(object):
         Returns three lists containing jobs_runtime, jobs_waittime,
             jobs_turnaround, jobs_slowdown
         """
-        jobs_runtime = []
-        jobs_waittime = []
-        jobs_turnaround = []
-        jobs_timelimit= []
-        jobs_cores_alloc = []
-        jobs_slowdown = []
-        for (end, start, submit, time_limit, cpus_alloc, job_name) in zip(
-                                        self._lists_submit["time_end"], 
-                                        self._lists_submit["time_start"],
-                                        self._lists_submit["time_submit"],
-                                        self._lists_submit["timelimit"],
-                                        self._lists_submit["cpus_alloc"],
-                                        self._lists_submit["job_name"]):
-            if (end == 0 or start==0 or submit==0 or end<start or start<submit
-                or (start==end)
-                or (submit_start is not None and submit<submit_start) 
-                or (submit_stop is not None and submit>submit_stop)):
-                #print "discarded!", submit_start, submit_stop, submit, start, end
-                continue
-            if (only_non_wf and len(job_name)>=3 and job_name[0:3]=="wf_"):
-                continue
-            jobs_runtime.append(end-start)
-            jobs_waittime.append(start-submit)
-            jobs_turnaround.append(end-submit)
-            jobs_timelimit.append(time_limit)
-            jobs_cores_alloc.append(cpus_alloc)
-            jobs_slowdown.append(float(end-submit)/float(end-start))
-        return (jobs_runtime, jobs_waittime, jobs_turnaround, jobs_timelimit,
-                jobs_cores_alloc, jobs_slowdown)
+        valid = self._get_finished_jobs_mask(submit_start, submit_stop,
+                                             only_non_wf)
+        (jobs_runtime, jobs_waittime, jobs_turnaround, jobs_timelimit,
+         jobs_cores_alloc, jobs_slowdown, jobs_timesubmit) = (
+                                            self._get_job_times_arrays(valid))
+        return (jobs_runtime.tolist(), jobs_waittime.tolist(),
+                jobs_turnaround.tolist(), jobs_timelimit.tolist(),
+                jobs_cores_alloc.tolist(), jobs_slowdown.tolist())
+    
+    def _get_finished_jobs_mask(self, submit_start=None, submit_stop=None, 
+                                only_non_wf=False):
+        """Returns a boolean numpy array marking the jobs (in submit order)
+        that were submitted, started, and ended, and were submitted between
+        submit_start and submit_stop. If only_non_wf is True, jobs belonging
+        to workflows are not marked."""
+        end = self._lists_submit["time_end"]
+        start = self._lists_submit["time_start"]
+        submit = self._lists_submit["time_submit"]
+        valid = ((end!=0) & (start!=0) & (submit!=0) & (end>=start)
+                 & (start>=submit) & (start!=end))
+        if submit_start is not None:
+            valid &= submit>=submit_start
+        if submit_stop is not None:
+            valid &= submit<=submit_stop
+        if only_non_wf:
+            valid &= ~_is_workflow_job(self._lists_submit["job_name"])
+        return valid
+    
+    def _get_job_times_arrays(self, valid):
+        """Returns numpy arrays with the runtime, wait time, turnaround time,
+        timelimit, allocated cores, slowdown, and submit time of the jobs
+        marked in valid."""
+        end = self._lists_submit["time_end"][valid]
+        start = self._lists_submit["time_start"][valid]
+        submit = self._lists_submit["time_submit"][valid]
+        runtime = end-start
+        turnaround = end-submit
+        return (runtime, start-submit, turnaround,
+                self._lists_submit["timelimit"][valid],
+                self._lists_submit["cpus_alloc"][valid],
+                turnaround.astype(float)/runtime.astype(float),
+                submit)
     
     def get_job_times_grouped_core_seconds(self,
                        core_seconds_edges,
@@ -376,51 +535,15 @@ class ResultTrace(object):
             jobs_waittime, jobs_turnaround, jobs_slowdown. Each dic is indexed
             by the values in core_seconds_edges.
         """
-        jobs_runtime = {}
-        jobs_waittime = {}
-        jobs_turnaround = {}
-        jobs_timelimit= {}
-        jobs_cores_alloc = {}
-        jobs_slowdown = {}
-        jobs_timesubmit = {}
-        for edge in core_seconds_edges:
-            jobs_runtime[edge] = []
-            jobs_waittime[edge] = []
-            jobs_turnaround[edge] = []
-            jobs_timelimit[edge] = []
-            jobs_cores_alloc[edge] = []
-            jobs_slowdown[edge] = []
-            jobs_timesubmit[edge] = []
-        
-        for (end, start, submit, time_limit, cpus_alloc, job_name,
-             time_submit) in zip(
-                                        self._lists_submit["time_end"], 
-                                        self._lists_submit["time_start"],
-                                        self._lists_submit["time_submit"],
-                                        self._lists_submit["timelimit"],
-                                        self._lists_submit["cpus_alloc"],
-                                        self._lists_submit["job_name"],
-                                        self._lists_submit["time_submit"]):
-            if (end == 0 or start==0 or submit==0 or end<start or start<submit
-                or (start==end)
-                or (submit_start is not None and submit<submit_start) 
-                or (submit_stop is not None and submit>submit_stop)):
-                #print "discarded!", submit_start, submit_stop, submit, start, end
-                continue
-            if (only_non_wf and len(job_name)>=3 and job_name[0:3]=="wf_"):
-                continue
-            edge = self._get_index_in_core_seconds_list(time_limit*60,
-                                                        cpus_alloc,
-                                                        core_seconds_edges)
-            jobs_runtime[edge].append(end-start)
-            jobs_waittime[edge].append(start-submit)
-            jobs_turnaround[edge].append(end-submit)
-            jobs_timelimit[edge].append(time_limit)
-            jobs_cores_alloc[edge].append(cpus_alloc)
-            jobs_slowdown[edge].append(float(end-submit)/float(end-start))
-            jobs_timesubmit[edge].append(time_submit)
-        return (jobs_runtime, jobs_waittime, jobs_turnaround, jobs_timelimit,
-                jobs_cores_alloc, jobs_slowdown, jobs_timesubmit)
+        valid = self._get_finished_jobs_mask(submit_start, submit_stop,
+                                             only_non_wf)
+        values_list = self._get_job_times_arrays(valid)
+        jobs_timelimit, jobs_cores_alloc = values_list[3:5]
+        groups = _get_core_seconds_groups(jobs_timelimit*60*jobs_cores_alloc,
+                                          core_seconds_edges)
+        return tuple([dict([(edge, values[pos].tolist())
+                            for (edge, pos) in groups.items()])
+                      for values in values_list])
         
     def get_job_values_grouped_core_seconds(self,
                        core_seconds_edges,
@@ -444,32 +567,15 @@ class ResultTrace(object):
             jobs_waittime, jobs_turnaround, jobs_slowdown. Each dic is indexed
             by the values in core_seconds_edges.
         """
+        groups = _get_core_seconds_groups(self._lists_submit["timelimit"]*60
+                                          *self._lists_submit["cpus_alloc"],
+                                          core_seconds_edges)
         jobs_dic={}
-        
         for field in fields:
-            jobs_dic[field]={}
-            for edge in core_seconds_edges:
-                jobs_dic[field][edge] = []
-
-        for (timelimit, cpus_alloc, i) in zip(
-                            self._lists_submit["timelimit"],
-                            self._lists_submit["cpus_alloc"],
-                            list(range(len(self._lists_submit["timelimit"])))):
-            edge = self._get_index_in_core_seconds_list(timelimit*60,
-                                                        cpus_alloc,
-                                                        core_seconds_edges)
-            for field in fields:
-                jobs_dic[field][edge].append(self._lists_submit[field][i])
-            
+            values = self._lists_submit[field]
+            jobs_dic[field]=dict([(edge, values[pos].tolist())
+                                  for (edge, pos) in groups.items()])
         return jobs_dic
-    def _get_index_in_core_seconds_list(self,runtime, cpus_alloc, 
-                                        core_seconds_edges):
-        core_seconds=runtime*cpus_alloc
-        for (edge, n_edge) in zip(core_seconds_edges[:-1],
-                                  core_seconds_edges[1:]):
-            if core_seconds<=n_edge:
-                return edge
-        return core_seconds_edges[-1]
         
     def fill_job_values(self, start=None, stop=None, append=False):
         """Calculates and stores in memory the time job values from the
@@ -542,20 +648,53 @@ class ResultTrace(object):
                     l1[key]=[]
                 l1[key]+=l2[key]
         results = {}
+        field_list, bin_size_list, minmax_list = _get_job_results_config()
         for edge in core_seconds_edges:
             data_list = [x[edge] for x in self._data_list_of_dics[:-1]]
-            field_list=["jobs_runtime", "jobs_waittime", "jobs_turnaround",
-                        "jobs_requested_wc", "jobs_cpus_alloc", "jobs_slowdown"]
-            field_list=["g"+str(edge)+"_"+x for x in field_list]
-            bin_size_list = [60,60,120, 1, 24, 100]
-            minmax_list = [(0, 3600*24*30), (0, 3600*24*30), (0, 2*3600*24*30),
-                           (0, 60*24*30), (0, 24*4000), (0, 800)]
-            
-            results[edge]=calculate_results(data_list, field_list,
+            edge_field_list=["g"+str(edge)+"_"+x for x in field_list]
+            results[edge]=calculate_results(data_list, edge_field_list,
                           bin_size_list,
                           minmax_list, store=store, db_obj=db_obj, 
                           trace_id=trace_id)
         return results
+    def fill_partial_results(self, partial, core_seconds_edges=None,
+                             start=None, stop=None):
+        """Adds the job and workflow values of the loaded trace to a
+        PartialResults object, so results over several traces can be
+        calculated by merging their partials. Workflows must have been
+        pre-processed.
+        Args:
+        - partial: PartialResults object to add the values to.
+        - core_seconds_edges: if set, values of the jobs grouped by core
+            seconds are also added (see
+            calculate_job_results_grouped_core_seconds).
+        - start: epoch timestamp of the submit time of the first job (and
+            workflow) to be taken into account.
+        - stop: epoch timestamp of the submit time of the last job (and
+            workflow) to be taken into account.
+        Returns: partial.
+        """
+        field_list, bin_size_list, minmax_list = _get_job_results_config()
+        job_values = self._get_job_times_arrays(
+                    self._get_finished_jobs_mask(start, stop, True))[:-1]
+        for (values, field, bin_size, minmax) in zip(job_values, field_list,
+                                                     bin_size_list,
+                                                     minmax_list):
+            partial.add(field, values, bin_size, minmax)
+        if core_seconds_edges is not None:
+            data_list_of_dics = self.get_job_times_grouped_core_seconds(
+                                            core_seconds_edges, start, stop,
+                                            only_non_wf=True)[:-1]
+            for edge in core_seconds_edges:
+                for (values_dic, field, bin_size, minmax) in zip(
+                        data_list_of_dics, field_list, bin_size_list,
+                        minmax_list):
+                    partial.add("g"+str(edge)+"_"+field, values_dic[edge],
+                                bin_size, minmax)
+        self._wf_extractor.fill_partial_results(partial, start=start,
+                                                stop=stop)
+        return partial
+    
     def calculate_and_store_job_results(self, store=False, db_obj=None,
                                         trace_id=None):
         data_list = [self._jobs_runtime, self._jobs_waittime, 
@@ -563,12 +702,7 @@ class ResultTrace(object):
                      self._jobs_timelimit,
                      self._jobs_cpus_alloc,
                      self._jobs_slowdown]
-        field_list=["jobs_runtime", "jobs_waittime", "jobs_turnaround",
-                    "jobs_requested_wc", "jobs_cpus_alloc", "jobs_slowdown"]
-        bin_size_list = [60,60,120, 1, 24, 100]
-        minmax_list = [(0, 3600*24*30), (0, 3600*24*30), (0, 2*3600*24*30),
-                       (0, 60*24*30), (0, 24*4000), (0,800)]
-        
+        field_list, bin_size_list, minmax_list = _get_job_results_config()
         self.jobs_results=calculate_results(data_list, field_list,
                       bin_size_list,
                       minmax_list, store=store, db_obj=db_obj, 
@@ -698,25 +832,19 @@ class ResultTrace(object):
             for jobs with start time but no end time. This avoids discarding
             jobs that have end time = 0.
         Returns:
-        - jobs_runtime: list of runtimes in seconds.
-        - jobs_start_time: list of epoch job's start timestamps.
-        - job_cores: list of number of cores allocated to each job.
+        - jobs_runtime: numpy array of runtimes in seconds.
+        - jobs_start_time: numpy array of epoch job's start timestamps.
+        - job_cores: numpy array of number of cores allocated to each job.
         """
-        jobs_runtime = []
-        jobs_start_time = []
-        jobs_cores = []
-        for (end, start, cores) in zip(self._lists_start["time_end"], 
-                                        self._lists_start["time_start"],
-                                        self._lists_start["cpus_alloc"]):
-            if end == 0 or start==0 or cores==0 or end<start:
-                if fake_stop_time and start and not end:
-                    end=fake_stop_time
-                else:
-                    continue
-            jobs_runtime.append(end-start)
-            jobs_start_time.append(start)
-            jobs_cores.append(cores)
-        return jobs_runtime, jobs_start_time, jobs_cores
+        end = self._lists_start["time_end"]
+        start = self._lists_start["time_start"]
+        cores = self._lists_start["cpus_alloc"]
+        valid = (end!=0) & (start!=0) & (cores!=0) & (end>=start)
+        if fake_stop_time:
+            no_end = (start!=0) & (end==0)
+            end = np.where(no_end, fake_stop_time, end)
+            valid |= no_end
+        return end[valid]-start[valid], start[valid], cores[valid]
     
     def calculate_utilization(self, max_cores, do_preload_until=None,
                               endCut=None, store=False, db_obj=None, 
@@ -801,67 +929,54 @@ class ResultTrace(object):
         return float(corrected_used_cores_s)/float(total_core_s)
         
     def _get_job_wait_info(self, fake_stop_time=None, fake_start_time=None):
-        jobs_runtime = []
-        jobs_start_time = []
-        jobs_cores = []
-        jobs_submit_time = []
-        for (end, start, cores, submit) in zip(self._lists_submit["time_end"], 
-                                             self._lists_submit["time_start"],
-                                             self._lists_submit["cpus_alloc"],
-                                             self._lists_submit["time_submit"]):
-            if cores==0 or start==0 or end==0 or start>end:
-                if fake_start_time and not start:
-                    start = fake_start_time
-                    end = fake_start_time
-                elif fake_stop_time and start and not end:
-                    end=max(start,fake_stop_time)
-                else:
-                    continue
-            jobs_runtime.append(end-start)
-            jobs_start_time.append(start)
-            jobs_cores.append(cores)
-            jobs_submit_time.append(submit)
-        return jobs_runtime, jobs_start_time, jobs_cores, jobs_submit_time
+        """Returns numpy arrays with the runtime, start time, allocated
+        cores, and submit time of the jobs in submit order. Discards jobs
+        with 0 in any of its characteristics.
+        Args:
+        - fake_stop_time: int epoch timestamp, if set, this value will be used
+            as end time for jobs with start time but no end time.
+        - fake_start_time: int epoch timestamp, if set, this value will be
+            used as start and end time for jobs with no start time.
+        """
+        end = self._lists_submit["time_end"]
+        start = self._lists_submit["time_start"]
+        cores = self._lists_submit["cpus_alloc"]
+        submit = self._lists_submit["time_submit"]
+        valid = (cores!=0) & (start!=0) & (end!=0) & (start<=end)
+        if fake_start_time:
+            no_start = ~valid & (start==0)
+            start = np.where(no_start, fake_start_time, start)
+            end = np.where(no_start, fake_start_time, end)
+            valid |= no_start
+        if fake_stop_time:
+            no_end = ~valid & (start!=0) & (end==0)
+            end = np.where(no_end, np.maximum(start, fake_stop_time), end)
+            valid |= no_end
+        return (end[valid]-start[valid], start[valid], cores[valid],
+                submit[valid])
     
     def _get_job_wait_info_all(self):
-        jobs_runtime = []
-        jobs_start_time = []
-        jobs_cores = []
-        jobs_submit_time = []
-        jobs_timelimit = []
-        jobs_accuracy=[]
-        ended_jobs=0.0
-        accuracy=0
-        
-        for (end, start, cores, submit, timelimit) in zip(
-                                             self._lists_submit["time_end"], 
-                                             self._lists_submit["time_start"],
-                                             self._lists_submit["cpus_alloc"],
-                                             self._lists_submit["time_submit"],
-                                             self._lists_submit["timelimit"]):
-            
-            if cores==0 or submit==0 or timelimit==0:
-                continue
-            if start==0 or end==0:
-                runtime = -1
-            else:
-                runtime = end-start
-            
-            if start!=0 and end!=0:
-                ended_jobs+=1
-                accuracy+=float(runtime)/float(timelimit*60)
-                jobs_accuracy.append(float(runtime)/float(timelimit*60))
-        
-            jobs_runtime.append(runtime)
-            jobs_start_time.append(start)
-            jobs_cores.append(cores)
-            jobs_submit_time.append(submit)
-            jobs_timelimit.append(timelimit)
-        accuracy/=ended_jobs
-        return (jobs_runtime, jobs_start_time, jobs_cores, jobs_submit_time,
-                jobs_timelimit, accuracy, np.median(jobs_accuracy))
+        """Returns numpy arrays with the runtime, start time, allocated
+        cores, submit time, and timelimit of the submitted jobs, plus the
+        mean and median runtime accuracy of the ended jobs. Runtime is -1 for
+        jobs that did not start or end."""
+        end = self._lists_submit["time_end"]
+        start = self._lists_submit["time_start"]
+        cores = self._lists_submit["cpus_alloc"]
+        submit = self._lists_submit["time_submit"]
+        timelimit = self._lists_submit["timelimit"]
+        valid = (cores!=0) & (submit!=0) & (timelimit!=0)
+        ended = ((start!=0) & (end!=0))[valid]
+        runtime = np.where(ended, (end-start)[valid], -1)
+        jobs_accuracy = (runtime[ended].astype(float)
+                         /(timelimit[valid][ended]*60).astype(float))
+        accuracy = float(np.sum(jobs_accuracy))/float(len(jobs_accuracy))
+        return (runtime, start[valid], cores[valid], submit[valid],
+                timelimit[valid], accuracy, np.median(jobs_accuracy))
+    
     def calculate_waiting_submitted_work_all(self, acc_period=60,
-                                                     ending_time=None):
+                                                     ending_time=None,
+                                                     sample_on_grid=False):
         """Calculates how much work has been submitted vs. time passed and
         how many core-s. are waiting at any given time. 
         Args:
@@ -869,6 +984,11 @@ class ResultTrace(object):
             work values (value produced is average over that time).
         - ending_time: if set, it will be used as end and start time for jobs
             which any of the two is 0 (and thus, will not be discarded)
+        - sample_on_grid: if True, submitted and waiting work values are
+            sampled every acc_period seconds since the first submission.
+            Otherwise, a submitted work data point is produced at the
+            first submission acc_period seconds after the previous data point,
+            and a waiting work data point at every job submission or start.
         Returns:
         - waiting_work_stamps: ordered list of epoch timestamps of each
             datapoint of waiting_work_times.
@@ -880,6 +1000,10 @@ class ResultTrace(object):
             produced core hours by the system until the current time is
             required to process all the core hours submitted until the
             current time.
+        - waiting_requested_work_times: same as waiting_work_times, using the
+            requested wall clock time instead of the runtime.
+        - submitted_requested_work_values: same as submitted_work_values,
+            using the requested wall clock time instead of the runtime.
             
         """
         (jobs_runtime, jobs_start_time, jobs_cores, jobs_submit_time,
@@ -888,91 +1012,46 @@ class ResultTrace(object):
                 
         print("Observed accuracy:", mean_accuracy, median_accuracy)
         accuracy = mean_accuracy
-        wait_ch_events = {}
-        wait_requested_ch_events = {}
-        submitted_core_h_per_min = {}
-        submitted_requested_core_h_per_min = {}
-        
-        first_time_stamp=None
-        previous_stamp=None 
-        acc_submitted_work=0
-        acc_submitted_requested_work=0
-        
-        
-        for submit_time, start_time, runtime, cores, timelimit in zip(
-                                                           jobs_submit_time,
-                                                           jobs_start_time,
-                                                           jobs_runtime,
-                                                           jobs_cores,
-                                                           jobs_timelimit):
-            
-            if runtime<0:
-                runtime = float(timelimit*60)*accuracy
-            
-            core_h = cores*runtime
-            requested_core_h = timelimit*cores*60
-            
-            # Values for the submitted work
-            if first_time_stamp is None:
-                first_time_stamp=submit_time
-                previous_stamp = submit_time
-            acc_submitted_work+=core_h
-            acc_submitted_requested_work+=requested_core_h
-            if submit_time-previous_stamp>acc_period:
-                corrected_acc = (float(acc_submitted_work) / 
-                                 float(submit_time-first_time_stamp))
-                submitted_core_h_per_min[submit_time]=corrected_acc
-                corrected_requested_acc=(float(acc_submitted_requested_work) / 
-                                 float(submit_time-first_time_stamp))
-                submitted_requested_core_h_per_min[submit_time]= (
-                                        corrected_requested_acc)
-               
-                previous_stamp=submit_time
-            # Values for the waiting work
-            if submit_time>0:
-                if not submit_time in list(wait_ch_events.keys()):
-                    wait_ch_events[submit_time]=0
-                    wait_requested_ch_events[submit_time]=0
-                wait_ch_events[submit_time]+=core_h
-                wait_requested_ch_events[submit_time]+=requested_core_h
-            if start_time>0:
-                if not start_time in list(wait_ch_events.keys()):
-                    wait_ch_events[start_time]=0
-                    wait_requested_ch_events[start_time]=0
-                wait_ch_events[start_time]-=core_h
-                wait_requested_ch_events[start_time]-=requested_core_h
-        
-        # Final step to calculate the waiting work
-        
-        acc_ch = 0
-        acc_requested_ch = 0
-       
-        stamps  = []
-        waiting_ch = []
-        waiting_requested_ch=[]
-       
-        for stamp in sorted(wait_ch_events.keys()):
-            acc_ch+=wait_ch_events[stamp]
-            acc_requested_ch+=wait_requested_ch_events[stamp]
-            stamps.append(stamp)
-            waiting_ch.append(acc_ch)
-            waiting_requested_ch.append(acc_requested_ch)
+        jobs_runtime = np.where(jobs_runtime<0,
+                                (jobs_timelimit*60).astype(float)*accuracy,
+                                jobs_runtime)
+        core_h = jobs_cores*jobs_runtime
+        requested_core_h = jobs_timelimit*jobs_cores*60
         
-        # Making sure stamps are orderd for the produced work.
-        core_h_per_min_stamps=[]
-        core_h_per_min_values=[]
-        requested_core_h_per_min_values=[]
-        previous_stamp=None 
-        for stamp in sorted(submitted_core_h_per_min.keys()):
-            core_h_per_min_stamps.append(stamp)
-            core_h_per_min_values.append(submitted_core_h_per_min[stamp])
-            requested_core_h_per_min_values.append(
-                                   submitted_requested_core_h_per_min[stamp])
-        return (stamps, waiting_ch, core_h_per_min_stamps, core_h_per_min_values,
-            waiting_requested_ch, requested_core_h_per_min_values)
+        submitted = jobs_submit_time>0
+        started = jobs_start_time>0
+        event_stamps = np.concatenate([jobs_submit_time[submitted],
+                                       jobs_start_time[started]])
+        stamps, waiting_ch = _accumulate_events(
+                                    event_stamps,
+                                    np.concatenate([core_h[submitted],
+                                                    -core_h[started]]))
+        stamps, waiting_requested_ch = _accumulate_events(
+                                    event_stamps,
+                                    np.concatenate([requested_core_h[submitted],
+                                                    -requested_core_h[started]]))
+        (core_h_per_min_stamps,
+         (core_h_per_min_values, requested_core_h_per_min_values)) = (
+                    _sample_submitted_work(jobs_submit_time, 
+                                           [core_h, requested_core_h],
+                                           acc_period, sample_on_grid))
+        if sample_on_grid and len(jobs_submit_time):
+            grid_stamps = _get_sampling_grid(jobs_submit_time[0], stamps,
+                                             acc_period)
+            waiting_ch = _sample_step_function(stamps, waiting_ch, 
+                                               grid_stamps)
+            waiting_requested_ch = _sample_step_function(stamps,
+                                                         waiting_requested_ch,
+                                                         grid_stamps)
+            stamps = grid_stamps
+        return (stamps.tolist(), waiting_ch.tolist(),
+                core_h_per_min_stamps.tolist(), core_h_per_min_values.tolist(),
+                waiting_requested_ch.tolist(),
+                requested_core_h_per_min_values.tolist())
     
     def calculate_waiting_submitted_work(self, acc_period=60,
-                                         ending_time=None):
+                                         ending_time=None,
+                                         sample_on_grid=False):
         """Calculates how much work has been submitted vs. time passed and
         how many core-s. are waiting at any given time. 
         Args:
@@ -980,6 +1059,11 @@ class ResultTrace(object):
             work values (value produced is average over that time).
         - ending_time: if set, it will be used as end and start time for jobs
             which any of the two is 0 (and thus, will not be discarded)
+        - sample_on_grid: if True, submitted and waiting work values are
+            sampled every acc_period seconds since the first submission.
+            Otherwise, a submitted work data point is produced at the
+            first submission acc_period seconds after the previous data point,
+            and a waiting work data point at every job submission or start.
         Returns:
         - waiting_work_stamps: ordered list of epoch timestamps of each
             datapoint of waiting_work_times.
@@ -996,61 +1080,28 @@ class ResultTrace(object):
         jobs_runtime, jobs_start_time, jobs_cores, jobs_submit_time = (
                         self._get_job_wait_info(fake_stop_time=ending_time,
                                                 fake_start_time=ending_time))
-        wait_ch_events = {}
-        submitted_core_h_per_min = {}
+        if np.any(jobs_runtime<0):
+            raise ValueError("Jobs with negative runtime cannot be processed.")
+        core_h = jobs_cores*jobs_runtime
         
-        first_time_stamp=None
-        previous_stamp=None 
-        acc_submitted_work=0
-        
-        
-        for submit_time, start_time, runtime, cores in zip(jobs_submit_time,
-                                                           jobs_start_time,
-                                                           jobs_runtime,
-                                                           jobs_cores):
-            if runtime<0:
-                raise Exception()
-            core_h = cores*runtime
-            # Values for the submitted work
-            if first_time_stamp is None:
-                first_time_stamp=submit_time
-                previous_stamp = submit_time
-            acc_submitted_work+=core_h
-            if submit_time-previous_stamp>acc_period:
-                corrected_acc = (float(acc_submitted_work) / 
-                                 float(submit_time-first_time_stamp))
-                submitted_core_h_per_min[submit_time]=corrected_acc
-                #acc_submitted_work=0
-                previous_stamp=submit_time
-            # Values for the waiting work
-            if submit_time!=0:
-                if not submit_time in list(wait_ch_events.keys()):
-                    wait_ch_events[submit_time]=0
-                wait_ch_events[submit_time]+=core_h
-            if start_time!=0:
-                if not start_time in list(wait_ch_events.keys()):
-                    wait_ch_events[start_time]=0
-                wait_ch_events[start_time]-=core_h
-        
-        # Final step to calculate the waiting work
-        acc_ch = 0
-       
-        stamps  = []
-        waiting_ch = []
-       
-        for stamp in sorted(wait_ch_events.keys()):
-            acc_ch+=wait_ch_events[stamp]
-            stamps.append(stamp)
-            waiting_ch.append(acc_ch)
-        
-        # Making sure stamps are orderd for the produced work.
-        core_h_per_min_stamps=[]
-        core_h_per_min_values=[]
-        previous_stamp=None 
-        for stamp in sorted(submitted_core_h_per_min.keys()):
-            core_h_per_min_stamps.append(stamp)
-            core_h_per_min_values.append(submitted_core_h_per_min[stamp])
-        return stamps, waiting_ch, core_h_per_min_stamps, core_h_per_min_values
+        submitted = jobs_submit_time!=0
+        started = jobs_start_time!=0
+        stamps, waiting_ch = _accumulate_events(
+                                np.concatenate([jobs_submit_time[submitted],
+                                                jobs_start_time[started]]),
+                                np.concatenate([core_h[submitted],
+                                                -core_h[started]]))
+        core_h_per_min_stamps, (core_h_per_min_values,) = (
+                    _sample_submitted_work(jobs_submit_time, [core_h],
+                                           acc_period, sample_on_grid))
+        if sample_on_grid and len(jobs_submit_time):
+            grid_stamps = _get_sampling_grid(jobs_submit_time[0], stamps,
+                                             acc_period)
+            waiting_ch = _sample_step_function(stamps, waiting_ch, 
+                                               grid_stamps)
+            stamps = grid_stamps
+        return (stamps.tolist(), waiting_ch.tolist(),
+                core_h_per_min_stamps.tolist(), core_h_per_min_values.tolist())
         
     def _get_utilization_result(self):
         return NumericList("usage_values", ["utilization", "waste",
@@ -1195,3 +1246,231 @@ def _get_limit(order_field, start=None, end=None):
             query +=" AND "
         query+="{0}<={1}".format(order_field, end)
     return query
+
+
+def _accumulate_events(stamps, deltas):
+    """Adds up the deltas of events happening at the same time and
+    accumulates them in time order.
+    Args:
+    - stamps: numpy array of epoch timestamps of the events.
+    - deltas: numpy array with the change produced by each event.
+    Returns: numpy array of sorted unique timestamps and numpy array with the
+        accumulated value at each of them.
+    """
+    order = np.argsort(stamps, kind="stable")
+    stamps = stamps[order]
+    deltas = deltas[order]
+    if not len(stamps):
+        return stamps, deltas
+    unique_stamps, first_pos = np.unique(stamps, return_index=True)
+    return unique_stamps, np.cumsum(np.add.reduceat(deltas, first_pos))
+
+def _sample_submitted_work(submit_times, work_lists, acc_period,
+                           sample_on_grid=False):
+    """Samples the submitted work per second since the first submission.
+    Args:
+    - submit_times: numpy array of ordered epoch submit times of the jobs.
+    - work_lists: list of numpy arrays, each one with a work value per job.
+    - acc_period: seconds between samples.
+    - sample_on_grid: if True, samples are taken every acc_period seconds
+        since the first submission. If False, a sample is taken at the first
+        submission more than acc_period seconds after the previous sample.
+    Returns: numpy array of sample timestamps, and list of numpy arrays with
+        the sampled values for each array in work_lists.
+    """
+    if not len(submit_times):
+        return (np.array([], dtype=submit_times.dtype),
+                [np.array([]) for x in work_lists])
+    acc_work_lists = [np.cumsum(work) for work in work_lists]
+    first_stamp = submit_times[0]
+    if sample_on_grid:
+        stamps = _get_sampling_grid(first_stamp, submit_times, acc_period)
+        pos = np.searchsorted(submit_times, stamps, side="right")-1
+    else:
+        pos_list = []
+        current_pos = np.searchsorted(submit_times, first_stamp+acc_period,
+                                      side="right")
+        while current_pos<len(submit_times):
+            pos_list.append(current_pos)
+            current_pos = np.searchsorted(submit_times,
+                                          submit_times[current_pos]+acc_period,
+                                          side="right")
+        pos = np.array(pos_list, dtype=int)
+        stamps = submit_times[pos]
+    elapsed = (stamps-first_stamp).astype(float)
+    return stamps, [acc_work[pos]/elapsed for acc_work in acc_work_lists]
+
+def _get_sampling_grid(first_stamp, stamps, period):
+    """Returns a numpy array of timestamps every period seconds after
+    first_stamp, until the last value of stamps."""
+    if period<=0:
+        raise ValueError("Sampling period must be positive: {0}".format(
+                                                                      period))
+    if not len(stamps):
+        return np.array([], dtype=type(first_stamp))
+    return np.arange(first_stamp+period, stamps[-1]+1, period)
+
+def _sample_step_function(stamps, values, sample_stamps):
+    """Returns the value of a step function defined by sorted stamps and
+    values at each of the sample_stamps. Values before the first stamp are
+    0."""
+    pos = np.searchsorted(stamps, sample_stamps, side="right")-1
+    sampled_values = np.zeros(len(sample_stamps), dtype=values.dtype)
+    sampled_values[pos>=0] = values[pos[pos>=0]]
+    return sampled_values
+
+def _get_job_results_config():
+    """Returns the list of job result fields, and the bin sizes and
+    (min, max) tuples of their histograms."""
+    field_list=["jobs_runtime", "jobs_waittime", "jobs_turnaround",
+                "jobs_requested_wc", "jobs_cpus_alloc", "jobs_slowdown"]
+    bin_size_list = [60,60,120, 1, 24, 100]
+    minmax_list = [(0, 3600*24*30), (0, 3600*24*30), (0, 2*3600*24*30),
+                   (0, 60*24*30), (0, 24*4000), (0,800)]
+    return field_list, bin_size_list, minmax_list
+
+def _get_core_seconds_groups(core_seconds, core_seconds_edges):
+    """Groups jobs by the core seconds they allocate.
+    Args:
+    - core_seconds: numpy array with the core seconds of each job.
+    - core_seconds_edges: list of core seconds limits of the groups. A job
+        belongs to the group of the first edge that is followed by an edge
+        greater or equal than its core seconds, or to the last one if there
+        is none. For sorted edges: i_0: [i0, i_1], i_1: (i_1, i_2] ...
+        i_n-1: (i_n-1, infinity]
+    Returns: dictionary indexed by the values in core_seconds_edges, each
+        item is a numpy array with the positions in core_seconds of the jobs
+        of the group in their original order.
+    """
+    core_seconds_edges = list(core_seconds_edges)
+    if len(core_seconds_edges)>1:
+        upper_limits = np.maximum.accumulate(core_seconds_edges[1:])
+        buckets = np.digitize(core_seconds, upper_limits, right=True)
+    else:
+        buckets = np.zeros(len(core_seconds), dtype=int)
+    # Repeated edges share the group of their first appearance.
+    buckets = np.array([core_seconds_edges.index(x) 
+                        for x in core_seconds_edges])[buckets]
+    order = np.argsort(buckets, kind="stable")
+    limits = np.searchsorted(buckets[order],
+                             np.arange(len(core_seconds_edges)+1))
+    groups = {}
+    for (i, edge) in enumerate(core_seconds_edges):
+        if not edge in groups:
+            groups[edge] = order[limits[i]:limits[i+1]]
+    return groups
+
+def _is_workflow_job(job_names):
+    """Returns a boolean numpy array marking the job names that correspond
+    to workflow jobs (start with "wf_")."""
+    return np.char.startswith(np.asarray(job_names, dtype=str), "wf_")
+
+def _to_column(values):
+    """Returns values as a numpy array. Strings are kept as python objects."""
+    column = np.asarray(values)
+    if column.dtype.kind in "US":
+        column = np.array(values, dtype=object)
+    return column
+
+def _columns_equal(columns_1, columns_2):
+    """Returns True if two dictionaries of lists or arrays have the same
+    keys and the same values under each key."""
+    if not isinstance(columns_2, Mapping):
+        return False
+    if set(columns_1.keys())!=set(columns_2.keys()):
+        return False
+    for key in columns_1.keys():
+        if not np.array_equal(np.asarray(columns_1[key]),
+                              np.asarray(columns_2[key])):
+            return False
+    return True
+
+
+class TraceColumns(dict):
+    """Dictionary of numpy arrays storing the fields of a trace's jobs. Items
+    at the same position in all the arrays correspond to the same job.
+    Assigned values are converted to numpy arrays.
+    """
+    def __init__(self, job_lists=None, on_change=None):
+        """Constructor
+        Args:
+        - job_lists: dictionary of lists, one per job field.
+        - on_change: if set, function to be called each time a field is set.
+        """
+        super(TraceColumns,self).__init__()
+        self._on_change = None
+        if job_lists:
+            for (key, values) in job_lists.items():
+                self[key] = values
+        self._on_change = on_change
+    
+    def __setitem__(self, key, values):
+        super(TraceColumns,self).__setitem__(key, _to_column(values))
+        if self._on_change is not None:
+            self._on_change()
+    
+    def __eq__(self, other):
+        return _columns_equal(self, other)
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    __hash__ = None
+    
+    def get_job_count(self):
+        """Returns the number of jobs stored."""
+        if not self:
+            return 0
+        return len(next(iter(self.values())))
+    
+    def get_sorted(self, field):
+        """Returns a new TraceColumns with the jobs stably sorted by field."""
+        order = np.argsort(self[field], kind="stable")
+        if np.array_equal(order, np.arange(len(order))):
+            return TraceColumns(self)
+        return TraceColumns(dict([(key, values[order])
+                                  for (key, values) in self.items()]))
+    
+    def join(self, other):
+        """Returns a new TraceColumns with the jobs of other after the jobs of
+        this object."""
+        joined = TraceColumns()
+        for key in set(list(self.keys())+list(other.keys())):
+            parts = [x[key] for x in [self, other] if key in x]
+            joined[key] = np.concatenate(parts)
+        return joined
+    
+    def get_lists(self):
+        """Returns a dictionary of python lists with the job fields."""
+        return dict([(key, values.tolist()) for (key, values) in self.items()])
+
+
+class StartOrderColumns(Mapping):
+    """Read-only view of a TraceColumns object ordered by start time. Field
+    arrays are re-ordered on access, so no second copy is kept."""
+    def __init__(self, columns, start_order):
+        """Constructor
+        Args:
+        - columns: TraceColumns object.
+        - start_order: numpy array of positions in columns sorted by
+            start time.
+        """
+        self._columns = columns
+        self._start_order = start_order
+    
+    def __getitem__(self, key):
+        return self._columns[key][self._start_order]
+    
+    def __iter__(self):
+        return iter(self._columns)
+    
+    def __len__(self):
+        return len(self._columns)
+    
+    def __eq__(self, other):
+        return _columns_equal(self, other)
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    __hash__ = None
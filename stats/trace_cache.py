@@ -0,0 +1,135 @@
+"""
+Local on-disk cache of traces loaded from the database. Each trace is stored
+as a folder of .npy files, one per job field, that are memory mapped when
+read. String fields containing None (NULL) values also store a mask of those
+values.
+"""
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+class TraceCache(object):
+    """Size bounded cache of trace columns indexed by a key (e.g. table and
+    trace_id). Each entry stores a fingerprint of the trace it was created
+    from: an entry is only returned if the fingerprint of the trace in the
+    database is the same, otherwise it is considered stale. When the size of
+    the cache exceeds its limit, least recently used entries are removed.
+
+    Cache folders can be shared by processes: entries are written in a
+    temporary folder and renamed when complete, and renamed to a temporary
+    name before being deleted. Reading an entry that is being deleted returns
+    None.
+    """
+    def __init__(self, cache_dir, max_size_bytes=1024*1024*1024):
+        """Constructor
+        Args:
+        - cache_dir: folder to store the cache entries in. Created if it does
+            not exist.
+        - max_size_bytes: maximum size in bytes of all the stored entries.
+        """
+        self._cache_dir=cache_dir
+        self._max_size_bytes=max_size_bytes
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, key, fingerprint):
+        """Returns a dictionary of numpy arrays (memory mapped, read-only)
+        with the columns stored under key, or None if no entry exists or its
+        fingerprint is different.
+        Args:
+        - key: string identifying the entry.
+        - fingerprint: string identifying the version of the cached data.
+        """
+        entry_dir=self._get_entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, "fingerprint")) as f:
+                if f.read()!=fingerprint:
+                    return None
+            with open(os.path.join(entry_dir, "columns")) as f:
+                column_lines=f.read().splitlines()
+            columns={}
+            for line in column_lines:
+                field=line.split(",")[0]
+                values=np.load(os.path.join(entry_dir, field+".npy"),
+                               mmap_mode="r")
+                if line.endswith(",nulls"):
+                    nulls=np.load(os.path.join(entry_dir,
+                                               field+".nulls.npy"))
+                    values=values.astype(object)
+                    values[nulls]=None
+                columns[field]=values
+            os.utime(entry_dir, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return columns
+
+    def put(self, key, fingerprint, columns):
+        """Stores a dictionary of lists or numpy arrays under key. Strings
+        are stored as fixed size unicode arrays, plus a mask of the None
+        values if there are any. Least recently used entries are evicted if
+        the cache grows over its maximum size.
+        Args:
+        - key: string identifying the entry.
+        - fingerprint: string identifying the version of the data.
+        - columns: dictionary of lists or numpy arrays to store.
+        """
+        tmp_dir=tempfile.mkdtemp(dir=self._cache_dir, prefix=".tmp-")
+        try:
+            column_lines=[]
+            for (field, values) in columns.items():
+                values=np.asarray(values)
+                column_lines.append(field)
+                if values.dtype==object:
+                    nulls=np.array([x is None for x in values], dtype=bool)
+                    if nulls.any():
+                        np.save(os.path.join(tmp_dir, field+".nulls.npy"),
+                                nulls)
+                        column_lines[-1]+=",nulls"
+                    values=values.astype(str)
+                np.save(os.path.join(tmp_dir, field+".npy"), values)
+            with open(os.path.join(tmp_dir, "columns"), "w") as f:
+                f.write("\n".join(column_lines))
+            with open(os.path.join(tmp_dir, "fingerprint"), "w") as f:
+                f.write(fingerprint)
+            self.invalidate(key)
+            os.rename(tmp_dir, self._get_entry_dir(key))
+        except (IOError, OSError):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._evict()
+
+    def invalidate(self, key):
+        """Removes the entry stored under key, if any. The entry is renamed
+        first, so it disappears at once for readers."""
+        tmp_dir=tempfile.mkdtemp(dir=self._cache_dir, prefix=".tmp-")
+        try:
+            # Replaces the empty tmp_dir.
+            os.rename(self._get_entry_dir(key), tmp_dir)
+        except OSError:
+            pass
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _get_entry_dir(self, key):
+        return os.path.join(self._cache_dir, key)
+
+    def _evict(self):
+        entries=[]
+        total_size=0
+        for name in os.listdir(self._cache_dir):
+            entry_dir=self._get_entry_dir(name)
+            if name.startswith(".tmp-") or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size=sum([os.path.getsize(os.path.join(entry_dir, x))
+                          for x in os.listdir(entry_dir)])
+                entries.append((os.path.getmtime(entry_dir), name, size))
+            except OSError:
+                continue
+            total_size+=size
+        for (access_time, name, size) in sorted(entries):
+            if total_size<=self._max_size_bytes:
+                break
+            self.invalidate(name)
+            total_size-=size
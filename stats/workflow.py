@@ -1,4 +1,5 @@
 from stats import calculate_results, load_results, Histogram, NumericStats
+from generate.manifest_cache import get_manifest_cache
 from generate.pattern import WorkflowGeneratorMultijobs
 import bisect
 import os
@@ -175,17 +176,40 @@ class WorkflowsExtractor(object):
         """
         data_list = [wf_runtime, wf_waittime, wf_turnaround, wf_stretch_factor,
                  wf_jobs_runtime, wf_jobs_cores]
-        field_list = ["wf_runtime", "wf_waittime", "wf_turnaround",
-                      "wf_stretch_factor", "wf_jobs_runtime", "wf_jobs_cores"]
-        if prefix!=None:
-            field_list = [prefix+"_"+x for x in field_list]
-        bin_size_list = [60,60,120, 0.01, 60, 24]
-        minmax_list = [(0, 3600*24*30), (0, 3600*24*30), (0, 2*3600*24*30),
-                       (0, 1000), (0, 3600*24*30), (0, 24*4000)]
+        field_list, bin_size_list, minmax_list = _get_wf_results_config(
+                                                                    prefix)
         return calculate_results(data_list, field_list, bin_size_list,
                       minmax_list, store=store, db_obj=db_obj, 
                       trace_id=trace_id)            
     
+    def fill_partial_results(self, partial, start=None, stop=None):
+        """Adds the overall and per manifest values of the workflows
+        submitted between start and stop to a PartialResults object. Per
+        manifest fields are prefixed by "m_[manifest]".
+        Args:
+        - partial: PartialResults object to add the values to.
+        - start: integer epoch date. If set, WFs submitted before start will
+            not be used.
+        - stop: integer epoch date. If set, WFs submitted after stop will
+            not be used.
+        Returns: partial.
+        """
+        values_list = [(None, self._get_workflow_times(submit_start=start,
+                                                       submit_stop=stop))]
+        manifests = self._get_per_manifest_workflow_times(submit_start=start,
+                                                          submit_stop=stop)
+        for (manifest, data) in manifests.items():
+            values_list.append(("m_"+manifest, 
+                                [data[x] for x in _wf_fields]))
+        for (prefix, values) in values_list:
+            field_list, bin_size_list, minmax_list = _get_wf_results_config(
+                                                                    prefix)
+            for (data, field, bin_size, minmax) in zip(values, field_list,
+                                                       bin_size_list,
+                                                       minmax_list):
+                partial.add(field, data, bin_size, minmax)
+        return partial
+    
     def fill_overall_values(self, start=None, stop=None, append=False):
         (wf_runtime, wf_waittime, wf_turnaround, wf_stretch_factor,
                  wf_jobs_runtime, wf_jobs_cores) = self._get_workflow_times(
@@ -427,6 +451,21 @@ class WorkflowsExtractor(object):
                 new_dic[key]+=dic2[key]
         return new_dic
 
+_wf_fields = ["wf_runtime", "wf_waittime", "wf_turnaround",
+              "wf_stretch_factor", "wf_jobs_runtime", "wf_jobs_cores"]
+
+def _get_wf_results_config(prefix=None):
+    """Returns the list of workflow result fields (with prefix+"_" before
+    them if prefix is set), and the bin sizes and (min, max) tuples of their
+    histograms."""
+    field_list = list(_wf_fields)
+    if prefix!=None:
+        field_list = [prefix+"_"+x for x in field_list]
+    bin_size_list = [60,60,120, 0.01, 60, 24]
+    minmax_list = [(0, 3600*24*30), (0, 3600*24*30), (0, 2*3600*24*30),
+                   (0, 1000), (0, 3600*24*30), (0, 24*4000)]
+    return field_list, bin_size_list, minmax_list
+
 def _fuse_delta_lists(stamps_list, deltas_list, stamps, deltas):
     """Joins two lists of waste deltas"""
     for (st, us) in zip(stamps, deltas):
@@ -535,31 +574,40 @@ class WorkflowTracker(object):
                                             self._get_critical_path(start_task))
         self._incomplete_workflow = not self._critical_path 
         
-    def _get_critical_path(self, task, min_time=0):
-        """Returns critical path from task to the end of the workflow if its
-        lenght (including tasks runtime and wait timeI is longer thatn min_time.
+    def _get_critical_path(self, task):
+        """Returns critical path from task to the end of the workflow and its
+        length (tasks runtime and wait time between them). The path is
+        calculated as a longest path dynamic program over the tasks reachable
+        from task in reverse topological order, linear in the number of
+        dependencies. If more than one path is the longest, the one following
+        the first dependencies in dependenciesTo is returned. Tasks in
+        dependency cycles are ignored. Returns an empty path if the workflow
+        is incomplete or the length is not positive.
         """
-        path = []
-        if self._incomplete_workflow:
+        if self._incomplete_workflow or task is None:
             return [], 0
-        task_runtime=task.data["time_end"]-task.data["time_start"]
-        
-        path_time = 0
-        for sub_task in task.dependenciesTo:
-            sub_task_wait_time=sub_task.data["time_start"]-task.data["time_end"]     
-            sub_path, sub_time = self._get_critical_path(sub_task,
-                                                       path_time)
-            if (sub_path and task_runtime+sub_task_wait_time+sub_time>min_time
-                and task_runtime+sub_task_wait_time+sub_time>path_time):
-                path=sub_path
-                path_time=sub_task_wait_time+sub_time
-        
-        path = [task] + path
-        path_time += task_runtime
-        if min_time<path_time:
-            return path, path_time
-        
-        return [], 0
+        best = {}
+        for current in reversed(_get_topological_order(task)):
+            task_runtime=current.data["time_end"]-current.data["time_start"]
+            path_time = 0
+            next_task = None
+            for sub_task in current.dependenciesTo:
+                if not sub_task in best:
+                    continue
+                sub_time = (sub_task.data["time_start"]
+                            -current.data["time_end"]+best[sub_task][0])
+                if next_task is None or sub_time>path_time:
+                    path_time = sub_time
+                    next_task = sub_task
+            best[current] = (task_runtime+path_time, next_task)
+        if not task in best or best[task][0]<=0:
+            return [], 0
+        path = []
+        current = task
+        while current is not None:
+            path.append(current)
+            current = best[current][1]
+        return path, best[task][0]
     
     def get_waste_changes(self):
         if not self.single_job_wf:
@@ -569,6 +617,30 @@ class WorkflowTracker(object):
             we = WasteExtractor(manifest)
             return we.get_waste_changes(self._start_task.data["time_start"])
             
+def _get_topological_order(first_task):
+    """Returns the list of tasks reachable from first_task through their
+    dependenciesTo in topological order (each task after all the tasks
+    it depends on). Tasks in dependency cycles are not included."""
+    reachable = [first_task]
+    in_degree = {first_task:0}
+    pos = 0
+    while pos < len(reachable):
+        for sub_task in reachable[pos].dependenciesTo:
+            if not sub_task in in_degree:
+                in_degree[sub_task]=0
+                reachable.append(sub_task)
+            in_degree[sub_task]+=1
+        pos+=1
+    order = [first_task] if in_degree[first_task]==0 else []
+    pos = 0
+    while pos < len(order):
+        for sub_task in order[pos].dependenciesTo:
+            in_degree[sub_task]-=1
+            if in_degree[sub_task]==0:
+                order.append(sub_task)
+        pos+=1
+    return order
+
 def paint_path(path):  
     return [t.stage_id for t in path]
 
@@ -584,9 +656,23 @@ class WasteExtractor(object):
         self._manifest = os.path.join(man_dir, self._manifest)
     
     def get_waste_changes(self, start_time):
+        """Returns the time stamps, changes in wasted cores at those stamps,
+        and accumulated waste (core seconds) of running the manifest as a
+        single job starting at start_time. The waste profile of each
+        manifest is calculated once per process (relative to time 0) and
+        shifted to start_time.
+        """
+        stamps, waste_list, acc_waste = get_manifest_cache().get_derived(
+                                                self._manifest,
+                                                "waste_profile",
+                                                self._calculate_waste_changes)
+        return ([x+start_time for x in stamps], list(waste_list),
+                acc_waste)
+    
+    def _calculate_waste_changes(self, manifest_route, start_time=0):
         self._time_stamps = []
         self._allocation_changes = []
-        total_cores, total_runtime=self._expand_workflow(self._manifest,
+        total_cores, total_runtime=self._expand_workflow(manifest_route,
                                                      start_time)
         
         waste_list = []
@@ -12,9 +12,10 @@ import datetime
 import os
 import unittest
 from orchestration.definition import ExperimentDefinition
-from orchestration.analyzing import AnalysisRunnerSingle
-from stats import Histogram, NumericStats, NumericList
+from orchestration.analyzing import AnalysisRunnerSingle, AnalysisGroupRunner
+from stats import Histogram, NumericStats, NumericList, PartialResults
 from commonLib.nerscUtilization import UtilizationEngine
+import numpy as np
 
 
 class TestAnalysisRunnerSingle(unittest.TestCase):
@@ -109,4 +110,32 @@ class TestAnalysisRunnerSingle(unittest.TestCase):
         ed._preload_time_s=0
         ar = AnalysisRunnerSingle(ed)
         ar.do_full_analysis(self._db)
-        
\ No newline at end of file
+        
+
+
+def _fake_subtrace_partial(args):
+    """Module level (picklable) replacement of _get_subtrace_partial_results
+    producing data out of a seed instead of reading a subtrace."""
+    (db_obj, seed) = args
+    rand = np.random.RandomState(seed)
+    partial = PartialResults()
+    partial.add("jobs_runtime", rand.randint(0, 10000, 200), 60, (0, 10000))
+    partial.add("jobs_wait", rand.exponential(500, 150+seed), 10, (0, 5000))
+    if seed%2:
+        partial.add("wf_runtime", rand.uniform(0, 100, 20), 1, (0, 100))
+    return partial
+
+class TestAnalysisGroupRunnerPartials(unittest.TestCase):
+    def test_pool_same_as_serial(self):
+        er = AnalysisGroupRunner(None)
+        work_args = [(None, seed) for seed in range(6)]
+        serial = er._get_partial_results(work_args, 1, _fake_subtrace_partial)
+        pooled = er._get_partial_results(work_args, 3, _fake_subtrace_partial)
+        self.assertEqual(serial.get_fields(),
+                         ["jobs_runtime", "jobs_wait", "wf_runtime"])
+        self.assertEqual(pooled.get_fields(), serial.get_fields())
+        for field in serial.get_fields():
+            np.testing.assert_array_equal(pooled.get_values(field),
+                                          serial.get_values(field))
+        self.assertEqual(len(serial.get_values("jobs_runtime")), 1200)
+
@@ -0,0 +1,105 @@
+"""UNIT TESTS for the connection handling of DB and ConnectionPool. They use
+fake connections, no database is needed.
+
+ python -m unittest test_DBManager
+"""
+
+from commonLib.DBManager import DB, ConnectionPool, ConnectionPoolTimeout
+
+import itertools
+import unittest
+
+
+class FakeCursor(object):
+    def __init__(self, con):
+        self._con = con
+        self._rows = []
+    def execute(self, query, params=None):
+        if query is None:
+            raise TypeError("No query")
+        self._con.queries.append(query)
+        self._rows = [(1,), (2,), (3,)]
+        return len(self._rows)
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+    def close(self):
+        pass
+
+class FakeConnection(object):
+    def __init__(self):
+        self.queries = []
+        self.closed = False
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+    def commit(self):
+        pass
+    def rollback(self):
+        pass
+    def ping(self):
+        pass
+    def close(self):
+        self.closed = True
+
+class FakeDB(DB):
+    _names = itertools.count()
+    def __init__(self, pool_size=None, pool_timeout=60):
+        # Each object gets its own pool.
+        DB.__init__(self, "fakehost", "fake{0}".format(next(FakeDB._names)),
+                    "user", "pass", pool_size=pool_size,
+                    pool_timeout=pool_timeout)
+        self.opened = []
+    def _open_connection(self):
+        con = FakeConnection()
+        self.opened.append(con)
+        return con
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_checkout_checkin(self):
+        pool = ConnectionPool(FakeConnection, max_size=2, timeout=0.1)
+        con1 = pool.checkout()
+        con2 = pool.checkout()
+        self.assertIsNot(con1, con2)
+        self.assertRaises(ConnectionPoolTimeout, pool.checkout)
+        pool.checkin(con1)
+        self.assertIs(pool.checkout(), con1)
+
+
+class TestDBConnections(unittest.TestCase):
+    def test_statements_in_chunks_loop(self):
+        db_obj = FakeDB(pool_size=2, pool_timeout=0.1)
+        for i in range(2):
+            for rows in db_obj.getValuesChunks("table", ["field"],
+                                               chunk_size=1):
+                self.assertEqual(db_obj.doQuery("select 1"),
+                                 [(1,), (2,), (3,)])
+        self.assertEqual(len(db_obj.opened), 2)
+        # All the connections are back in the pool.
+        self.assertEqual(db_obj.doQuery("select 1"), [(1,), (2,), (3,)])
+        with db_obj.session():
+            for rows in db_obj.getValuesChunks("table", ["field"]):
+                db_obj.doQuery("select 1")
+        self.assertEqual(db_obj.con, False)
+        self.assertEqual(db_obj.doQuery("select 1"), [(1,), (2,), (3,)])
+
+    def test_nested_connect(self):
+        db_obj = FakeDB()
+        self.assertTrue(db_obj.connect())
+        con = db_obj.con
+        self.assertTrue(db_obj.connect())
+        self.assertIs(db_obj.con, con)
+        db_obj.disconnect()
+        self.assertIs(db_obj.con, con)
+        db_obj.disconnect()
+        self.assertEqual(db_obj.con, False)
+        self.assertTrue(con.closed)
+
+    def test_disconnect_on_exception(self):
+        db_obj = FakeDB(pool_size=1, pool_timeout=0.1)
+        self.assertRaises(TypeError, db_obj.doQuery, None)
+        self.assertEqual(db_obj.con, False)
+        self.assertEqual(db_obj.doQuery("select 1"), [(1,), (2,), (3,)])
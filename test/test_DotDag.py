@@ -0,0 +1,48 @@
+"""UNIT TESTS for the DOT parser of manifest dependency graphs
+
+ python -m unittest test_DotDag
+
+
+"""
+
+from workflows.dot_dag import parse_dot_edges, get_manifest_edges
+
+import json
+import unittest
+
+
+class TestDotDag(unittest.TestCase):
+    def test_parse_dot_edges(self):
+        self.assertEqual(parse_dot_edges('strict digraph  {\n\tS0 -> S1;\n'
+                                         '\tS1 -> S3;\n\tS1 -> S2;\n'
+                                         '\tS2 -> S4;\n}\n'),
+                         [("S0", "S1"), ("S1", "S3"), ("S1", "S2"),
+                          ("S2", "S4")])
+        # Edges are grouped by tail in order of node creation.
+        self.assertEqual(parse_dot_edges("strict digraph  {\n\tS0 -> S1;\n"
+                                         "\tS0 -> S2;\n\tS1 -> S4;\n"
+                                         "\tS4 -> S2;\n\tS2 -> S3;\n}\n"),
+                         [("S0", "S1"), ("S0", "S2"), ("S1", "S4"),
+                          ("S2", "S3"), ("S4", "S2")])
+        self.assertEqual(parse_dot_edges("strict digraph  {\n\tS0;}\n"), [])
+
+    def test_parse_dot_edges_syntax(self):
+        self.assertEqual(parse_dot_edges(
+                    'digraph "G" { rankdir=LR node[shape=box]\n'
+                    '// comment\n'
+                    'subgraph cluster_0 {label="A -> B"; a [label="]"]}\n'
+                    'a -> {b c} -> d [color=black]; /* a -> z */\n'
+                    '"e f":p -> a; a -> b }'),
+                         [("a", "b"), ("a", "c"), ("a", "b"), ("b", "d"),
+                          ("c", "d"), ("e f", "a")])
+        self.assertEqual(parse_dot_edges("strict digraph { a -> b; a -> b }"),
+                         [("a", "b")])
+        self.assertRaises(ValueError, parse_dot_edges, "digraph { a -> }")
+        self.assertRaises(ValueError, parse_dot_edges, "a -> b")
+
+    def test_get_manifest_edges(self):
+        with open("manifest_sim.json") as f:
+            manifest = json.load(f)
+        self.assertEqual(get_manifest_edges(manifest), [("Decode", "Hello")])
+        manifest["dag_edges"] = [["Hello", "Decode"]]
+        self.assertEqual(get_manifest_edges(manifest), [("Hello", "Decode")])
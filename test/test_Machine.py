@@ -90,6 +90,29 @@ class TestMachine(unittest.TestCase):
         self.assertEqual(cores, 24)
         self.assertLess(abs(wc_limit-2),1)
         self.assertLess(abs(run_time-60),30)
+    
+    def test_get_new_job_details_batch(self):
+        cores = [24,24,24,24] 
+        self._edison._generators["cores"] = (
+                        self._edison._populate_cores_generator(cores))
+        
+        wallclock = [120,120,120,120] 
+        self._edison._generators["wc_limit"] = \
+            self._edison._populate_wallclock_limit_generator(wallclock)
+
+        wallclock = [120,120,120,120]
+        runtime = [60, 60, 60, 60] 
+        self._edison._generators["accuracy"] = \
+             self._edison._populate_wallclock_accuracy(wallclock,
+                                                              runtime)
+        job_details = self._edison.get_new_job_details_batch(100)
+        self.assertEqual(len(job_details), 100)
+        for (cores, wc_limit, run_time) in job_details:
+            self.assertEqual(cores, 24)
+            self.assertLess(abs(wc_limit-2),1)
+            self.assertGreaterEqual(run_time, 60)
+            self.assertLessEqual(run_time, 3*60*0.51)
+            self.assertEqual(type(run_time), int)
         
     def test_save_load(self):
         create_times = [2, 10, 10, 20, 20]
@@ -0,0 +1,58 @@
+"""UNIT TESTS for the process wide manifest cache
+
+ python -m unittest test_ManifestCache
+
+
+"""
+
+from generate.manifest_cache import ManifestCache
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestManifestCache(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._dir, True)
+        self._route = os.path.join(self._dir, "manifest.json")
+        self._write_manifest(144, 0)
+
+    def _write_manifest(self, max_cores, mtime):
+        with open(self._route, "w") as f:
+            json.dump({"max_cores":max_cores, "total_runtime":960,
+                       "tasks":[]}, f)
+        os.utime(self._route, (mtime, mtime))
+
+    def test_get_manifest(self):
+        cache = ManifestCache()
+        manifest = cache.get_manifest(self._route)
+        self.assertEqual(manifest["max_cores"], 144)
+        self.assertIs(cache.get_manifest(self._route), manifest)
+        self.assertEqual(cache.get_cores_runtime(self._route), (144, 960))
+
+        self._write_manifest(48, 100)
+        self.assertEqual(cache.get_cores_runtime(self._route), (48, 960))
+
+    def test_get_derived(self):
+        cache = ManifestCache()
+        calls = []
+        def calculate(manifest_route):
+            calls.append(manifest_route)
+            return cache.get_manifest(manifest_route)["max_cores"]*2
+        self.assertEqual(cache.get_derived(self._route, "double", calculate),
+                         288)
+        self.assertEqual(cache.get_derived(self._route, "double", calculate),
+                         288)
+        self.assertEqual(calls, [self._route])
+
+        self._write_manifest(48, 100)
+        self.assertEqual(cache.get_derived(self._route, "double", calculate),
+                         96)
+        cache.clear()
+        self.assertEqual(cache.get_derived(self._route, "double", calculate),
+                         96)
+        self.assertEqual(len(calls), 3)
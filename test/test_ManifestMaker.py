@@ -443,6 +443,11 @@ class TestManifestMaker(unittest.TestCase):
                           ],
                           "max_cores":512,
                           "total_runtime": float(39600+46800+14400+16200),
-                          "dot_dag":'strict digraph "" {\n\tS2 -> S6;\n\tS3 -> S5;\n\tS0 -> S2;\n\tS0 -> S3;\n\tS0 -> S4;\n\tS0 -> S5;\n\tS4 -> S2;\n\tS5 -> S6;\n\tS1 -> S3;\n\tS1 -> S4;\n}\n'
+                          "dot_dag":'strict digraph "" {\n\tS2 -> S6;\n\tS3 -> S5;\n\tS0 -> S2;\n\tS0 -> S3;\n\tS0 -> S4;\n\tS0 -> S5;\n\tS4 -> S2;\n\tS5 -> S6;\n\tS1 -> S3;\n\tS1 -> S4;\n}\n',
+                          "dag_edges":[["S2", "S6"], ["S3", "S5"],
+                                       ["S5", "S6"], ["S0", "S2"],
+                                       ["S0", "S3"], ["S0", "S4"],
+                                       ["S0", "S5"], ["S4", "S2"],
+                                       ["S1", "S3"], ["S1", "S4"]]
                           })
         
\ No newline at end of file
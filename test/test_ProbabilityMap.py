@@ -10,7 +10,9 @@ import random
 import string
 import unittest
 
-from analysis import ProbabilityMap, _round_number
+from analysis import ProbabilityMap, _round_number, _round_numbers
+import numpy as np
+import random_control
 
 
 class TestProbabilityMap(unittest.TestCase):
@@ -109,6 +111,70 @@ class TestProbabilityMap(unittest.TestCase):
         prob_map_n.random_gen.uniform=_fake_random
         
         self.assertEqual(prob_map_n.produce_number(), 4.7)
+    
+    def test_produce_numbers(self):
+        prob_map = ProbabilityMap([0.2, 0.6, 0.9, 1.0], 
+                                  [(0,1),(2,3),(4,5),(10,11)],
+                                  interval_policy="low")
+        numbers = prob_map.produce_numbers(1000)
+        self.assertEqual(len(numbers), 1000)
+        for n in numbers:
+            self.assertIn(n, [0, 2, 4, 10])
+        self.assertGreater(list(numbers).count(2), list(numbers).count(10))
+        
+        for policy in ["random", "absnormal"]:
+            prob_map = ProbabilityMap([0.2, 0.6, 0.9, 1.0], 
+                                      [(0,1),(2,3),(4,5),(10,11)],
+                                      interval_policy=policy)
+            for n in prob_map.produce_numbers(100):
+                self.assertTrue((n>=0 and n<=1) or (n>=2 and n<=3) or
+                                (n>=4 and n<=5) or (n>=10 and n<=11))
+    
+    def test_produce_numbers_policies(self):
+        for (policy, value) in [("midpoint", 7.5), ("low", 7), ("high", 8)]:
+            prob_map = ProbabilityMap([1.0], [(7,8)], interval_policy=policy)
+            self.assertEqual(list(prob_map.produce_numbers(3)), [value]*3)
+        
+        prob_map = ProbabilityMap([1.0], [(7,8)], interval_policy="unknown")
+        self.assertRaises(ValueError, prob_map.produce_numbers, 3)
+        self.assertRaises(ValueError, ProbabilityMap().produce_numbers, 3)
+    
+    def test_random_streams(self):
+        self.addCleanup(random_control.set_global_random_streams, None)
+        sequences = []
+        for seed in ["AAAAA", "AAAAA", "BBBBB"]:
+            random_control.set_global_random_streams(seed)
+            prob_map = ProbabilityMap([0.2, 0.6, 0.9, 1.0], 
+                                      [(0,1),(2,3),(4,5),(10,11)],
+                                      interval_policy="absnormal")
+            prob_map.set_random_stream("var1")
+            sequences.append(list(prob_map.produce_numbers(100)))
+        self.assertEqual(sequences[0], sequences[1])
+        self.assertNotEqual(sequences[0], sequences[2])
+        
+        random_control.set_global_random_streams("AAAAA")
+        prob_map = ProbabilityMap([0.2, 0.6, 0.9, 1.0], 
+                                  [(0,1),(2,3),(4,5),(10,11)],
+                                  interval_policy="absnormal")
+        prob_map.set_random_stream("var1")
+        single_values = [prob_map.produce_number() for i in range(50)]
+        self.assertEqual(single_values+list(prob_map.produce_numbers(50)),
+                         sequences[0])
+        
+        prob_map.set_random_stream("var2")
+        self.assertNotEqual(list(prob_map.produce_numbers(100)),
+                            sequences[0])
+        
+        random_control.set_global_random_streams(None)
+        prob_map.set_random_stream("var1")
+        self.assertEqual(prob_map._random_streams, None)
+    
+    def test_round_numbers(self):
+        values = np.array([11.3, 11.7, -11.3])
+        self.assertEqual(list(_round_numbers(values)), [11.3, 11.7, -11.3])
+        self.assertEqual(list(_round_numbers(values, 0.5)), [11, 11.5, -11.5])
+        self.assertEqual(list(_round_numbers(values, 0.5, True)),
+                         [11.5, 12.0, -11])
          
 def _fake_random(num1, num2):
     return num1+(num2-num1)*0.7
@@ -6,10 +6,13 @@
 """
 
 from commonLib.DBManager import DB
-from stats import Result, Histogram, NumericStats, NumericList
+from stats import (Result, Histogram, NumericStats, NumericList,
+                   PartialResults, calculate_results, load_results_many)
 
+import codecs
 import numpy as np
 import os
+import pickle
 import unittest
 
 class TestResult(unittest.TestCase):
@@ -113,9 +116,23 @@ class TestHistogram(unittest.TestCase):
         hist=None
         hist_new = Histogram()
         hist_new.load(self._db, 1, "MyHist")
-        self.assertEqual(hist_new._get("edges"), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(hist_new._get("edges")), [1, 2, 3, 4, 5, 6])
         self.assertEqual(list(hist_new._get("bins")), [0.2, 0.2, 0.4, 0, 0.2])    
     
+    def test_encode_decode(self):
+        hist = Histogram()
+        for values in [[], [0.2, 0.2, 0.4, 0, 0.2], [0.0]*1000]:
+            blob = hist._encode(values, "bins")
+            self.assertTrue(isinstance(blob, bytes))
+            decoded = hist._decode(blob, "bins")
+            self.assertEqual(decoded.dtype, np.float64)
+            self.assertEqual(list(decoded), values)
+        self.assertLess(len(hist._encode([0.0]*1000, "bins")), 1000)
+        
+        old_blob = codecs.encode(pickle.dumps([1, 2, 6]), "base64")
+        self.assertEqual(hist._decode(old_blob, "edges"), [1, 2, 6])
+        self.assertEqual(hist._decode(old_blob.decode(), "edges"), [1, 2, 6])
+    
 class TestNumericStats(unittest.TestCase):
     def setUp(self):
         self._db  = DB(os.getenv("TEST_DB_HOST", "127.0.0.1"),
@@ -167,6 +184,56 @@ class TestNumericStats(unittest.TestCase):
         self.assertEqual(data["p75"], 75)
         self.assertEqual(data["p95"], 95)
 
+    def test_load_many(self):
+        num = NumericStats()
+        self.addCleanup(self._del_table, "numericStats")
+        num.create_table(self._db)
+        num.calculate(list(range(0,101)))
+        num.store(self._db, 1, "MyStats")
+        num.store(self._db, 2, "OtherStats")
+        num.calculate(list(range(0,11)))
+        num.store(self._db, 2, "MyStats")
+        
+        results = load_results_many(NumericStats, self._db, [1, 2, 3],
+                                    ["MyStats", "OtherStats"])
+        self.assertEqual(sorted(results.keys()), [(1, "MyStats"),
+                                                  (2, "MyStats"),
+                                                  (2, "OtherStats")])
+        self.assertEqual(results[(1, "MyStats")].get_data()["max"], 100)
+        self.assertEqual(results[(2, "MyStats")].get_data()["max"], 10)
+        self.assertEqual(results[(2, "OtherStats")].get_data()["max"], 100)
+        self.assertEqual(load_results_many(NumericStats, self._db, [], 
+                                           ["MyStats"]), {})
+
+class TestPartialResults(unittest.TestCase):
+    def test_merge(self):
+        partial_1 = PartialResults()
+        partial_1.add("runtime", [5, 1, 3], 1, (0, 10))
+        partial_2 = PartialResults()
+        partial_2.add("runtime", [4, 2], 1, (0, 10))
+        partial_2.add("waittime", [7], 2, (0, 20))
+        partial_1.merge(partial_2)
+        self.assertEqual(partial_1.get_fields(), ["runtime", "waittime"])
+        self.assertEqual(partial_1.get_values("runtime").tolist(),
+                         [1, 2, 3, 4, 5])
+        self.assertEqual(partial_1.get_values("waittime").tolist(), [7])
+        
+    def test_calculate_results(self):
+        data_1 = [10, 400, 30, 7, 7]
+        data_2 = [1000, 3, 50]
+        partial = PartialResults()
+        partial.add("runtime", data_1, 60, (0, 3600))
+        partial_2 = PartialResults()
+        partial_2.add("runtime", data_2, 60, (0, 3600))
+        partial.merge(partial_2)
+        
+        results = partial.calculate_results()
+        expected = calculate_results([data_1+data_2], ["runtime"],
+                                     [60], [(0, 3600)])
+        self.assertEqual(sorted(results.keys()), sorted(expected.keys()))
+        for field in expected.keys():
+            assertEqualResult(self, expected[field], results[field], field)
+
 def assertEqualResult(test_obj, r_old, r_new, field):        
     d_old = r_old.get_data()
     d_new = r_new.get_data()
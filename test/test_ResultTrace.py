@@ -11,7 +11,8 @@
 """
 
 from commonLib.DBManager import DB
-from stats.trace import ResultTrace
+from commonLib.nerscUtilization import UtilizationEngine
+from stats.trace import ResultTrace, _get_core_seconds_groups
 from stats import Histogram, NumericStats
 
 import numpy as np
@@ -101,7 +102,7 @@ class TestResultTrace(unittest.TestCase):
              "time_end": [3002,3005]                      
              }
         for key in list(compare_data.keys()):
-            self.assertEqual(compare_data[key], rt._lists_submit[key])
+            self.assertEqual(compare_data[key], rt._lists_submit[key].tolist())
         
         compare_data= {
              "job_db_inx":[2,1],
@@ -123,7 +124,7 @@ class TestResultTrace(unittest.TestCase):
              "time_end": [3005,3002]                      
              }
         for key in list(compare_data.keys()):
-            self.assertEqual(compare_data[key], rt._lists_start[key])
+            self.assertEqual(compare_data[key], rt._lists_start[key].tolist())
           
     def test_clean_dumplicates_db(self):
         self._create_tables()
@@ -198,7 +199,7 @@ class TestResultTrace(unittest.TestCase):
              "time_end": [3002,3005]                      
              }
         for key in list(compare_data.keys()):
-            self.assertEqual(compare_data[key], rt._lists_submit[key])
+            self.assertEqual(compare_data[key], rt._lists_submit[key].tolist())
         
         compare_data= {
              "job_db_inx":[3,1],
@@ -220,7 +221,7 @@ class TestResultTrace(unittest.TestCase):
              "time_end": [3005,3002]                      
              }
         for key in list(compare_data.keys()):
-            self.assertEqual(compare_data[key], rt._lists_start[key])
+            self.assertEqual(compare_data[key], rt._lists_start[key].tolist())
             
     def test_store_trace(self):
         self._create_tables()
@@ -366,18 +367,18 @@ class TestResultTrace(unittest.TestCase):
         new_rt = ResultTrace()
         new_rt.load_trace(self._db,1)
         new_rt.load_trace(self._db,1, True)
-        self.assertEqual(new_rt._lists_submit["time_submit"],
+        self.assertEqual(new_rt._lists_submit["time_submit"].tolist(),
                          [3000, 3003, 3004, 3007])
-        self.assertEqual(new_rt._lists_submit["time_start"],
+        self.assertEqual(new_rt._lists_submit["time_start"].tolist(),
                          [3002, 3001, 3006, 3005])
-        self.assertEqual(new_rt._lists_submit["time_end"],
+        self.assertEqual(new_rt._lists_submit["time_end"].tolist(),
                          [3002, 3005, 3006, 3009])
         
-        self.assertEqual(new_rt._lists_start["time_start"],
+        self.assertEqual(new_rt._lists_start["time_start"].tolist(),
                          [3001, 3002, 3005, 3006])
-        self.assertEqual(new_rt._lists_start["time_submit"],
+        self.assertEqual(new_rt._lists_start["time_submit"].tolist(),
                          [3003, 3000, 3007, 3004])
-        self.assertEqual(new_rt._lists_start["time_end"],
+        self.assertEqual(new_rt._lists_start["time_end"].tolist(),
                          [3005, 3002, 3009, 3006])
         
     def test_multi_load_results(self):
@@ -453,6 +454,64 @@ class TestResultTrace(unittest.TestCase):
         self.assertEqual(jobs_cores_alloc, [20,30])
         self.assertEqual(jobs_slow_down, [1.0, 9970.0/9000.0])
         
+    def test_read_columns(self):
+        rows = [(1, "account1", 48, 48, "jobName1", 1, 2, 3, 4, 2,
+                 "partition1", 99, 3, 100, 3000, 3002, 3002),
+                (2, "account2", 96, 96, "jobName2", 2, 3, 4, 5, 4,
+                 "partition2", 199, 2, 200, 3003, 3001, 3005),
+                (3, "account1", 24, 24, "jobName3", 3, 3, 4, 5, 1,
+                 "partition1", 199, 2, 200, 3004, 3000, 3006)]
+        db_obj = FakeChunksDBObj(rows)
+        rt = ResultTrace()
+        rt._lists_submit = rt._read_columns(db_obj, "import_table",
+                                            chunk_size=2)
+        self.assertEqual(db_obj.chunk_sizes, [2, 1])
+        self.assertEqual(rt._lists_submit["time_submit"].tolist(),
+                         [3000, 3003, 3004])
+        self.assertEqual(rt._lists_submit["time_submit"].dtype, np.int64)
+        self.assertEqual(rt._lists_submit["job_name"].tolist(),
+                         ["jobName1", "jobName2", "jobName3"])
+        self.assertEqual(rt._lists_start["id_job"].tolist(), [3, 2, 1])
+        
+        rt._lists_submit = rt._read_columns(FakeChunksDBObj([]),
+                                            "import_table")
+        self.assertEqual(rt._lists_submit.get_job_count(), 0)
+        
+    def test_store_trace_resume(self):
+        rt = ResultTrace()
+        rt._lists_submit = {"id_job":[1, 2, 3], "time_submit":[10, 11, 12]}
+        db_obj = FakeChunksDBObj([(1,), (3,)])
+        self.assertTrue(rt.store_trace(db_obj, 7))
+        table, columns, fixed = db_obj.inserted
+        self.assertEqual(table, "traces")
+        self.assertEqual(fixed, {"trace_id":7})
+        self.assertEqual(columns["id_job"].tolist(), [2])
+        self.assertEqual(columns["time_submit"].tolist(), [11])
+        
+    def test_lists_start_order(self):
+        rt = ResultTrace()
+        rt._lists_submit["time_submit"] = [0, 2, 30, 100]
+        rt._lists_submit["time_start"] = [50, 20, 0, 20]
+        rt._lists_submit["id_job"] = [1, 2, 3, 4]
+        self.assertEqual(rt._lists_start["id_job"].tolist(), [3, 2, 4, 1])
+        self.assertEqual(rt._lists_start["time_submit"].tolist(),
+                         [30, 2, 100, 0])
+        rt._lists_submit["time_start"] = [10, 20, 30, 40]
+        self.assertEqual(rt._lists_start["id_job"].tolist(), [1, 2, 3, 4])
+        
+        rt._lists_start = {"time_submit": [30, 2, 100, 0],
+                           "time_start": [0, 20, 20, 50],
+                           "id_job": [3, 2, 4, 1]}
+        self.assertEqual(rt._lists_submit["id_job"].tolist(), [1, 2, 3, 4])
+        self.assertEqual(rt._lists_start, 
+                         {"time_submit": [30, 2, 100, 0],
+                          "time_start": [0, 20, 20, 50],
+                          "id_job": [3, 2, 4, 1]})
+        self.assertEqual(rt._lists_submit, 
+                         {"time_submit": [0, 2, 30, 100],
+                          "time_start": [50, 20, 0, 20],
+                          "id_job": [1, 2, 3, 4]})
+        
     def test_get_job_times_limits(self):
         rt = ResultTrace()
         rt._lists_submit["time_end"] = [10, 10, 10000, 140]
@@ -516,6 +575,36 @@ class TestResultTrace(unittest.TestCase):
         self.assertEqual(jobs_timesubmit[1000], [30])
     
     
+    def test_get_core_seconds_groups(self):
+        groups = _get_core_seconds_groups(np.array([10, 0, 600, 500, 1001,
+                                                    20]),
+                                          [0, 500, 1000])
+        self.assertEqual(groups[0].tolist(), [0, 1, 3, 5])
+        self.assertEqual(groups[500].tolist(), [2])
+        self.assertEqual(groups[1000].tolist(), [4])
+        
+        groups = _get_core_seconds_groups(np.array([10, 600, 1001]), [0])
+        self.assertEqual(groups[0].tolist(), [0, 1, 2])
+        
+        groups = _get_core_seconds_groups(np.array([10, 300, 600, 1001]),
+                                          [0, 500, 200, 0, 1000])
+        self.assertEqual(groups[0].tolist(), [0, 1, 2])
+        self.assertEqual(groups[500].tolist(), [])
+        self.assertEqual(groups[200].tolist(), [])
+        self.assertEqual(groups[1000].tolist(), [3])
+    
+    def test_get_job_values_grouped(self):
+        rt = ResultTrace()
+        rt._lists_submit["time_submit"] = [0, 2, 30, 100, 200, 300]
+        rt._lists_submit["time_start"] = [5, 2, 1000, 50, 290, 400]
+        rt._lists_submit["timelimit"] = [1, 2, 3, 4, 5, 3]
+        rt._lists_submit["cpus_alloc"] = [1, 1, 30, 40, 50, 4]
+        jobs_dic = rt.get_job_values_grouped_core_seconds([0, 500, 1000])
+        self.assertEqual(jobs_dic["time_submit"], {0:[0, 2], 500:[300],
+                                                   1000:[30, 100, 200]})
+        self.assertEqual(jobs_dic["time_start"], {0:[5, 2], 500:[400],
+                                                  1000:[1000, 50, 290]})
+    
     def test_transform_pbs_to_slurm(self):        
         pbs_list = {"account": ["account1", "account2"],
                     "cores_per_node": [24, 48],
@@ -867,6 +956,29 @@ class TestResultTrace(unittest.TestCase):
                                                   0])
         self.assertAlmostEqual((integrated_ut-corrected_ut)*7*144, 24)
         #self.assertAlmostEqual(integrated_ut, 0.523809, delta=0.001)
+    def test_utilization_engine_same_time_events(self):
+        engine = UtilizationEngine()
+        timestamps, values = engine.processUtilization(
+                                    [3000, 3000, 3002, 3004],
+                                    [0, 2, 2, 1],
+                                    [10, 20, 30, 40])
+        self.assertEqual(timestamps, [3000, 3000, 3000, 3002, 3002, 3004,
+                                      3004, 3005])
+        self.assertEqual(values,     [10,   0,    20,   0,    30,   0,
+                                      40,   0])
+        
+        engine = UtilizationEngine()
+        engine.processUtilization([3000, 3001, 3003], [5, 1, 1], [10, 20, 30],
+                                  doingPreload=True, endCut=3002)
+        self.assertEqual(engine.currentUse, 30)
+        timestamps, values = engine.processUtilization(
+                                    [3000, 3001, 3003], [5, 1, 1],
+                                    [10, 20, 30],
+                                    startCut=3002, endCut=3010,
+                                    preloadDone=True)
+        self.assertEqual(timestamps, [3002, 3002, 3003, 3004, 3005, 3010])
+        self.assertEqual(values,     [30,   10,   40,   10,   0,    0])
+    
     def test_utlization_sotre_load(self):
         rt = ResultTrace()
         self.addCleanup(self._del_table, "usage_values")
@@ -984,12 +1096,36 @@ class TestResultTrace(unittest.TestCase):
         self.assertEqual(core_h_per_min_values,
                          [11,9.5])
         
+        stamps, waiting_ch, core_h_per_min_stamps, core_h_per_min_values = (
+             rt.calculate_waiting_submitted_work(acc_period=1,
+                                                 sample_on_grid=True))
+        self.assertEqual(stamps, [2999, 3000, 3001, 3002, 3003, 3004])
+        self.assertEqual(waiting_ch, [11, 19, 15, 15, 8, 0])
+        self.assertEqual(core_h_per_min_stamps,
+                         [2999,3000])
+        self.assertEqual(core_h_per_min_values,
+                         [11,9.5])
+        
         
 
 class FakeWFExtractor():
     def get_waste_changes(self):
         return [3006, 3007, 3008], [12, 12, -24], 24
         
+class FakeChunksDBObj:
+    def __init__(self, rows):
+        self._rows = rows
+        self.chunk_sizes = []
+    def getValuesChunks(self, table, fields, condition="TRUE", orderBy=None,
+                        chunk_size=10000):
+        for i in range(0, len(self._rows), chunk_size):
+            self.chunk_sizes.append(len(self._rows[i:i+chunk_size]))
+            yield self._rows[i:i+chunk_size]
+    def insertValuesColumnsBulk(self, table, columns_dic, fixedFields={},
+                                chunk_size=5000, use_load_data=False):
+        self.inserted = (table, columns_dic, fixedFields)
+        return True
+        
 class FakeDBObj:
     def __init__(self, test_obj):
         self._test_obj = test_obj
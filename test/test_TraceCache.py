@@ -0,0 +1,76 @@
+"""UNIT TESTS for the local trace cache
+
+ python -m unittest test_TraceCache
+
+
+"""
+
+from stats.trace_cache import TraceCache
+
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class TestTraceCache(unittest.TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._cache_dir, True)
+
+    def test_put_get(self):
+        cache = TraceCache(self._cache_dir)
+        self.assertEqual(cache.get("traces-1", "f1"), None)
+        cache.put("traces-1", "f1", {"id_job":np.array([1, 2, 3]),
+                                     "job_name":np.array(["a", "bb", "c"],
+                                                         dtype=object)})
+        columns = cache.get("traces-1", "f1")
+        self.assertEqual(sorted(columns.keys()), ["id_job", "job_name"])
+        self.assertEqual(columns["id_job"].tolist(), [1, 2, 3])
+        self.assertEqual(columns["job_name"].tolist(), ["a", "bb", "c"])
+
+        self.assertEqual(cache.get("traces-1", "f2"), None)
+        cache.invalidate("traces-1")
+        self.assertEqual(cache.get("traces-1", "f1"), None)
+
+    def test_put_get_nulls(self):
+        cache = TraceCache(self._cache_dir)
+        cache.put("traces-1", "f1", {"account":np.array(["a", None, "c"],
+                                                        dtype=object),
+                                     "job_name":np.array(["None", "b", "c"],
+                                                         dtype=object)})
+        columns = cache.get("traces-1", "f1")
+        self.assertEqual(columns["account"].tolist(), ["a", None, "c"])
+        self.assertEqual(columns["job_name"].tolist(), ["None", "b", "c"])
+
+    def test_incomplete_entry(self):
+        cache = TraceCache(self._cache_dir)
+        cache.put("traces-1", "f1", {"id_job":np.array([1, 2, 3]),
+                                     "time_start":np.array([4, 5, 6])})
+        os.remove(os.path.join(self._cache_dir, "traces-1",
+                               "time_start.npy"))
+        self.assertEqual(cache.get("traces-1", "f1"), None)
+        cache.invalidate("traces-1")
+        cache.invalidate("traces-2")
+        self.assertEqual(os.listdir(self._cache_dir), [])
+
+    def test_evict(self):
+        cache = TraceCache(self._cache_dir, max_size_bytes=20000)
+        for trace_id in range(3):
+            cache.put("traces-{0}".format(trace_id), "f",
+                      {"id_job":np.arange(1000)})
+            past = time.time()-100+trace_id
+            os.utime(os.path.join(self._cache_dir,
+                                  "traces-{0}".format(trace_id)),
+                     (past, past))
+        self.assertEqual(cache.get("traces-0", "f"), None)
+        self.assertNotEqual(cache.get("traces-1", "f"), None)
+        self.assertNotEqual(cache.get("traces-2", "f"), None)
+
+        past = time.time()-200
+        os.utime(os.path.join(self._cache_dir, "traces-1"), (past, past))
+        cache.put("traces-3", "f", {"id_job":np.arange(1000)})
+        self.assertEqual(sorted(os.listdir(self._cache_dir)),
+                         ["traces-2", "traces-3"])
@@ -843,7 +843,37 @@ class TestWorkflowTracker(unittest.TestCase):
         self.assertEqual(wt._start_task,t0)
         self.assertEqual(wt._critical_path, [t0,t6])
         self.assertEqual(wt._critical_path_runtime, 70)
-    
+
+    def test_get_critical_path_waiting_branch(self):
+        job_list={"job_name":["wf_manifest-2_S0",
+                              "wf_manifest-2_S1_dS0", "wf_manifest-2_S2_dS0"],
+                  "id_job":     [ 0,  1,  2],
+                  "time_start": [ 0, 10, 18],
+                  "time_end":   [10, 20, 25]}
+        wt = WorkflowTracker("manifest")
+        for i in range(3):
+            wt.register_task(job_list,i)
+        wt.fill_deps()
+        self.assertEqual(wt._critical_path, [wt._tasks["S0"],
+                                             wt._tasks["S2"]])
+        self.assertEqual(wt._critical_path_runtime, 25)
+
+    def test_get_critical_path_long_chain(self):
+        num_tasks=5000
+        job_list={"job_name":["wf_manifest-2_S0"]+
+                              ["wf_manifest-2_S{0}_dS{1}".format(i, i-1)
+                               for i in range(1, num_tasks)],
+                  "id_job":     list(range(num_tasks)),
+                  "time_start": list(range(0, 2*num_tasks, 2)),
+                  "time_end":   list(range(1, 2*num_tasks, 2))}
+        wt = WorkflowTracker("manifest")
+        for i in range(num_tasks):
+            wt.register_task(job_list,i)
+        wt.fill_deps()
+        self.assertEqual(len(wt._critical_path), num_tasks)
+        self.assertEqual(wt._critical_path_runtime, 2*num_tasks-1)
+        self.assertFalse(wt._incomplete_workflow)
+
     def test_get_waste_changes(self):
         job_list={"job_name":["wf_manifestSim.json"],
                   "id_job":     [ 2 ],
@@ -921,4 +951,12 @@ class Test_apply_deltas_usage(unittest.TestCase):
         self.assertEqual(stamps_list, [50, 100, 200, 300, 301])
         self.assertEqual(usage_list,  [-10, 10,  10,  30, 40 ])
         
+        stamps_list, usage_list  = _apply_deltas_usage([100, 200, 300],
+                                                       [20, 20, 40],
+                                                       [150, 200, 250, 350],
+                                                       [5, 5, 5, -15],
+                                                       neg=True)
+        self.assertEqual(stamps_list, [100, 150, 200, 250, 300, 350])
+        self.assertEqual(usage_list,  [20,  15,  10,  5,   25,  40])
+        
        
\ No newline at end of file
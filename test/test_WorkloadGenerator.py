@@ -5,7 +5,7 @@
 """
 
 from datetime import datetime as da
-from generate import WorkloadGenerator
+from generate import WorkloadGenerator, TimeController
 from generate.pattern import WorkflowGenerator, MultiAlarmTimer
 from machines import Edison
 from slurm.trace_gen import TraceGenerator
@@ -57,7 +57,7 @@ class TestWorkloadGenerator(unittest.TestCase):
                                      ["account1"])
         wg2.generate_trace(datetime.datetime(2015,1,1),
                            1000, 1000)
-        self.assertEqual(tg1._job_list, tg2._job_list)
+        self.assertEqual(tg1.get_trace_bytes(), tg2.get_trace_bytes())
         
         random_control.set_global_random_gen("BBB")
         
@@ -70,9 +70,40 @@ class TestWorkloadGenerator(unittest.TestCase):
                                      ["account1"])
         wg3.generate_trace(datetime.datetime(2015,1,1),
                            1000, 1000)
-        self.assertNotEqual(tg3._job_list, tg2._job_list)
+        self.assertNotEqual(tg3.get_trace_bytes(), tg2.get_trace_bytes())
         
         
+    def test_reproduce_random_streams(self):
+        self.addCleanup(random_control.set_global_random_streams, None)
+        job_lists = []
+        for batch_size in [None, 7, 100]:
+            random_control.set_global_random_streams("AAAAA")
+            tg = TraceGenerator()
+            wg = WorkloadGenerator(FakeEdison(),
+                                   tg,
+                                   ["user1", "user2", "user3"],
+                                   ["qos1", "qos2"],
+                                   ["partition1"],
+                                   ["account1"])
+            wg.set_job_details_batch_size(batch_size)
+            wg.generate_trace(datetime.datetime(2015,1,1),
+                               1000, 50)
+            job_lists.append(tg.get_trace_bytes())
+        self.assertEqual(job_lists[0], job_lists[1])
+        self.assertEqual(job_lists[0], job_lists[2])
+        
+        random_control.set_global_random_streams("BBB")
+        tg = TraceGenerator()
+        wg = WorkloadGenerator(FakeEdison(),
+                               tg,
+                               ["user1", "user2", "user3"],
+                               ["qos1", "qos2"],
+                               ["partition1"],
+                               ["account1"])
+        wg.generate_trace(datetime.datetime(2015,1,1),
+                          1000, 50)
+        self.assertNotEqual(tg.get_trace_bytes(), job_lists[0])
+        
     def test_init(self):
         self.assertEqual(self._tg, self._wg._trace_generator)
         self.assertEqual(self._machine, self._wg._machine)
@@ -103,6 +134,21 @@ class TestWorkloadGenerator(unittest.TestCase):
                                 job_limit=5)
         self.assertEqual(self._tg._add_job_calls, 5)
         
+    def test_generate_trace_batch(self):
+        run_limit=100000
+        self._tg._long_test=True
+        self._wg.set_job_details_batch_size(10)
+        self._wg.generate_trace(datetime.datetime(2015,0o1,0o1), run_limit,
+                                job_limit=25)
+        self.assertEqual(self._tg._add_job_calls, 25)
+        self.assertEqual(len(self._wg._job_details_buffer), 5)
+        
+    def test_generate_new_job_batch(self):
+        self._wg._job_id_counter = 10
+        self._wg.set_job_details_batch_size(10)
+        self._wg._generate_new_job(10001)
+        self.assertEqual(len(self._wg._job_details_buffer), 9)
+    
     def test_share_wf_gen(self):
         tg=FakeTraceGenWF(self)
         machine=FakeEdison()
@@ -178,7 +224,23 @@ class TestWorkloadGenerator(unittest.TestCase):
         self.assertGreater(tg._job_count,10)
         
         self.assertEqual(len(wg._pattern_timers),1, "Purging does not work")
-    
+
+    def test_timers_only_called_when_due(self):
+        start = TimeController.get_epoch(datetime.datetime(2015,1,1))
+        alarm = FakeCountingTimer(None, register_timestamp=start)
+        alarm.set_alarm_list([start+10, start+10, start+50])
+        polled = FakeCountingTimer(None, register_timestamp=start)
+        polled.set_alarm_list([start+50])
+        polled.get_next_trigger_time = lambda: None
+        self._wg.register_pattern_generator_timer(alarm)
+        self._wg.register_pattern_generator_timer(polled)
+
+        for timestamp in range(start, start+100):
+            self._wg._pattern_generator_timers_trigger(timestamp)
+        self.assertEqual(alarm._calls, [start+10, start+50])
+        self.assertEqual(polled._calls, list(range(start, start+51)))
+        self.assertEqual(self._wg._pattern_timers, [])
+
     def test_save_trace(self):
         self._wg.save_trace("route")
         self.assertEqual(self._tg._dump_trace_calls,1)
@@ -316,6 +378,15 @@ class FakeTraceGenWFSimple(FakeTraceGenWF):
         
         
 
+class FakeCountingTimer(MultiAlarmTimer):
+    def __init__(self, *args, **kwargs):
+        super(FakeCountingTimer, self).__init__(*args, **kwargs)
+        self._calls = []
+
+    def do_trigger(self, create_time):
+        self._calls.append(create_time)
+        return self.is_it_time(create_time)
+
 class FakeEdison(Edison):
     def __init__(self):
         super(FakeEdison,self).__init__()
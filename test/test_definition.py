@@ -135,6 +135,29 @@ class TestExperimentDefinition(unittest.TestCase):
         
         
     
+    def test_load_many(self):
+        ed = ExperimentDefinition()
+        self.addCleanup(self._del_table, "experiment")
+        ed.create_table(self._db)
+        trace_id_1 = ExperimentDefinition(seed="seed1",
+                                          subtraces=[1, 2]).store(self._db)
+        trace_id_2 = ExperimentDefinition(seed="seed2",
+                                          work_state="analysis_done"
+                                          ).store(self._db)
+        
+        exps = ExperimentDefinition.load_many(self._db, [trace_id_2,
+                                                         trace_id_1,
+                                                         trace_id_2])
+        self.assertEqual(sorted(exps.keys()), [trace_id_1, trace_id_2])
+        self.assertEqual(exps[trace_id_1]._trace_id, trace_id_1)
+        self.assertEqual(exps[trace_id_1]._seed, "seed1")
+        self.assertEqual(exps[trace_id_1]._subtraces, [1, 2])
+        self.assertFalse(exps[trace_id_1].is_analysis_done())
+        self.assertEqual(exps[trace_id_2]._seed, "seed2")
+        self.assertTrue(exps[trace_id_2].is_analysis_done())
+        self.assertRaises(ValueError, ExperimentDefinition.load_many,
+                          self._db, [trace_id_1, trace_id_2+1])
+        
     def test_get_file_names(self):
         ed = ExperimentDefinition(
                  seed="seeeed",
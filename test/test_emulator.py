@@ -0,0 +1,156 @@
+""" Unittests for the in-process scheduler emulator.
+
+ python -m unittest test_emulator
+"""
+
+from slurm.emulator import (SchedulerEmulator, JOB_COMPLETE, JOB_PENDING,
+                            JOB_RUNNING, JOB_TIMEOUT)
+from slurm.trace_gen import TraceGenerator
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestSchedulerEmulator(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._dir, True)
+        self._trace_file = os.path.join(self._dir, "test.trace")
+        self._tg = TraceGenerator()
+
+    def _add_job(self, job_id, submit, duration, wclimit, cores,
+                 dependency="", workflow_manifest=None):
+        self._tg.add_job(job_id, "user{0}".format(job_id%2), submit,
+                         duration, wclimit, cores, 1, 24, "qos1",
+                         "partition1", "account1", dependency=dependency,
+                         workflow_manifest=workflow_manifest)
+
+    def _emulate(self, end_time=None, workflow_handling="single",
+                 num_nodes=4, backfill_interval=0):
+        self._tg.dump_trace(self._trace_file)
+        emulator = SchedulerEmulator(num_nodes, 24,
+                                     workflow_handling=workflow_handling,
+                                     backfill_interval=backfill_interval)
+        return emulator.run_trace_file(self._trace_file, end_time=end_time)
+
+    def _get_job(self, result_trace, job_id):
+        columns = result_trace._lists_submit
+        pos = list(columns["id_job"]).index(job_id)
+        return dict([(key, values[pos]) for (key, values) in columns.items()])
+
+    def test_fcfs(self):
+        # Job 3 uses the node that job 2 does not need when job 1 ends.
+        self._add_job(1, 100, 100, 2, 48)
+        self._add_job(2, 110, 100, 2, 72)
+        self._add_job(3, 120, 100, 2, 24)
+        self._add_job(4, 120, 200, 4, 25)
+        rt = self._emulate()
+        self.assertEqual(list(rt._lists_submit["id_job"]), [1, 2, 3, 4])
+        self.assertEqual(list(rt._lists_submit["time_start"]),
+                         [100, 200, 120, 300])
+        self.assertEqual(list(rt._lists_submit["time_end"]),
+                         [200, 300, 220, 500])
+        self.assertEqual(list(rt._lists_submit["nodes_alloc"]),
+                         [2, 3, 1, 2])
+        self.assertEqual(list(rt._lists_submit["cpus_alloc"]),
+                         [48, 72, 24, 48])
+        self.assertEqual(list(rt._lists_submit["cpus_req"]),
+                         [48, 72, 24, 25])
+        self.assertEqual(list(rt._lists_submit["id_user"]),
+                         [1024, 1025, 1024, 1025])
+        self.assertEqual(list(rt._lists_submit["state"]), [JOB_COMPLETE]*4)
+        self.assertEqual(list(rt._lists_submit["job_name"]), ["sim_job"]*4)
+
+    def test_easy_backfill(self):
+        # Job 2 waits for job 1 (reservation at 1000 by its wclimit). Job 3
+        # ends before 1000 and is backfilled. Job 4 would delay job 2.
+        self._add_job(1, 100, 800, 15, 72)
+        self._add_job(2, 110, 100, 2, 96)
+        self._add_job(3, 120, 600, 10, 24)
+        self._add_job(4, 130, 600, 20, 24)
+        rt = self._emulate()
+        self.assertEqual(self._get_job(rt, 3)["time_start"], 120)
+        self.assertEqual(self._get_job(rt, 2)["time_start"], 900)
+        self.assertEqual(self._get_job(rt, 4)["time_start"], 1000)
+
+        # Backfilling passes at 110 (nothing to backfill) and 140.
+        rt = self._emulate(backfill_interval=30)
+        self.assertEqual(self._get_job(rt, 3)["time_start"], 140)
+        self.assertEqual(self._get_job(rt, 2)["time_start"], 900)
+
+    def test_time_limit_and_end_time(self):
+        self._add_job(1, 100, 1000, 1, 24)
+        self._add_job(2, 100, 1000, 20, 96)
+        self._add_job(3, 150, 100, 20, 96)
+        rt = self._emulate(end_time=500)
+        job = self._get_job(rt, 1)
+        self.assertEqual((job["time_start"], job["time_end"], job["state"]),
+                         (100, 220, JOB_TIMEOUT))
+        job = self._get_job(rt, 2)
+        self.assertEqual((job["time_start"], job["time_end"], job["state"]),
+                         (220, 0, JOB_RUNNING))
+        job = self._get_job(rt, 3)
+        self.assertEqual((job["time_start"], job["time_end"], job["state"]),
+                         (0, 0, JOB_PENDING))
+
+    def test_dependencies(self):
+        self._add_job(1, 100, 100, 2, 24,
+                      workflow_manifest="|wf_manifest-1_S0")
+        self._add_job(2, 100, 50, 2, 24, dependency="afterok:1",
+                      workflow_manifest="|wf_manifest-1_S1_dS0")
+        self._add_job(3, 100, 80, 2, 24, dependency="afterok:1",
+                      workflow_manifest="|wf_manifest-1_S2_dS0")
+        self._add_job(4, 100, 10, 2, 24,
+                      dependency="afterok:2,afterok:3",
+                      workflow_manifest="|wf_manifest-1_S3_dS1-dS2")
+        rt = self._emulate()
+        self.assertEqual(list(rt._lists_submit["time_start"]),
+                         [100, 200, 200, 280])
+        self.assertEqual(list(rt._lists_submit["job_name"]),
+                         ["wf_manifest-1_S0", "wf_manifest-1_S1_dS0",
+                          "wf_manifest-1_S2_dS0", "wf_manifest-1_S3_dS1-dS2"])
+        workflows = rt.do_workflow_pre_processing()
+        self.assertEqual(workflows["manifest-1"].get_runtime(), 190)
+
+    def test_workflow_aware(self):
+        self._add_job(1, 100, 50, 2, 24)
+        self._add_job(2, 100, 220, 16, 144,
+                      workflow_manifest="manifestSim.json-1")
+        rt = self._emulate(workflow_handling="manifest", num_nodes=6)
+        self.assertEqual(list(rt._lists_submit["job_name"]),
+                         ["sim_job", "wf_manifestSim.json-1",
+                          "wf_manifestSim.json-1_S0",
+                          "wf_manifestSim.json-1_S1_dS0"])
+        self.assertEqual(list(rt._lists_submit["id_job"]), [1, 2, 3, 4])
+        self.assertEqual(list(rt._lists_submit["time_start"]),
+                         [100, 150, 150, 270])
+        self.assertEqual(list(rt._lists_submit["time_end"]),
+                         [150, 150, 270, 370])
+        self.assertEqual(list(rt._lists_submit["cpus_req"]),
+                         [24, 144, 112, 144])
+        workflows = rt.do_workflow_pre_processing()
+        wf = workflows["manifestSim.json-1"]
+        self.assertEqual(wf.get_waittime(), 50)
+        self.assertEqual(wf.get_runtime(), 220)
+
+        self._tg = TraceGenerator()
+        self._add_job(2, 100, 220, 16, 144,
+                      workflow_manifest="manifestSim.json-1")
+        rt = self._emulate(workflow_handling="single", num_nodes=6)
+        self.assertEqual(list(rt._lists_submit["job_name"]),
+                         ["wf_manifestSim.json-1"])
+        self.assertEqual(list(rt._lists_submit["time_end"]), [320])
+
+    def test_results(self):
+        for i in range(20):
+            self._add_job(i+1, 100+i*10, 300+i, 10, 24*(1+i%4))
+        rt = self._emulate()
+        (runtime, waittime, turnaround, timelimit, cores_alloc,
+         slowdown) = rt._get_job_times()
+        self.assertEqual(len(waittime), 20)
+        self.assertEqual(runtime, [300+i for i in range(20)])
+        (integrated_ut, utilization_timestamps, utilization_values,
+         acc_waste, corrected_ut) = rt.calculate_utilization(96)
+        self.assertLessEqual(max(utilization_values), 96)
@@ -132,6 +132,13 @@ class TestJobAnalysis(unittest.TestCase):
         data_dic = get_jobs_data_trace('tmp.trace', 
                                        "../bin/list_trace")
         
+        self.assertEqual(data_dic["duration"], [102])
+        self.assertEqual(data_dic["totalcores"], [253])
+        self.assertEqual(data_dic["wallclock_requested"], [101])
+        self.assertEqual(data_dic["created"], [1034])
+        
+        data_dic = get_jobs_data_trace('tmp.trace')
+        
         self.assertEqual(data_dic["duration"], [102])
         self.assertEqual(data_dic["totalcores"], [253])
         self.assertEqual(data_dic["wallclock_requested"], [101])
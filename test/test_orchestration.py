@@ -7,20 +7,23 @@
 """
 
 import datetime
+import multiprocessing
 import os
+import threading
+import time
 import unittest
 
 from commonLib.DBManager import DB
 from commonLib.nerscUtilization import UtilizationEngine
 from orchestration import AnalysisWorker
 from orchestration import ExperimentWorker
-from orchestration import get_central_db, get_sim_db
+from orchestration import get_central_db, get_sim_db, get_worker_hosts
 from orchestration.analyzing import AnalysisRunnerSingle
 from orchestration.definition import (ExperimentDefinition,
                                        DeltaExperimentDefinition,
                                        GroupExperimentDefinition)
 from orchestration.definition import ExperimentDefinition
-from orchestration.running import ExperimentRunner
+from orchestration.running import ExperimentRunner, LocalExperimentRunner
 from stats import Histogram, NumericStats, NumericList
 from stats.compare import WorkflowDeltas
 from stats.trace import ResultTrace
@@ -191,6 +194,32 @@ class TestOrchestration(unittest.TestCase):
         self._check_results_are_there(db_obj, exp, True, 
                                       ["manifestsim.json"])
     
+    def test_do_work_hosts_local(self):
+        db_obj = self._db
+        exp_list = []
+        for seed in ["AAAAA", "BBBBB", "CCCCC"]:
+            exp = ExperimentDefinition(
+                     seed=seed,
+                     machine="edison",
+                     trace_type="single",
+                     manifest_list=[],
+                     workflow_policy="no",
+                     workflow_period_s=0,
+                     workflow_handling="single",
+                     preload_time_s = 0,
+                     workload_duration_s=3600*1)
+            self.addCleanup(self._del_exp, exp, db_obj)
+            exp.store(db_obj)
+            exp_list.append(exp)
+        
+        ew = ExperimentWorker()
+        ew.do_work_hosts(db_obj, ["local1", "local2"],
+                         get_sched_db=lambda hostname: None,
+                         runner_class=LocalExperimentRunner)
+        
+        for exp in exp_list:
+            self._check_trace_is_there(db_obj, exp)
+    
     def _check_trace_is_there(self, db_obj, exp): 
         trace_id=exp._trace_id
         new_ew = ExperimentDefinition()
@@ -334,4 +363,111 @@ class TestOrchestration(unittest.TestCase):
         aw.do_work_grouped(self._db)
         self._check_results_are_there(self._db, exp3, wf=True, 
                                       manifest_list=["manifestsim.json"])   
-            
\ No newline at end of file
+            
+
+_pending_experiments = multiprocessing.Value("i", 0)
+
+def _fake_work(db_obj, max_experiments=None, stop_event=None):
+    count = 0
+    while count < max_experiments and not stop_event.is_set():
+        with _pending_experiments.get_lock():
+            if _pending_experiments.value == 0:
+                return False
+            _pending_experiments.value -= 1
+        count += 1
+    return True
+
+def _failing_work(db_obj, max_experiments=None, stop_event=None):
+    raise SystemError("Database is down")
+
+class FakeRunner(object):
+    """Stands in for ExperimentRunner in ExperimentWorker.do_work_hosts."""
+    runs = []
+    lock = threading.Lock()
+    def __init__(self, definition, run_hostname=None):
+        self._definition = definition
+        self._run_hostname = run_hostname
+    def do_full_run(self, scheduler_db_obj, store_db_obj):
+        if self._run_hostname == "broken":
+            raise SystemError("Failed comms")
+        time.sleep(0.2)
+        with FakeRunner.lock:
+            FakeRunner.runs.append((self._definition._trace_id,
+                                    self._run_hostname))
+        return True
+
+class FakeExperimentWorker(ExperimentWorker):
+    def __init__(self, num_experiments):
+        self._pending = list(range(num_experiments))
+        self._lock = threading.Lock()
+    def _load_fresh(self, central_db_obj):
+        with self._lock:
+            if not self._pending:
+                return None
+            ed = FakeExperiment()
+            ed._trace_id = self._pending.pop(0)
+            return ed
+
+class FakeExperiment(object):
+    def __init__(self):
+        self._trace_id = 1
+        self.failed = False
+        self._name = "fake"
+    def mark_analysis_error(self, db_obj):
+        self.failed = True
+    def mark_simulation_failed(self, db_obj):
+        self.failed = True
+
+class TestAnalysisWorkerParallel(unittest.TestCase):
+    def test_do_work_parallel(self):
+        _pending_experiments.value = 25
+        AnalysisWorker().do_work_parallel(_fake_work, None, 3,
+                                          max_experiments_per_process=4)
+        self.assertEqual(_pending_experiments.value, 0)
+    
+    def test_do_work_parallel_failing_processes(self):
+        self.assertFalse(AnalysisWorker().do_work_parallel(
+                                _failing_work, None, 3, max_failed_exits=4))
+    
+    def test_run_isolated(self):
+        def bad_analysis(db_obj):
+            raise ValueError("Bad trace")
+        ed = FakeExperiment()
+        aw = AnalysisWorker()
+        self.assertTrue(aw._run_isolated(None, ed, lambda db_obj: None))
+        self.assertFalse(ed.failed)
+        self.assertFalse(aw._run_isolated(None, ed, bad_analysis))
+        self.assertTrue(ed.failed)
+
+class TestExperimentWorkerHosts(unittest.TestCase):
+    def setUp(self):
+        FakeRunner.runs = []
+    
+    def test_do_work_hosts(self):
+        ew = FakeExperimentWorker(9)
+        start = time.time()
+        ew.do_work_hosts(None, ["host1", "host2", "host3"],
+                         get_sched_db=lambda hostname: None,
+                         runner_class=FakeRunner)
+        self.assertLess(time.time()-start, 9*0.2)
+        self.assertEqual(sorted([x[0] for x in FakeRunner.runs]),
+                         list(range(9)))
+        self.assertEqual(set([x[1] for x in FakeRunner.runs]),
+                         set(["host1", "host2", "host3"]))
+    
+    def test_do_work_hosts_broken_host(self):
+        ew = FakeExperimentWorker(4)
+        ew.do_work_hosts(None, ["broken", "host1"],
+                         get_sched_db=lambda hostname: None,
+                         runner_class=FakeRunner)
+        self.assertEqual(len(FakeRunner.runs), 3)
+        self.assertEqual(set([x[1] for x in FakeRunner.runs]),
+                         set(["host1"]))
+    
+    def test_get_worker_hosts(self):
+        file_name = "tmp/hosts.list.test"
+        self.addCleanup(os.remove, file_name)
+        with open(file_name, "w") as f:
+            f.write("192.168.56.24\n!192.168.56.25\n\n 192.168.56.26 \n")
+        self.assertEqual(get_worker_hosts(file_name),
+                         ["192.168.56.24", "192.168.56.26"])
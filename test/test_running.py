@@ -12,11 +12,19 @@ from commonLib.filemanager import ensureDir
 from generate import TimeController
 from machines import Edison2015
 from orchestration.definition import ExperimentDefinition
-from orchestration.running import ExperimentRunner
+from orchestration.running import ExperimentRunner, LocalExperimentRunner
 import slurm.trace_gen as trace_gen
 from stats.trace import ResultTrace
 
 
+class FailingStoreDB(object):
+    """Stands in for a database where bulk inserts fail."""
+    def getValuesChunks(self, *args, **kwargs):
+        return iter([])
+    def insertValuesColumnsBulk(self, *args, **kwargs):
+        return False
+
+
 class TestExperimentRunner(unittest.TestCase):
     def setUp(self):
         self._db  = DB(os.getenv("TEST_DB_HOST", "127.0.0.1"),
@@ -468,6 +476,47 @@ class TestExperimentRunner(unittest.TestCase):
                  workload_duration_s = 41)
         er = ExperimentRunner(ed)
         self.assertRaises(SystemError, er.is_it_running, "python")
+    
+    def test_local_runner(self):
+        ExperimentRunner.configure(trace_folder="tmp/hosts",
+                                   trace_generation_folder="tmp",
+                                   local=True,
+                                   run_hostname="myhost",
+                                   drain_time=0,
+                                   max_poll_time=300)
+        self.assertEqual(ExperimentRunner.get_max_poll_time(), 300)
+        ed = ExperimentDefinition(
+                 seed="seeeed",
+                 machine="edison",
+                 trace_type="single",
+                 manifest_list=[],
+                 workflow_policy="no",
+                 workflow_period_s=0,
+                 workflow_handling="single",
+                 preload_time_s = 0,
+                 start_date = datetime(2016,1,1),
+                 workload_duration_s = 3600)
+        er = LocalExperimentRunner(ed, run_hostname="local1")
+        er._refresh_machine()
+        er.create_trace_file()
+        trace_route = os.path.join("tmp/hosts/local1",
+                                   ed.get_trace_file_name())
+        self.assertTrue(os.path.exists(trace_route))
+        self.assertEqual(er.get_result_trace(), None)
+        
+        er.do_simulation()
+        er._sim_process.wait()
+        self.assertTrue(er.is_simulation_done())
+        result_trace = er.get_result_trace()
+        self.assertGreater(len(result_trace._lists_submit["id_job"]), 0)
+        self.assertGreaterEqual(result_trace._lists_submit["time_submit"][-1],
+                                ed.get_end_epoch()-600)
+        
+        self.assertFalse(er.check_trace_and_store(None, FailingStoreDB()))
+        
+        er.clean_trace_file()
+        self.assertFalse(os.path.exists(trace_route))
+        self.assertEqual(er.get_result_trace(), None)
         
     def test_run_simulation(self):
         ExperimentRunner.configure(trace_folder="/tmp/",
@@ -3,6 +3,7 @@
  python -m unittest test_trace_gen
 """
 
+import os
 import unittest
 import slurm.trace_gen as trace_gen
 
@@ -158,6 +159,192 @@ class TestTraceGen(unittest.TestCase):
         self.assertEqual(read_record["RES"], "thereservation2");
         self.assertEqual(read_record["DEP"], "thedependency2");
         
+    def test_job_trace_dtype(self):
+        self.assertEqual(trace_gen.JOB_TRACE_DTYPE.itemsize,
+                         len(trace_gen.get_job_trace(1, "name", 1034, 102, 101,
+                                                     23, 11, 2, "theqos",
+                                                     "thepartition",
+                                                     "theaccount")))
+        self.assertEqual(trace_gen.JOB_TRACE_WF_DTYPE.itemsize,
+                         len(trace_gen.get_job_trace(1, "name", 1034, 102, 101,
+                                                     23, 11, 2, "theqos",
+                                                     "thepartition",
+                                                     "theaccount",
+                                                 workflow_manifest="m.json")))
+    
+    def test_dump_trace_binary(self):
+        jobs = [dict(job_id=1, username="name", submit_time=1034,
+                     duration=102, wclimit=101, tasks=23, cpus_per_task=11,
+                     tasks_per_node=2, qosname="theqos",
+                     partition="thepartition", account="theaccount",
+                     reservation="thereservation", dependency="thedependency"),
+                dict(job_id=2, username="name2", submit_time=10342,
+                     duration=1022, wclimit=1012, tasks=232, cpus_per_task=112,
+                     tasks_per_node=22, qosname="theqos2",
+                     partition="thepartition2", account="theaccount2",
+                     reservation="", dependency="afterok:1",
+                     workflow_manifest="|"),
+                dict(job_id=3, username="name", submit_time=10343,
+                     duration=1023, wclimit=1013, tasks=24, cpus_per_task=1,
+                     tasks_per_node=24, qosname="theqos",
+                     partition="thepartition", account="theaccount",
+                     reservation="", dependency="",
+                     workflow_manifest="manifest.json-3"),
+                dict(job_id=4, username="name3", submit_time=10344,
+                     duration=1024, wclimit=1014, tasks=48, cpus_per_task=1,
+                     tasks_per_node=24, qosname="theqos",
+                     partition="thepartition", account="theaccount")]
+        generator = trace_gen.TraceGenerator()
+        generator._job_store = trace_gen.JobTraceStore(chunk_size=3)
+        expected_trace = b""
+        for job in jobs:
+            generator.add_job(**job)
+            expected_trace += trace_gen.get_job_trace(**job)
+        self.assertEqual(generator.get_job_count(), 4)
+        self.assertEqual(generator.get_trace_bytes(), expected_trace)
+        generator.dump_trace("tmp.trace")
+        f = open("tmp.trace", "rb")
+        self.assertEqual(f.read(), expected_trace)
+        f.close()
+        
+        generator.free_mem()
+        self.assertEqual(generator.get_job_count(), 0)
+        self.assertEqual(generator.get_trace_bytes(), b"")
+        
+    def test_dump_trace_stream(self):
+        generator = trace_gen.TraceGenerator()
+        generator._job_store = trace_gen.JobTraceStore(chunk_size=2)
+        generator.set_stream_file("tmp_stream.trace")
+        expected_trace = b""
+        for job_id in range(1,6):
+            job = dict(job_id=job_id, username="name{0}".format(job_id%2),
+                       submit_time=1000+job_id, duration=100, wclimit=2,
+                       tasks=24, cpus_per_task=1, tasks_per_node=24,
+                       qosname="theqos", partition="thepartition",
+                       account="theaccount", workflow_manifest="|")
+            generator.add_job(**job)
+            expected_trace += trace_gen.get_job_trace(**job)
+            self.assertEqual(len(generator._job_store._chunks), job_id%2)
+        self.assertEqual(os.path.getsize("tmp_stream.trace"),
+                         4*trace_gen.JOB_TRACE_WF_DTYPE.itemsize)
+        self.assertEqual(generator.get_job_count(), 5)
+        self.assertRaises(ValueError, generator.set_stream_file,
+                          "tmp_stream.trace")
+        
+        generator.dump_trace("tmp.trace")
+        self.assertFalse(os.path.exists("tmp_stream.trace"))
+        f = open("tmp.trace", "rb")
+        self.assertEqual(f.read(), expected_trace)
+        f.close()
+        generator.close_stream_file()
+        self.assertTrue(os.path.exists("tmp.trace"))
+    
+    def test_close_stream_file(self):
+        generator = trace_gen.TraceGenerator()
+        generator.set_stream_file("tmp_stream.trace")
+        generator.add_job(1, "name", 1000, 100, 2, 24, 1, 24, "theqos",
+                          "thepartition", "theaccount")
+        generator.close_stream_file()
+        self.assertTrue(generator._stream_file is None)
+        self.assertFalse(os.path.exists("tmp_stream.trace"))
+        generator.close_stream_file()
+        
+    def test_read_trace(self):
+        generator = trace_gen.TraceGenerator()
+        for (job_id, manifest) in [(1, None), (2, "|"), (3, "|"),
+                                   (4, "manifest.json-1"), (5, None)]:
+            generator.add_job(job_id=job_id, username="name",
+                              submit_time=1000+job_id, duration=100+job_id,
+                              wclimit=10, tasks=24, cpus_per_task=2,
+                              tasks_per_node=12, qosname="theqos",
+                              partition="thepartition", account="theaccount",
+                              dependency="dep{0}".format(job_id),
+                              workflow_manifest=manifest)
+        generator.dump_trace("tmp.trace")
+        runs = list(trace_gen.iter_trace_records("tmp.trace"))
+        self.assertEqual([len(x) for x in runs], [1, 3, 1])
+        self.assertEqual(runs[1].dtype, trace_gen.JOB_TRACE_WF_DTYPE)
+        
+        columns = trace_gen.read_trace("tmp.trace")
+        self.assertEqual(list(columns["job_id"]), [1, 2, 3, 4, 5])
+        self.assertEqual(list(columns["submit"]),
+                         [1001, 1002, 1003, 1004, 1005])
+        self.assertEqual(list(columns["duration"]), [101, 102, 103, 104, 105])
+        self.assertEqual(list(columns["tasks"]), [24]*5)
+        self.assertEqual(list(columns["cpus_per_task"]), [2]*5)
+        self.assertEqual(list(columns["tasks_per_node"]), [12]*5)
+        self.assertEqual(list(columns["username"]), [b"name"]*5)
+        self.assertEqual(list(columns["dependency"]),
+                         [b"dep1", b"dep2", b"dep3", b"dep4", b"dep5"])
+        self.assertEqual(list(columns["manifest_filename"]),
+                         [b"", b"|", b"|", b"manifest.json-1", b""])
+        
+        columns = trace_gen.read_trace("tmp.trace", fields=["job_id"])
+        self.assertEqual(list(columns.keys()), ["job_id"])
+    
+    def test_read_trace_single_layout(self):
+        for manifest in [None, "|"]:
+            generator = trace_gen.TraceGenerator()
+            for job_id in range(10):
+                generator.add_job(job_id=job_id, username="name",
+                                  submit_time=1000+job_id, duration=100,
+                                  wclimit=10, tasks=24, cpus_per_task=1,
+                                  tasks_per_node=24, qosname="theqos",
+                                  partition="thepartition",
+                                  account="theaccount",
+                                  workflow_manifest=manifest)
+            generator.dump_trace("tmp.trace")
+            runs = list(trace_gen.iter_trace_records("tmp.trace"))
+            self.assertEqual(len(runs), 1)
+            self.assertEqual(list(runs[0]["job_id"]), list(range(10)))
+        
+        f = open("tmp.trace", "ab")
+        f.write(b"0"*16)
+        f.close()
+        self.assertRaises(ValueError, trace_gen.read_trace, "tmp.trace")
+        
+        open("tmp.trace", "w").close()
+        self.assertEqual(len(trace_gen.read_trace("tmp.trace")["job_id"]), 0)
+    
+    def test_extract_records_native(self):
+        record=trace_gen.get_job_trace(job_id=1, username="name",
+                                       submit_time=1034, 
+                                       duration=102,
+                                       wclimit=101,
+                                       tasks = 23,
+                                       cpus_per_task= 11,
+                                       tasks_per_node= 2, 
+                                       qosname="theqos",
+                                       partition="thepartition",
+                                       account="theaccount",
+                                       reservation="thereservation",
+                                       dependency="thedependency",
+                                       workflow_manifest="my_manifest.json")
+        f = open('tmp.trace', 'bw')
+        f.write(record)
+        f.close()
+        
+        records=trace_gen.extract_records(file_name="tmp.trace",
+                                          list_trace_location=None)
+        self.assertEqual(len(records), 1)
+        read_record=records[0]
+        
+        self.assertEqual(read_record["JOBID"], "1");
+        self.assertEqual(read_record["USERNAME"], "name");
+        self.assertEqual(read_record["PARTITION"], "thepartition");
+        self.assertEqual(read_record["ACCOUNT"], "theaccount");
+        self.assertEqual(read_record["QOS"], "theqos");
+        self.assertEqual(read_record["SUBMIT"], "1034");
+        self.assertEqual(read_record["DURATION"], "102");
+        self.assertEqual(read_record["WCLIMIT"], "101");
+        self.assertEqual(read_record["TASKS"], "23(2,11)");
+        self.assertEqual(read_record["NUM_TASKS"], 23);
+        self.assertEqual(read_record["TASKS_PER_NODE"], 2);
+        self.assertEqual(read_record["CORES_PER_TASK"], 11);
+        self.assertEqual(read_record["RES"], "thereservation");
+        self.assertEqual(read_record["DEP"], "thedependency");
+        self.assertEqual(read_record["WF"], "my_manifest.json");
+        
     def test_dump_qos(self):
         generator = trace_gen.TraceGenerator()
         
@@ -339,4 +526,23 @@ class TestTraceGen(unittest.TestCase):
         self.assertEqual(generator.get_submitted_core_s(),
                         (232*112*1022, 1.0))
         
+    def test_sliding_window_accumulator(self):
+        window = trace_gen.SlidingWindowAccumulator(10)
+        self.assertEqual(window.get_first_stamp(), None)
+        self.assertEqual(window.add(100, 1), (0, 0))
+        self.assertEqual(window.add(105, 2), (0, 0))
+        self.assertEqual(window.add(110, 4), (0, 0))
+        self.assertEqual(window.get_sum(), 7)
+        self.assertEqual(window.get_first_stamp(), 100)
+        self.assertEqual(window.add(116, 8), (2, 3))
+        self.assertEqual(window.get_sum(), 12)
+        self.assertEqual(window.get_first_stamp(), 110)
+        self.assertEqual(len(window), 2)
+        self.assertEqual(window.add(200, 16), (2, 12))
+        self.assertEqual(window.get_sum(), 16)
+        self.assertEqual(window.get_first_stamp(), 200)
+        window.reset()
+        self.assertEqual(len(window), 0)
+        self.assertEqual(window.get_sum(), 0)
+        
       
\ No newline at end of file
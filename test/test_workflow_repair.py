@@ -132,12 +132,12 @@ class TestWorkflowRepair(unittest.TestCase):
         stc.apply_new_times(self._db,{1:20000-14340, 3:30000-3540})
         new_rt=ResultTrace()
         new_rt.load_trace(self._db, trace_id)
-        self.assertEqual(new_rt._lists_submit["time_start"],
+        self.assertEqual(new_rt._lists_submit["time_start"].tolist(),
                          [20000-14340, 20000, 30000-3540])
         
         old_rt=ResultTrace()
         old_rt.load_trace(self._db, trace_id_orig)
-        self.assertEqual(old_rt._lists_submit["time_start"],
+        self.assertEqual(old_rt._lists_submit["time_start"].tolist(),
                          [0,20000, 0])
         
     def test_correct_times(self):
@@ -174,12 +174,12 @@ class TestWorkflowRepair(unittest.TestCase):
         
         new_rt=ResultTrace()
         new_rt.load_trace(self._db, trace_id)
-        self.assertEqual(new_rt._lists_submit["time_start"],
+        self.assertEqual(new_rt._lists_submit["time_start"].tolist(),
                          [20000-14340, 20000, 30000])
         
         original_rt=ResultTrace()
         original_rt.load_trace(self._db, trace_id+1)
-        self.assertEqual(original_rt._lists_submit["time_start"],
+        self.assertEqual(original_rt._lists_submit["time_start"].tolist(),
                          [0, 20000, 0])
         
         
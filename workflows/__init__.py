@@ -2,7 +2,7 @@
 import json
 import sys
 
-import pygraphviz as pgv
+from workflows.dot_dag import parse_dot_edges
 import xml.etree.ElementTree as ET
 
 
@@ -46,7 +46,7 @@ def convert_xml_wf_to_json_manifest(xml_route, json_route, grouped_jobs=[],
     jobs, deps = _rename_jobs(jobs, deps, new_job_names)
     print("Renaming jobs Done")
     manifest_dic=_encode_manifest_dic(jobs, deps)
-    f_out=open(json_route, "wb")
+    f_out=open(json_route, "w")
     json.dump(manifest_dic, f_out)   
     f_out.close()
         
@@ -61,12 +61,15 @@ def _encode_manifest_dic(jobs, deps):
     manifest_dic["total_runtime"] = manifest_dic["resource_steps"][-1][
                                                                     "end_time"]
     manifest_dic["dot_dag"] = _produce_dot_graph(jobs, deps)
+    manifest_dic["dag_edges"] = [list(x) for x in
+                                 parse_dot_edges(manifest_dic["dot_dag"])]
     return manifest_dic
 
 """
 Functions to produce manifest elements.
 """
 def _produce_dot_graph(jobs, deps):
+    import pygraphviz as pgv
     G=pgv.AGraph(directed=True)
     for job in jobs:
         G.add_node(job["id"])
@@ -0,0 +1,196 @@
+"""
+Parsing of the workflow dependency graphs (dot_dag field) of manifests
+without pygraphviz. It supports the subset of the DOT language used in
+manifests: (strict) graphs and digraphs with node, edge (including chains
+and {} groups), attribute and subgraph statements, quoted IDs, ports, and
+comments.
+"""
+import re
+
+_token_re = re.compile(r"""
+    (?P<space>\s+)
+    |(?P<comment>//[^\n]*|/\*.*?\*/|^\#[^\n]*)
+    |(?P<edge_op>->|--)
+    |(?P<quoted>"(?:[^"\\]|\\.)*")
+    |(?P<html><[^>]*>)
+    |(?P<id>[A-Za-z_\u0080-\uffff][A-Za-z0-9_\u0080-\uffff]*
+        |-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))
+    |(?P<symbol>[{}\[\];,=:])
+    """, re.VERBOSE | re.DOTALL | re.MULTILINE)
+
+
+def parse_dot_edges(dot_string):
+    """Returns the list of (tail, head) node id tuples of the edges in a
+    DOT graph. Edges are in the same order as pygraphviz's AGraph.edges():
+    grouped by tail node in order of node creation, and in order of
+    creation within the same tail node. Repeated edges of strict graphs
+    are only returned once.
+    Args:
+    - dot_string: string with a graph in the DOT language.
+    Raises ValueError if dot_string cannot be parsed.
+    """
+    return _DotParser(dot_string).parse()
+
+def get_manifest_edges(manifest):
+    """Returns the list of (tail, head) task id tuples of the dependencies
+    of a manifest: read from its precompiled "dag_edges" field if present,
+    parsed from its "dot_dag" field otherwise.
+    Args:
+    - manifest: dictionary with the content of a json manifest.
+    """
+    if "dag_edges" in manifest:
+        return [(tail, head) for (tail, head) in manifest["dag_edges"]]
+    return parse_dot_edges(manifest["dot_dag"])
+
+
+class _DotParser(object):
+    """Recursive descent parser of DOT graphs that only keeps nodes and
+    edges."""
+    def __init__(self, dot_string):
+        self._tokens = _tokenize(dot_string)
+        self._pos = 0
+        self._nodes = {}
+        self._out_edges = {}
+        self._strict = False
+
+    def parse(self):
+        if self._is_keyword("strict"):
+            self._strict = True
+            self._pos+=1
+        if not (self._is_keyword("digraph") or self._is_keyword("graph")):
+            self._error("graph or digraph expected")
+        self._pos+=1
+        if self._is_id():
+            self._parse_id()
+        self._parse_block()
+        edges = []
+        for node in sorted(self._nodes, key=self._nodes.get):
+            edges += self._out_edges.get(node, [])
+        return edges
+
+    def _parse_block(self):
+        """Parses { stmt_list } and returns the nodes in it."""
+        self._expect("{")
+        nodes = []
+        while self._peek_value() != "}":
+            if self._peek_kind() is None:
+                self._error("} expected")
+            nodes += self._parse_stmt()
+            if self._peek_value() in [";", ","]:
+                self._pos+=1
+        self._pos+=1
+        return nodes
+
+    def _parse_stmt(self):
+        if (self._is_keyword("graph") or self._is_keyword("node")
+            or self._is_keyword("edge")):
+            self._pos+=1
+            self._parse_attr_lists()
+            return []
+        if (self._is_id() and self._pos+1<len(self._tokens)
+            and self._tokens[self._pos+1][1]=="="):
+            self._pos+=2
+            self._parse_id()
+            return []
+        nodes = self._parse_operand()
+        all_nodes = list(nodes)
+        while self._peek_kind()=="edge_op":
+            self._pos+=1
+            heads = self._parse_operand()
+            for tail in nodes:
+                for head in heads:
+                    self._add_edge(tail, head)
+            all_nodes += heads
+            nodes = heads
+        self._parse_attr_lists()
+        return all_nodes
+
+    def _parse_operand(self):
+        if self._is_keyword("subgraph"):
+            self._pos+=1
+            if self._is_id():
+                self._parse_id()
+            return self._parse_block()
+        if self._peek_value()=="{":
+            return self._parse_block()
+        node = self._parse_id()
+        if self._peek_value()==":":
+            self._pos+=1
+            self._parse_id()
+            if self._peek_value()==":":
+                self._pos+=1
+                self._parse_id()
+        self._add_node(node)
+        return [node]
+
+    def _parse_attr_lists(self):
+        while self._peek_value()=="[":
+            while self._peek_value()!="]":
+                if self._peek_kind() is None:
+                    self._error("] expected")
+                self._pos+=1
+            self._pos+=1
+
+    def _parse_id(self):
+        if not self._is_id():
+            self._error("ID expected")
+        kind = self._peek_kind()
+        value = self._tokens[self._pos][1]
+        self._pos+=1
+        if kind=="quoted":
+            value = value[1:-1].replace('\\"', '"')
+        elif kind=="html":
+            value = value[1:-1]
+        return value
+
+    def _add_node(self, node):
+        if not node in self._nodes:
+            self._nodes[node] = len(self._nodes)
+
+    def _add_edge(self, tail, head):
+        out_edges = self._out_edges.setdefault(tail, [])
+        if not self._strict or not (tail, head) in out_edges:
+            out_edges.append((tail, head))
+
+    def _expect(self, value):
+        if self._peek_value()!=value:
+            self._error("{0} expected".format(value))
+        self._pos+=1
+
+    def _is_id(self):
+        return self._peek_kind() in ["id", "quoted", "html"]
+
+    def _is_keyword(self, keyword):
+        return (self._peek_kind()=="id"
+                and self._peek_value().lower()==keyword)
+
+    def _peek_kind(self):
+        if self._pos<len(self._tokens):
+            return self._tokens[self._pos][0]
+        return None
+
+    def _peek_value(self):
+        if self._pos<len(self._tokens):
+            return self._tokens[self._pos][1]
+        return None
+
+    def _error(self, message):
+        raise ValueError("Error parsing DOT graph at token {0} ({1}): "
+                         "{2}".format(self._pos, self._peek_value(), message))
+
+
+def _tokenize(dot_string):
+    """Returns a list of (kind, value) tuples with the tokens of
+    dot_string, without spaces and comments."""
+    tokens = []
+    pos = 0
+    while pos<len(dot_string):
+        match = _token_re.match(dot_string, pos)
+        if match is None:
+            raise ValueError("Error parsing DOT graph: unexpected character"
+                             " at {0}: {1}".format(pos, dot_string[pos]))
+        kind = match.lastgroup
+        if not kind in ["space", "comment"]:
+            tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens